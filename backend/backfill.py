@@ -0,0 +1,169 @@
+# backfill.py - 歷史日交易數據回補工具（可中斷續傳、多執行緒）
+
+"""
+從 yfinance 批次抓取多檔股票的歷史日交易數據並寫入資料庫。
+
+- 股票來源：命令列代號、逗號分隔清單或股票群組名稱
+- 以執行緒池並行抓取，所有請求經過 API 限額追蹤器排隊，不會超出限額
+- 每檔股票完成後記錄到 backfill_progress 表，中斷後重新執行會跳過已完成的股票
+- 執行期間持續回報吞吐量（rows/s、tickers/min）與預估剩餘時間
+
+用法（在 backend 目錄下執行）：
+    python backfill.py 2330 2317 2454 --days 2000
+    python backfill.py --codes 2330,2317,2454 --workers 4
+    python backfill.py --group 半導體 --days 2000
+    python backfill.py --group 半導體 --restart   # 忽略檢查點，全部重新抓取
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional, Dict
+
+from core.config import COLUMNAR_STORE_ENABLED
+from core.logging_config import setup_logging, get_logger
+from database import init_database
+from crud import (
+    save_daily_trades,
+    get_all_stock_groups,
+    get_stocks_by_group,
+    get_backfill_progress,
+    save_backfill_progress
+)
+from services.yfinance_service import get_daily_trade_data
+from services.api_quota_tracker import quota_tracker
+
+logger = get_logger(__name__)
+
+
+def resolve_stock_codes(codes: List[str], codes_csv: Optional[str], group_name: Optional[str]) -> List[str]:
+    """合併命令列代號、逗號分隔清單與群組成員，保持順序並去除重複"""
+    result = list(codes)
+    if codes_csv:
+        result.extend(code.strip() for code in codes_csv.split(','))
+    if group_name:
+        group = next((g for g in get_all_stock_groups() if g['groupName'] == group_name), None)
+        if group is None:
+            raise ValueError(f"找不到股票群組: {group_name}")
+        result.extend(get_stocks_by_group(group['id']))
+    return list(dict.fromkeys(code for code in result if code))
+
+
+def backfill_stock(stock_code: str, days: int) -> Dict:
+    """抓取並保存單檔股票的歷史數據，返回結果摘要"""
+    request = quota_tracker.wait_for_quota('backfill', stock_code)
+    start = time.time()
+    data = get_daily_trade_data(stock_code, days=days)
+    request.success = len(data) > 0
+    request.response_time = time.time() - start
+
+    if not data:
+        save_backfill_progress(stock_code, 'failed', days, error='yfinance 未返回數據')
+        return {'stockCode': stock_code, 'rows': 0, 'ok': False, 'error': 'yfinance 未返回數據'}
+
+    saved = save_daily_trades(stock_code, data)
+    if saved == 0:
+        save_backfill_progress(stock_code, 'failed', days, error='寫入資料庫失敗')
+        return {'stockCode': stock_code, 'rows': 0, 'ok': False, 'error': '寫入資料庫失敗'}
+
+    if COLUMNAR_STORE_ENABLED:
+        from services.columnar_store import append_daily_bars
+        append_daily_bars(stock_code, data)
+
+    last_date = max(trade['date'] for trade in data)
+    save_backfill_progress(stock_code, 'done', days, rows_saved=saved, last_date=last_date)
+    return {'stockCode': stock_code, 'rows': saved, 'ok': True, 'error': None}
+
+
+def run_backfill(stock_codes: List[str], days: int, workers: int, restart: bool = False) -> Dict:
+    """並行回補多檔股票，返回統計結果"""
+    if not restart:
+        progress = get_backfill_progress(stock_codes)
+        done = [
+            code for code in stock_codes
+            if progress.get(code, {}).get('status') == 'done' and (progress[code]['days'] or 0) >= days
+        ]
+        if done:
+            logger.info(f"依檢查點跳過 {len(done)} 檔已完成的股票")
+        stock_codes = [code for code in stock_codes if code not in set(done)]
+
+    total = len(stock_codes)
+    stats = {'tickers': 0, 'rows': 0, 'failed': []}
+    if total == 0:
+        logger.info("沒有需要回補的股票")
+        return stats
+
+    logger.info(f"開始回補 {total} 檔股票，{days} 天，{workers} 個工作執行緒")
+    start = time.time()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {executor.submit(backfill_stock, code, days): code for code in stock_codes}
+        for future in as_completed(futures):
+            code = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                save_backfill_progress(code, 'failed', days, error=str(e))
+                result = {'stockCode': code, 'rows': 0, 'ok': False, 'error': str(e)}
+
+            stats['tickers'] += 1
+            stats['rows'] += result['rows']
+            if not result['ok']:
+                stats['failed'].append(code)
+
+            elapsed = max(time.time() - start, 1e-6)
+            tickers_per_min = stats['tickers'] / elapsed * 60
+            eta = (total - stats['tickers']) / tickers_per_min if tickers_per_min else 0
+            status = f"{result['rows']} 筆" if result['ok'] else f"失敗（{result['error']}）"
+            logger.info(
+                f"[{stats['tickers']}/{total}] {code}: {status} | "
+                f"{stats['rows'] / elapsed:.0f} rows/s | {tickers_per_min:.1f} tickers/min | "
+                f"預估剩餘 {eta:.1f} 分鐘"
+            )
+    except KeyboardInterrupt:
+        logger.warning("已中斷，未完成的股票會在下次執行時繼續")
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+
+    elapsed = time.time() - start
+    logger.info(
+        f"回補完成：{stats['tickers'] - len(stats['failed'])}/{total} 檔成功，共 {stats['rows']} 筆，"
+        f"耗時 {elapsed:.1f} 秒（{stats['rows'] / max(elapsed, 1e-6):.0f} rows/s）"
+    )
+    if stats['failed']:
+        logger.warning(f"失敗的股票（重新執行會再次嘗試）: {', '.join(stats['failed'])}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回補歷史日交易數據（可中斷續傳）")
+    parser.add_argument("codes", nargs="*", help="股票代號（例如 2330 2317）")
+    parser.add_argument("--codes", dest="codes_csv", help="逗號分隔的股票代號清單")
+    parser.add_argument("--group", help="股票群組名稱（回補群組內所有股票）")
+    parser.add_argument("--days", type=int, default=2000, help="回補天數（預設 2000）")
+    parser.add_argument("--workers", type=int, default=4, help="並行工作執行緒數量（預設 4）")
+    parser.add_argument("--restart", action="store_true", help="忽略檢查點，重新回補所有股票")
+    args = parser.parse_args()
+
+    setup_logging()
+    init_database()
+
+    try:
+        stock_codes = resolve_stock_codes(args.codes, args.codes_csv, args.group)
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(2)
+    if not stock_codes:
+        parser.error("請提供股票代號、--codes 或 --group")
+
+    try:
+        stats = run_backfill(stock_codes, args.days, args.workers, restart=args.restart)
+    except KeyboardInterrupt:
+        sys.exit(130)
+    sys.exit(1 if stats['failed'] else 0)
+
+
+if __name__ == "__main__":
+    main()
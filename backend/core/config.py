@@ -52,6 +52,50 @@ CACHE_ENABLED = os.getenv("CACHE_ENABLED", "True").lower() == "true"
 CACHE_TTL_STOCK_INFO = int(os.getenv("CACHE_TTL_STOCK_INFO", "300"))  # 5分鐘
 CACHE_TTL_DAILY_TRADE = int(os.getenv("CACHE_TTL_DAILY_TRADE", "600"))  # 10分鐘
 CACHE_TTL_FINANCIAL = int(os.getenv("CACHE_TTL_FINANCIAL", "3600"))  # 1小時
+CACHE_DB_BATCH_SIZE = int(os.getenv("CACHE_DB_BATCH_SIZE", "50"))  # 資料庫快取批次寫入筆數
+CACHE_DB_FLUSH_INTERVAL = float(os.getenv("CACHE_DB_FLUSH_INTERVAL", "5"))  # 資料庫快取最長寫入間隔（秒）
+CACHE_DB_COMPRESS_LEVEL = int(os.getenv("CACHE_DB_COMPRESS_LEVEL", "6"))  # zlib 壓縮等級（1-9）
+CACHE_JANITOR_ENABLED = os.getenv("CACHE_JANITOR_ENABLED", "True").lower() == "true"
+CACHE_JANITOR_INTERVAL = int(os.getenv("CACHE_JANITOR_INTERVAL", "300"))  # 過期快取清理間隔（秒）
+CACHE_JANITOR_BATCH_SIZE = int(os.getenv("CACHE_JANITOR_BATCH_SIZE", "500"))  # 每批刪除的過期快取筆數
+CACHE_STORE_UNLOGGED = os.getenv("CACHE_STORE_UNLOGGED", "False").lower() == "true"  # PostgreSQL 使用 UNLOGGED 快取表
+CACHE_WARM_START_ENABLED = os.getenv("CACHE_WARM_START_ENABLED", "False").lower() == "true"  # 啟動時從 cache_store 預熱內存快取
+CACHE_WARM_START_LIMIT = int(os.getenv("CACHE_WARM_START_LIMIT", "500"))  # 預熱載入的最多筆數（依最近存取排序）
+CACHE_WARM_START_CHUNK = int(os.getenv("CACHE_WARM_START_CHUNK", "50"))  # 每批載入筆數
+# 內存快取寫入時同步（批次）寫入 cache_store，預設隨預熱功能啟用
+CACHE_DB_WRITE_THROUGH = os.getenv("CACHE_DB_WRITE_THROUGH", str(CACHE_WARM_START_ENABLED)).lower() == "true"
+# 快取後端：memory（每個進程各自的內存快取）或 sqlite（同一台機器上多個 worker 共用的 WAL 模式 SQLite 檔案，
+# API 限額計數也一併共用）
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+CACHE_SHARED_PATH = Path(os.getenv("CACHE_SHARED_PATH", str(BASE_DIR / "data" / "shared_cache.db")))
+
+# 回應快取（快取編碼後的 JSON 回應位元組，命中時直接返回，不重新序列化）
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "False").lower() == "true"
+RESPONSE_CACHE_GZIP = os.getenv("RESPONSE_CACHE_GZIP", "True").lower() == "true"  # 同時保存壓縮版本（gzip，已安裝 brotli 時另存 br）
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))  # 超過此大小的回應不快取
+
+# 回應壓縮（依 Accept-Encoding 協商 gzip / br；回應快取命中時直接送出預先壓縮的版本）
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "True").lower() == "true"
+# 小於此大小不壓縮（沿用舊的 RESPONSE_CACHE_GZIP_MIN_BYTES 設定）
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", os.getenv("RESPONSE_CACHE_GZIP_MIN_BYTES", "1024")))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI = os.getenv("COMPRESSION_BROTLI", "True").lower() == "true"  # 需安裝 brotli 套件
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+
+# 欄位式日線儲存（每檔股票一組記憶體映射的欄位檔案）
+COLUMNAR_STORE_ENABLED = os.getenv("COLUMNAR_STORE_ENABLED", "False").lower() == "true"
+COLUMNAR_STORE_DIR = Path(os.getenv("COLUMNAR_STORE_DIR", str(BASE_DIR / "data" / "columnar")))
+
+# 盤中數據增量更新（當日 1 分 K 保存在快取，重新整理時只抓最近幾根並依時間戳合併）
+INTRADAY_REFRESH_INTERVAL = float(os.getenv("INTRADAY_REFRESH_INTERVAL", "5"))  # 距離上次更新未滿此秒數時直接使用快取
+INTRADAY_DELTA_OVERLAP_BARS = int(os.getenv("INTRADAY_DELTA_OVERLAP_BARS", "2"))  # 增量抓取時與既有數據重疊的 K 棒數（最後一根可能仍在更新）
+
+# 盤中數據推送（SSE；每檔被訂閱的股票一個輪詢任務，新的 K 棒分送給所有訂閱者）
+INTRADAY_STREAM_INTERVAL = float(os.getenv("INTRADAY_STREAM_INTERVAL", "10"))  # 開盤時段輪詢間隔（秒）
+INTRADAY_STREAM_IDLE_INTERVAL = float(os.getenv("INTRADAY_STREAM_IDLE_INTERVAL", "300"))  # 非開盤時段輪詢間隔（秒）
+INTRADAY_STREAM_QUEUE_SIZE = int(os.getenv("INTRADAY_STREAM_QUEUE_SIZE", "32"))  # 每個連線最多暫存的事件數
+INTRADAY_STREAM_HEARTBEAT = float(os.getenv("INTRADAY_STREAM_HEARTBEAT", "15"))  # 心跳間隔（秒）
+INTRADAY_STREAM_MAX_CODES = int(os.getenv("INTRADAY_STREAM_MAX_CODES", "20"))  # 每個連線最多訂閱的股票數
 
 # API 限額配置
 API_RATE_LIMIT_PER_MINUTE = int(os.getenv("API_RATE_LIMIT_PER_MINUTE", "20"))
@@ -0,0 +1,419 @@
+# middleware.py - ASGI 中介層
+
+"""
+ResponseCacheMiddleware：快取 GET 回應編碼後的 JSON 位元組，並支援條件式請求。
+CompressionMiddleware：依 Accept-Encoding 協商 gzip / br，壓縮超過大小門檻的回應。
+
+快取命中時 FastAPI 仍會對快取中的 Python 結構重新執行 jsonable_encoder 與 json.dumps，
+2000 筆的日線回應大部分時間都花在這裡。此中介層直接保存最終的回應主體（以及預先壓縮的
+gzip / br 版本），命中時以原始位元組送出，不經過路由與序列化。
+
+- 只處理設定表中的路由；快取鍵為路徑加上排序後的查詢參數
+- 只保存狀態 200、application/json、未經壓縮且不超過大小上限的回應；
+  路由可回傳 Cache-Control: no-store 表示此回應不可快取（例如查無數據時的診斷訊息）
+- 未命中時回應照常送給客戶端，同時累積主體，完成後才寫入快取
+- 快取寫入 cache_service（類型 response），帶有 stock:<代號> 與 route:<快取類型> 標籤，
+  可用 invalidate_cache_tags 清除
+- 每筆快取保存主體雜湊產生的強 ETag 與到期時間；請求帶有相符的 If-None-Match 時
+  直接回應 304（不送出主體），Cache-Control 的 max-age 為快取剩餘的秒數
+- 設定表中路由的非 GET 請求成功後，清除同一快取類型的所有回應（例如修改群組後清除群組列表）
+
+回應快取命中的內容已經壓縮過（每筆熱門回應只壓縮一次），CompressionMiddleware 只處理
+未命中與不在快取範圍內的回應；串流回應（多個主體區塊）與 text/event-stream 直接放行。
+"""
+
+import gzip
+import hashlib
+import logging
+import re
+import time
+from typing import Dict, List, Optional, Pattern, Tuple, Union
+from urllib.parse import parse_qsl, urlencode
+
+from core.config import (
+    RESPONSE_CACHE_GZIP,
+    RESPONSE_CACHE_MAX_BYTES,
+    COMPRESSION_MIN_BYTES,
+    COMPRESSION_GZIP_LEVEL,
+    COMPRESSION_BROTLI,
+    COMPRESSION_BROTLI_QUALITY
+)
+from services.cache_service import (
+    get_from_memory_cache,
+    set_to_memory_cache,
+    invalidate_cache_tags,
+    get_cache_key,
+    CACHE_TTL
+)
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# 可快取的路由：(路徑前綴或正規表示式, 快取類型（決定 TTL 與清除範圍）, 是否依股票代號加上標籤)
+# 股票代號為前綴後的第一個路徑段；正規表示式以 stock_code 具名群組指定
+# /api/stocks/ 下同時有群組與 BOM 路由，以正規表示式區分，避免 BOM 異動清除群組列表（反之亦然）
+RESPONSE_CACHE_ROUTES: List[Tuple[Union[str, Pattern], str, bool]] = [
+    ('/api/stock/info/', 'stock_info', True),
+    ('/api/stock/daily/', 'daily_trade', True),
+    ('/api/stock/batch/daily', 'daily_trade', False),
+    ('/api/stock/financial/', 'financial', True),
+    ('/api/stock/market-index', 'market_index', False),
+    ('/api/stock-groups', 'stock_groups', False),
+    (re.compile(r'/api/stocks/(?:[^/]+/)?groups$'), 'stock_groups', False),
+    (re.compile(r'/api/stocks/(?P<stock_code>[^/]+)/bom(?:/|$)'), 'bom', True),
+]
+
+# 這些快取類型的回應可被使用者修改，瀏覽器每次都需以 If-None-Match 重新驗證（Cache-Control: no-cache）
+REVALIDATE_CACHE_TYPES = {'stock_groups', 'bom'}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key == name:
+            return value
+    return None
+
+
+def _supported_encodings() -> List[str]:
+    """伺服器端可用的壓縮格式（依偏好排序）"""
+    return (['br'] if COMPRESSION_BROTLI and BROTLI_AVAILABLE else []) + ['gzip']
+
+
+def _choose_encoding(headers: List[Tuple[bytes, bytes]], available) -> Optional[str]:
+    """依 Accept-Encoding 的 q 值從 available 中選出壓縮格式（同分時依 available 的順序，q=0 表示拒絕）"""
+    value = _header(headers, b'accept-encoding')
+    if value is None:
+        return None
+    weights: Dict[str, float] = {}
+    for item in value.decode('latin-1').split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.replace(' ', '').lower()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+    best, best_q = None, 0.0
+    for coding in available:
+        q = weights.get(coding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL)
+
+
+def _is_compressible(content_type: bytes) -> bool:
+    content_type = content_type.lower()
+    if content_type.startswith(b'text/event-stream'):
+        return False
+    return (
+        content_type.startswith(b'text/')
+        or b'json' in content_type
+        or b'javascript' in content_type
+        or b'xml' in content_type
+        or b'csv' in content_type
+    )
+
+
+def _encoded_etag(etag: bytes, encoding: str) -> bytes:
+    """壓縮後的表示法使用不同的強 ETag（加上格式後綴）；弱 ETag 保持不變"""
+    if etag.startswith(b'"') and etag.endswith(b'"'):
+        return etag[:-1] + f"-{encoding}".encode('latin-1') + b'"'
+    return etag
+
+
+def _make_etag(body: bytes) -> str:
+    """以主體雜湊產生強 ETag（不含引號）"""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def _etag_matches(headers: List[Tuple[bytes, bytes]], etag: str) -> bool:
+    """If-None-Match 是否與 ETag 相符（弱比較：忽略 W/ 前綴與壓縮版本的後綴）"""
+    value = _header(headers, b'if-none-match')
+    if value is None:
+        return False
+    for item in value.decode('latin-1').split(','):
+        item = item.strip()
+        if item == '*':
+            return True
+        if item.startswith('W/'):
+            item = item[2:]
+        if item.strip('"').split('-', 1)[0] == etag:
+            return True
+    return False
+
+
+def _cache_control(cache_type: str, max_age: int) -> bytes:
+    if cache_type in REVALIDATE_CACHE_TYPES:
+        return b'no-cache'
+    return f"max-age={max(0, max_age)}".encode('latin-1')
+
+
+class ResponseCacheMiddleware:
+    """快取編碼後 JSON 回應的純 ASGI 中介層"""
+
+    def __init__(self, app, routes: Optional[List[Tuple[str, str, bool]]] = None):
+        self.app = app
+        self.routes = routes if routes is not None else RESPONSE_CACHE_ROUTES
+
+    def _match(self, path: str) -> Optional[Tuple[Union[str, Pattern], str, bool]]:
+        for route in self.routes:
+            prefix = route[0]
+            if path.startswith(prefix) if isinstance(prefix, str) else prefix.match(path):
+                return route
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        route = self._match(scope['path'])
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        if scope['method'] not in SAFE_METHODS:
+            await self._call_and_invalidate(scope, receive, send, route[1])
+            return
+        if scope['method'] != 'GET':
+            await self.app(scope, receive, send)
+            return
+
+        params = sorted(parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True))
+        cache_key = get_cache_key('response', scope['path'] + ('?' + urlencode(params) if params else ''))
+
+        entry = get_from_memory_cache(cache_key)
+        if entry is not None:
+            await self._send_cached(entry, route[1], scope, send)
+            return
+
+        tags = self._tags(route, scope['path'], params)
+        await self._call_and_store(scope, receive, send, cache_key, route[1], tags)
+
+    @staticmethod
+    def _tags(route: Tuple[Union[str, Pattern], str, bool], path: str, params: List[Tuple[str, str]]) -> List[str]:
+        """快取標籤：快取類型，以及路徑中的股票代號或批次查詢參數中的所有股票代號"""
+        prefix, cache_type, has_stock_code = route
+        tags = [f"route:{cache_type}"]
+        if has_stock_code:
+            if isinstance(prefix, str):
+                stock_code = path[len(prefix):].split('/', 1)[0]
+            else:
+                stock_code = prefix.match(path).group('stock_code')
+            tags.append(f"stock:{stock_code}")
+            return tags
+        codes = [code.strip() for key, value in params if key == 'stock_codes' for code in value.split(',')]
+        return tags + [f"stock:{code}" for code in codes if code]
+
+    async def _send_cached(self, entry: Dict, cache_type: str, scope, send):
+        encoded = entry.get('encoded') or {}
+        encoding = _choose_encoding(scope['headers'], [name for name in _supported_encodings() if name in encoded])
+        etag = entry.get('etag') or _make_etag(entry['body'])
+        quoted = f'"{etag}"'.encode('latin-1')
+        max_age = int(entry.get('expires_at', 0) - time.time())
+        headers = [
+            (b'etag', _encoded_etag(quoted, encoding) if encoding else quoted),
+            (b'cache-control', _cache_control(cache_type, max_age)),
+            (b'x-response-cache', b'HIT'),
+        ]
+        if encoded:
+            headers.append((b'vary', b'Accept-Encoding'))
+
+        # 重新驗證：只比較保存的 ETag，不重建也不送出主體
+        if _etag_matches(scope['headers'], etag):
+            await send({'type': 'http.response.start', 'status': 304, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        body = encoded[encoding] if encoding else entry['body']
+        headers += [
+            (b'content-type', entry['content_type']),
+            (b'content-length', str(len(body)).encode('latin-1')),
+        ]
+        if encoding:
+            headers.append((b'content-encoding', encoding.encode('latin-1')))
+        await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _call_and_store(self, scope, receive, send, cache_key: str, cache_type: str, tags: List[str]):
+        state = {'content_type': b'', 'cacheable': False, 'start': None}
+        chunks: List[bytes] = []
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal size
+            if message['type'] == 'http.response.start':
+                headers = dict((name.lower(), value) for name, value in message.get('headers', []))
+                content_type = headers.get(b'content-type', b'')
+                state['content_type'] = content_type
+                state['cacheable'] = (
+                    message['status'] == 200
+                    and content_type.startswith(b'application/json')
+                    and b'content-encoding' not in headers
+                    and b'no-store' not in headers.get(b'cache-control', b'')
+                )
+                message['headers'] = list(message.get('headers', [])) + [(b'x-response-cache', b'MISS')]
+                if state['cacheable']:
+                    # 先保留開始訊息：單一區塊的主體可在送出標頭前算出 ETag
+                    state['start'] = message
+                    state['set_cache_control'] = b'cache-control' not in headers
+                    return
+            elif message['type'] == 'http.response.body' and state['cacheable']:
+                body = message.get('body', b'')
+                more_body = message.get('more_body', False)
+                if state['start'] is not None:
+                    start, state['start'] = state['start'], None
+                    if not more_body and not chunks and len(body) <= RESPONSE_CACHE_MAX_BYTES:
+                        etag = self._store(cache_key, cache_type, tags, state['content_type'], body)
+                        start['headers'].append((b'etag', f'"{etag}"'.encode('latin-1')))
+                        if state['set_cache_control']:
+                            start['headers'].append(
+                                (b'cache-control', _cache_control(cache_type, CACHE_TTL.get(cache_type, 300)))
+                            )
+                        if _etag_matches(scope['headers'], etag):
+                            start['status'] = 304
+                            start['headers'] = [(k, v) for k, v in start['headers'] if k.lower() != b'content-length']
+                            message = {'type': 'http.response.body', 'body': b''}
+                        await send(start)
+                        await send(message)
+                        return
+                    await send(start)
+                size += len(body)
+                if size > RESPONSE_CACHE_MAX_BYTES:
+                    state['cacheable'] = False
+                    chunks.clear()
+                else:
+                    chunks.append(body)
+                if not more_body and state['cacheable']:
+                    self._store(cache_key, cache_type, tags, state['content_type'], b''.join(chunks))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _call_and_invalidate(self, scope, receive, send, cache_type: str):
+        """執行非 GET 請求，成功（2xx）後清除同一快取類型的回應快取"""
+        status = {'code': 0}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+        if 200 <= status['code'] < 300:
+            try:
+                invalidate_cache_tags([f"route:{cache_type}"])
+            except Exception as e:
+                logger.warning(f"清除回應快取失敗 route:{cache_type}: {str(e)}")
+
+    @staticmethod
+    def _store(cache_key: str, cache_type: str, tags: List[str], content_type: bytes, body: bytes) -> str:
+        """寫入回應快取（同時預先壓縮），返回主體的 ETag"""
+        etag = _make_etag(body)
+        encoded = {}
+        if RESPONSE_CACHE_GZIP and len(body) >= COMPRESSION_MIN_BYTES:
+            encoded = {encoding: _compress(body, encoding) for encoding in _supported_encodings()}
+        ttl = CACHE_TTL.get(cache_type, 300)
+        try:
+            set_to_memory_cache(
+                cache_key,
+                {
+                    'body': body,
+                    'encoded': encoded,
+                    'content_type': content_type,
+                    'etag': etag,
+                    'expires_at': time.time() + ttl
+                },
+                ttl,
+                tags=tags
+            )
+        except Exception as e:
+            logger.warning(f"保存回應快取失敗 {cache_key}: {str(e)}")
+        return etag
+
+
+class CompressionMiddleware:
+    """依 Accept-Encoding 壓縮回應的純 ASGI 中介層（只處理單一主體區塊的回應）"""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        encoding = _choose_encoding(scope['headers'], _supported_encodings())
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        state = {'start': None, 'passthrough': False}
+
+        async def send_wrapper(message):
+            if state['passthrough']:
+                await send(message)
+                return
+            if message['type'] == 'http.response.start':
+                headers = dict((name.lower(), value) for name, value in message.get('headers', []))
+                if (
+                    b'content-encoding' in headers
+                    or message['status'] < 200 or message['status'] in (204, 304)
+                    or not _is_compressible(headers.get(b'content-type', b''))
+                ):
+                    state['passthrough'] = True
+                    await send(message)
+                    return
+                # 等到第一個主體區塊才決定是否壓縮
+                state['start'] = message
+                return
+
+            start, state['start'] = state['start'], None
+            state['passthrough'] = True
+            body = message.get('body', b'')
+            if message.get('more_body', False) or len(body) < self.minimum_size:
+                # 串流回應或太小的回應：原樣送出
+                await send(start)
+                await send(message)
+                return
+
+            compressed = _compress(body, encoding)
+            headers = []
+            vary = []
+            for name, value in start.get('headers', []):
+                lower = name.lower()
+                if lower == b'content-length':
+                    value = str(len(compressed)).encode('latin-1')
+                elif lower == b'etag':
+                    value = _encoded_etag(value, encoding)
+                elif lower == b'vary':
+                    vary.append(value)
+                    continue
+                headers.append((name, value))
+            if b'accept-encoding' not in b','.join(vary).lower():
+                vary.append(b'Accept-Encoding')
+            headers.append((b'vary', b', '.join(vary)))
+            headers.append((b'content-encoding', encoding.encode('latin-1')))
+            start['headers'] = headers
+            await send(start)
+            await send({'type': 'http.response.body', 'body': compressed})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,102 @@
+# responses.py - 快速 JSON 回應類別
+
+"""
+FastJSONResponse：以 orjson 序列化的 JSONResponse，設為兩個應用程式的預設回應類別。
+EventStreamResponse：Server-Sent Events 串流回應。
+
+- 原生支援 NumPy 陣列與純量（OPT_SERIALIZE_NUMPY），以及 psycopg2 NUMERIC 欄位返回的 Decimal
+- NaN / Infinity 輸出為 null（標準 JSON 不允許 NaN）
+- 未安裝 orjson 時退回標準庫 json（同樣支援 NumPy 與 Decimal）
+
+回傳 dict 的路由在進入回應類別前仍會先經過 FastAPI 的 jsonable_encoder，
+大型回應（日交易、盤中、批次查詢）應直接 `return FastJSONResponse(content)` 以省去這一步。
+"""
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+import numpy as np
+from fastapi.responses import JSONResponse, StreamingResponse
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _default(value: Any) -> Any:
+    """序列化 orjson / json 不支援的型別"""
+    if isinstance(value, Decimal):
+        # 與 FastAPI 的 jsonable_encoder 一致：整數值輸出為 int
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"無法序列化的型別: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """序列化為 UTF-8 JSON 位元組（FastJSONResponse 與串流匯出共用）"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(
+        _replace_nan(content),
+        default=_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """以 orjson 序列化的 JSON 回應"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class EventStreamResponse(StreamingResponse):
+    """Server-Sent Events 回應（停用代理緩衝與快取）
+
+    StreamingResponse 在客戶端中斷時不會關閉事件產生器，產生器的 finally（例如取消訂閱）
+    要等到垃圾回收才執行；這裡在回應結束時明確關閉產生器。
+    """
+
+    media_type = "text/event-stream"
+
+    def __init__(self, content: Any, headers: Optional[Dict[str, str]] = None, **kwargs):
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **(headers or {})}
+        super().__init__(content, headers=headers, **kwargs)
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            aclose = getattr(self.body_iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+
+def _replace_nan(value: Any) -> Any:
+    """將 NaN / Infinity 換成 None（與 orjson 的輸出一致）"""
+    if isinstance(value, float) and (value != value or value in (float('inf'), float('-inf'))):
+        return None
+    if isinstance(value, dict):
+        return {k: _replace_nan(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_replace_nan(v) for v in value]
+    return value
@@ -1,11 +1,18 @@
 # crud.py - 資料庫 CRUD 操作
 
 import logging
-from typing import Optional, Dict, List
-from datetime import datetime
+from typing import Optional, Dict, List, Iterator, Tuple
+from datetime import datetime, date, timedelta
 import uuid
-from database import get_db_connection, DB_TYPE
-from db_utils import prepare_sql
+from database import (
+    get_db_connection,
+    iter_query_rows,
+    DB_TYPE,
+    is_daily_trades_partitioned,
+    ensure_daily_trade_partitions,
+    daily_trades_retention_cutoff,
+)
+from db_utils import prepare_sql, execute_batch_sql, copy_upsert, BULK_COPY_THRESHOLD
 
 logger = logging.getLogger(__name__)
 
@@ -102,364 +109,261 @@ def save_stock_basic(stock_data: Dict) -> bool:
 # ========== 財務報表操作 ==========
 
 def save_income_statement(income_data: Dict) -> bool:
-    """保存或更新損益表數據"""
+    """保存或更新損益表數據（以 save_income_statements 單一 upsert 寫入）"""
     if not income_data:
         return False
-        
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # 檢查是否已存在
-        cursor.execute(prepare_sql("""
-            SELECT id FROM income_statements 
-            WHERE stock_code = ? AND period = ?
-        """), (income_data.get('stockCode'), income_data.get('period')))
-        existing = cursor.fetchone()
-        
-        if existing:
-            # 更新
-            cursor.execute(prepare_sql("""
-                UPDATE income_statements SET
-                    stock_name = ?,
-                    revenue = ?,
-                    gross_profit = ?,
-                    gross_profit_ratio = ?,
-                    operating_expenses = ?,
-                    operating_expenses_ratio = ?,
-                    operating_income = ?,
-                    operating_income_ratio = ?,
-                    net_income = ?,
-                    other_income = ?,
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE stock_code = ? AND period = ?
-            """), (
-                income_data.get('stockName'),
-                income_data.get('revenue'),
-                income_data.get('grossProfit'),
-                income_data.get('grossProfitRatio'),
-                income_data.get('operatingExpenses'),
-                income_data.get('operatingExpensesRatio'),
-                income_data.get('operatingIncome'),
-                income_data.get('operatingIncomeRatio'),
-                income_data.get('netIncome'),
-                income_data.get('otherIncome'),
-                income_data.get('stockCode'),
-                income_data.get('period')
-            ))
-        else:
-            # 插入
-            record_id = income_data.get('id') or str(uuid.uuid4())
-            cursor.execute(prepare_sql("""
-                INSERT INTO income_statements (
-                    id, stock_code, stock_name, period, revenue, gross_profit,
-                    gross_profit_ratio, operating_expenses, operating_expenses_ratio,
-                    operating_income, operating_income_ratio, net_income, other_income
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """), (
-                record_id,
-                income_data.get('stockCode'),
-                income_data.get('stockName'),
-                income_data.get('period'),
-                income_data.get('revenue'),
-                income_data.get('grossProfit'),
-                income_data.get('grossProfitRatio'),
-                income_data.get('operatingExpenses'),
-                income_data.get('operatingExpensesRatio'),
-                income_data.get('operatingIncome'),
-                income_data.get('operatingIncomeRatio'),
-                income_data.get('netIncome'),
-                income_data.get('otherIncome')
-            ))
-        
-        conn.commit()
-        conn.close()
-        logger.debug(f"成功保存損益表: {income_data.get('stockCode')} - {income_data.get('period')}")
-        return True
-        
-    except Exception as e:
-        logger.error(f"保存損益表失敗: {str(e)}")
-        return False
+    return save_income_statements([income_data]) > 0
 
 def save_balance_sheet(balance_data: Dict) -> bool:
-    """保存或更新資產負債表數據"""
+    """保存或更新資產負債表數據（以 save_balance_sheets 單一 upsert 寫入）"""
     if not balance_data:
         return False
-        
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(prepare_sql("""
-            SELECT id FROM balance_sheets 
-            WHERE stock_code = ? AND period = ?
-        """), (balance_data.get('stockCode'), balance_data.get('period')))
-        existing = cursor.fetchone()
-        
-        if existing:
-            cursor.execute(prepare_sql("""
-                UPDATE balance_sheets SET
-                    stock_name = ?,
-                    total_assets = ?,
-                    total_assets_ratio = ?,
-                    shareholders_equity = ?,
-                    shareholders_equity_ratio = ?,
-                    current_assets = ?,
-                    current_assets_ratio = ?,
-                    current_liabilities = ?,
-                    current_liabilities_ratio = ?,
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE stock_code = ? AND period = ?
-            """), (
-                balance_data.get('stockName'),
-                balance_data.get('totalAssets'),
-                balance_data.get('totalAssetsRatio'),
-                balance_data.get('shareholdersEquity'),
-                balance_data.get('shareholdersEquityRatio'),
-                balance_data.get('currentAssets'),
-                balance_data.get('currentAssetsRatio'),
-                balance_data.get('currentLiabilities'),
-                balance_data.get('currentLiabilitiesRatio'),
-                balance_data.get('stockCode'),
-                balance_data.get('period')
-            ))
-        else:
-            record_id = balance_data.get('id') or str(uuid.uuid4())
-            cursor.execute(prepare_sql("""
-                INSERT INTO balance_sheets (
-                    id, stock_code, stock_name, period, total_assets, total_assets_ratio,
-                    shareholders_equity, shareholders_equity_ratio, current_assets,
-                    current_assets_ratio, current_liabilities, current_liabilities_ratio
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """), (
-                record_id,
-                balance_data.get('stockCode'),
-                balance_data.get('stockName'),
-                balance_data.get('period'),
-                balance_data.get('totalAssets'),
-                balance_data.get('totalAssetsRatio'),
-                balance_data.get('shareholdersEquity'),
-                balance_data.get('shareholdersEquityRatio'),
-                balance_data.get('currentAssets'),
-                balance_data.get('currentAssetsRatio'),
-                balance_data.get('currentLiabilities'),
-                balance_data.get('currentLiabilitiesRatio')
-            ))
-        
-        conn.commit()
-        conn.close()
-        logger.debug(f"成功保存資產負債表: {balance_data.get('stockCode')} - {balance_data.get('period')}")
-        return True
-        
-    except Exception as e:
-        logger.error(f"保存資產負債表失敗: {str(e)}")
-        return False
+    return save_balance_sheets([balance_data]) > 0
 
 def save_cash_flow(cashflow_data: Dict) -> bool:
-    """保存或更新現金流量表數據"""
+    """保存或更新現金流量表數據（以 save_cash_flows 單一 upsert 寫入）"""
     if not cashflow_data:
         return False
-        
+    return save_cash_flows([cashflow_data]) > 0
+
+# ========== 日交易數據操作 ==========
+
+# 日交易記錄欄位 -> daily_trades 欄位（依寫入順序）
+DAILY_TRADE_FIELDS = [
+    ('stock_code', 'stockCode'),
+    ('stock_name', 'stockName'),
+    ('date', 'date'),
+    ('close_price', 'closePrice'),
+    ('avg_price', 'avgPrice'),
+    ('prev_close', 'prevClose'),
+    ('open_price', 'openPrice'),
+    ('high_price', 'highPrice'),
+    ('low_price', 'lowPrice'),
+    ('change', 'change'),
+    ('change_percent', 'changePercent'),
+    ('total_volume', 'totalVolume'),
+    ('prev_volume', 'prevVolume'),
+    ('inner_volume', 'innerVolume'),
+    ('outer_volume', 'outerVolume'),
+    ('foreign_investor', 'foreignInvestor'),
+    ('investment_trust', 'investmentTrust'),
+    ('dealer', 'dealer'),
+    ('chips', 'chips'),
+    ('main_buy', 'mainBuy'),
+    ('main_sell', 'mainSell'),
+    ('month_high', 'monthHigh'),
+    ('month_low', 'monthLow'),
+    ('quarter_high', 'quarterHigh'),
+]
+
+def _bulk_upsert(table: str, fields: List, records: List[Dict], conflict_columns: List[str],
+                 defaults: Optional[Dict] = None, id_column: Optional[str] = None,
+                 touch_updated_at: bool = False) -> int:
+    """批次 upsert 記錄，返回寫入的筆數（失敗時拋出異常）
+    
+    fields 為 (資料表欄位, 記錄鍵) 列表；defaults 提供記錄缺少時的預設值；
+    id_column 使用記錄中同名鍵的值，沒有時產生 UUID（衝突時保留原有 id）。同一批內相同衝突鍵以最後一筆為準。
+    PostgreSQL 在筆數達到 BULK_COPY_THRESHOLD 時改用 COPY 載入。
+    """
+    defaults = defaults or {}
+    columns = [column for column, _ in fields]
+    key_indexes = [columns.index(c) for c in conflict_columns]
+    
+    rows_by_key = {}
+    for record in records:
+        row = [record.get(key) if record.get(key) is not None else defaults.get(column)
+               for column, key in fields]
+        key = tuple(row[i] for i in key_indexes)
+        if any(v is None for v in key):
+            continue
+        rows_by_key[key] = (record.get(id_column) if id_column else None, row)
+    if not rows_by_key:
+        return 0
+    
+    update_columns = [c for c in columns if c not in conflict_columns]
+    if id_column:
+        columns = [id_column] + columns
+        rows = [(record_id or str(uuid.uuid4()), *row) for record_id, row in rows_by_key.values()]
+    else:
+        rows = [tuple(row) for _, row in rows_by_key.values()]
+    
+    conn = get_db_connection()
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
-        
-        cursor.execute(prepare_sql("""
-            SELECT id FROM cash_flows 
-            WHERE stock_code = ? AND period = ?
-        """), (cashflow_data.get('stockCode'), cashflow_data.get('period')))
-        existing = cursor.fetchone()
-        
-        if existing:
-            cursor.execute(prepare_sql("""
-                UPDATE cash_flows SET
-                    stock_name = ?,
-                    operating_cash_flow = ?,
-                    investing_cash_flow = ?,
-                    investing_cash_flow_ratio = ?,
-                    financing_cash_flow = ?,
-                    financing_cash_flow_ratio = ?,
-                    free_cash_flow = ?,
-                    free_cash_flow_ratio = ?,
-                    net_cash_flow = ?,
-                    net_cash_flow_ratio = ?,
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE stock_code = ? AND period = ?
-            """), (
-                cashflow_data.get('stockName'),
-                cashflow_data.get('operatingCashFlow'),
-                cashflow_data.get('investingCashFlow'),
-                cashflow_data.get('investingCashFlowRatio'),
-                cashflow_data.get('financingCashFlow'),
-                cashflow_data.get('financingCashFlowRatio'),
-                cashflow_data.get('freeCashFlow'),
-                cashflow_data.get('freeCashFlowRatio'),
-                cashflow_data.get('netCashFlow'),
-                cashflow_data.get('netCashFlowRatio'),
-                cashflow_data.get('stockCode'),
-                cashflow_data.get('period')
-            ))
+        touch_columns = ['updated_at'] if touch_updated_at else []
+        if DB_TYPE == 'postgresql' and len(rows) >= BULK_COPY_THRESHOLD:
+            copy_upsert(cursor, table, columns, rows, conflict_columns, update_columns, touch_columns)
         else:
-            record_id = cashflow_data.get('id') or str(uuid.uuid4())
-            cursor.execute(prepare_sql("""
-                INSERT INTO cash_flows (
-                    id, stock_code, stock_name, period, operating_cash_flow,
-                    investing_cash_flow, investing_cash_flow_ratio, financing_cash_flow,
-                    financing_cash_flow_ratio, free_cash_flow, free_cash_flow_ratio,
-                    net_cash_flow, net_cash_flow_ratio
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """), (
-                record_id,
-                cashflow_data.get('stockCode'),
-                cashflow_data.get('stockName'),
-                cashflow_data.get('period'),
-                cashflow_data.get('operatingCashFlow'),
-                cashflow_data.get('investingCashFlow'),
-                cashflow_data.get('investingCashFlowRatio'),
-                cashflow_data.get('financingCashFlow'),
-                cashflow_data.get('financingCashFlowRatio'),
-                cashflow_data.get('freeCashFlow'),
-                cashflow_data.get('freeCashFlowRatio'),
-                cashflow_data.get('netCashFlow'),
-                cashflow_data.get('netCashFlowRatio')
-            ))
-        
+            assignments = [f"{c} = excluded.{c}" for c in update_columns]
+            assignments += [f"{c} = CURRENT_TIMESTAMP" for c in touch_columns]
+            execute_batch_sql(cursor, f"""
+                INSERT INTO {table} ({', '.join(columns)})
+                VALUES ({', '.join('?' for _ in columns)})
+                ON CONFLICT ({', '.join(conflict_columns)}) DO UPDATE SET {', '.join(assignments)}
+            """, rows)
         conn.commit()
+        return len(rows)
+    finally:
         conn.close()
-        logger.debug(f"成功保存現金流量表: {cashflow_data.get('stockCode')} - {cashflow_data.get('period')}")
-        return True
-        
-    except Exception as e:
-        logger.error(f"保存現金流量表失敗: {str(e)}")
-        return False
-
-# ========== 日交易數據操作 ==========
 
 def save_daily_trades(stock_code: str, daily_trades: List[Dict]) -> int:
-    """批量保存日交易數據，返回成功保存的數量"""
+    """批量保存日交易數據（以 stock_code + date 為鍵進行 upsert），返回成功保存的數量"""
     if not daily_trades:
         return 0
     
-    saved_count = 0
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        for trade in daily_trades:
-            try:
-                # 檢查是否已存在
-                cursor.execute(prepare_sql("""
-                    SELECT id FROM daily_trades 
-                    WHERE stock_code = ? AND date = ?
-                """), (trade.get('stockCode'), trade.get('date')))
-                existing = cursor.fetchone()
-                
-                if existing:
-                    # 更新
-                    cursor.execute(prepare_sql("""
-                        UPDATE daily_trades SET
-                            stock_name = ?,
-                            close_price = ?,
-                            avg_price = ?,
-                            prev_close = ?,
-                            open_price = ?,
-                            high_price = ?,
-                            low_price = ?,
-                            change = ?,
-                            change_percent = ?,
-                            total_volume = ?,
-                            prev_volume = ?,
-                            inner_volume = ?,
-                            outer_volume = ?,
-                            foreign_investor = ?,
-                            investment_trust = ?,
-                            dealer = ?,
-                            chips = ?,
-                            main_buy = ?,
-                            main_sell = ?,
-                            month_high = ?,
-                            month_low = ?,
-                            quarter_high = ?
-                        WHERE stock_code = ? AND date = ?
-                    """), (
-                        trade.get('stockName'),
-                        trade.get('closePrice'),
-                        trade.get('avgPrice'),
-                        trade.get('prevClose'),
-                        trade.get('openPrice'),
-                        trade.get('highPrice'),
-                        trade.get('lowPrice'),
-                        trade.get('change'),
-                        trade.get('changePercent'),
-                        trade.get('totalVolume'),
-                        trade.get('prevVolume'),
-                        trade.get('innerVolume'),
-                        trade.get('outerVolume'),
-                        trade.get('foreignInvestor'),
-                        trade.get('investmentTrust'),
-                        trade.get('dealer'),
-                        trade.get('chips'),
-                        trade.get('mainBuy'),
-                        trade.get('mainSell'),
-                        trade.get('monthHigh'),
-                        trade.get('monthLow'),
-                        trade.get('quarterHigh'),
-                        trade.get('stockCode'),
-                        trade.get('date')
-                    ))
-                else:
-                    # 插入
-                    record_id = str(uuid.uuid4())
-                    cursor.execute(prepare_sql("""
-                        INSERT INTO daily_trades (
-                            id, stock_code, stock_name, date, close_price, avg_price,
-                            prev_close, open_price, high_price, low_price, change,
-                            change_percent, total_volume, prev_volume, inner_volume,
-                            outer_volume, foreign_investor, investment_trust, dealer,
-                            chips, main_buy, main_sell, month_high, month_low, quarter_high
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """), (
-                        record_id,
-                        trade.get('stockCode'),
-                        trade.get('stockName'),
-                        trade.get('date'),
-                        trade.get('closePrice'),
-                        trade.get('avgPrice'),
-                        trade.get('prevClose'),
-                        trade.get('openPrice'),
-                        trade.get('highPrice'),
-                        trade.get('lowPrice'),
-                        trade.get('change'),
-                        trade.get('changePercent'),
-                        trade.get('totalVolume'),
-                        trade.get('prevVolume'),
-                        trade.get('innerVolume'),
-                        trade.get('outerVolume'),
-                        trade.get('foreignInvestor'),
-                        trade.get('investmentTrust'),
-                        trade.get('dealer'),
-                        trade.get('chips'),
-                        trade.get('mainBuy'),
-                        trade.get('mainSell'),
-                        trade.get('monthHigh'),
-                        trade.get('monthLow'),
-                        trade.get('quarterHigh')
-                    ))
-                
-                saved_count += 1
-                
-            except Exception as e:
-                logger.warning(f"保存單筆日交易數據失敗: {str(e)}")
-                continue
-        
-        conn.commit()
-        conn.close()
+        if is_daily_trades_partitioned():
+            # 分區表：略過保留期限之前的數據，並在寫入前建立缺少的分區
+            cutoff = daily_trades_retention_cutoff()
+            if cutoff:
+                daily_trades = [t for t in daily_trades if str(t.get('date')) >= cutoff.isoformat()]
+            ensure_daily_trade_partitions(t.get('date') for t in daily_trades)
+        
+        saved_count = _bulk_upsert(
+            'daily_trades', DAILY_TRADE_FIELDS, daily_trades, ['stock_code', 'date'],
+            defaults={'stock_code': stock_code}
+        )
         logger.info(f"成功保存 {saved_count}/{len(daily_trades)} 筆日交易數據: {stock_code}")
         return saved_count
         
     except Exception as e:
         logger.error(f"批量保存日交易數據失敗: {str(e)}")
-        return saved_count
+        return 0
+
+# ========== 財務報表批次保存 ==========
+
+INCOME_STATEMENT_FIELDS = [
+    ('stock_code', 'stockCode'),
+    ('stock_name', 'stockName'),
+    ('period', 'period'),
+    ('revenue', 'revenue'),
+    ('gross_profit', 'grossProfit'),
+    ('gross_profit_ratio', 'grossProfitRatio'),
+    ('operating_expenses', 'operatingExpenses'),
+    ('operating_expenses_ratio', 'operatingExpensesRatio'),
+    ('operating_income', 'operatingIncome'),
+    ('operating_income_ratio', 'operatingIncomeRatio'),
+    ('net_income', 'netIncome'),
+    ('other_income', 'otherIncome'),
+]
+
+BALANCE_SHEET_FIELDS = [
+    ('stock_code', 'stockCode'),
+    ('stock_name', 'stockName'),
+    ('period', 'period'),
+    ('total_assets', 'totalAssets'),
+    ('total_assets_ratio', 'totalAssetsRatio'),
+    ('shareholders_equity', 'shareholdersEquity'),
+    ('shareholders_equity_ratio', 'shareholdersEquityRatio'),
+    ('current_assets', 'currentAssets'),
+    ('current_assets_ratio', 'currentAssetsRatio'),
+    ('current_liabilities', 'currentLiabilities'),
+    ('current_liabilities_ratio', 'currentLiabilitiesRatio'),
+]
+
+CASH_FLOW_FIELDS = [
+    ('stock_code', 'stockCode'),
+    ('stock_name', 'stockName'),
+    ('period', 'period'),
+    ('operating_cash_flow', 'operatingCashFlow'),
+    ('investing_cash_flow', 'investingCashFlow'),
+    ('investing_cash_flow_ratio', 'investingCashFlowRatio'),
+    ('financing_cash_flow', 'financingCashFlow'),
+    ('financing_cash_flow_ratio', 'financingCashFlowRatio'),
+    ('free_cash_flow', 'freeCashFlow'),
+    ('free_cash_flow_ratio', 'freeCashFlowRatio'),
+    ('net_cash_flow', 'netCashFlow'),
+    ('net_cash_flow_ratio', 'netCashFlowRatio'),
+]
+
+def save_income_statements(statements: List[Dict]) -> int:
+    """批量保存損益表（以 stock_code + period 為鍵進行 upsert），返回成功保存的數量"""
+    if not statements:
+        return 0
+    try:
+        return _bulk_upsert('income_statements', INCOME_STATEMENT_FIELDS, statements,
+                            ['stock_code', 'period'], id_column='id', touch_updated_at=True)
+    except Exception as e:
+        logger.error(f"批量保存損益表失敗: {str(e)}")
+        return 0
+
+def save_balance_sheets(sheets: List[Dict]) -> int:
+    """批量保存資產負債表（以 stock_code + period 為鍵進行 upsert），返回成功保存的數量"""
+    if not sheets:
+        return 0
+    try:
+        return _bulk_upsert('balance_sheets', BALANCE_SHEET_FIELDS, sheets,
+                            ['stock_code', 'period'], id_column='id', touch_updated_at=True)
+    except Exception as e:
+        logger.error(f"批量保存資產負債表失敗: {str(e)}")
+        return 0
+
+def save_cash_flows(cash_flows: List[Dict]) -> int:
+    """批量保存現金流量表（以 stock_code + period 為鍵進行 upsert），返回成功保存的數量"""
+    if not cash_flows:
+        return 0
+    try:
+        return _bulk_upsert('cash_flows', CASH_FLOW_FIELDS, cash_flows,
+                            ['stock_code', 'period'], id_column='id', touch_updated_at=True)
+    except Exception as e:
+        logger.error(f"批量保存現金流量表失敗: {str(e)}")
+        return 0
+
+# ========== 歷史數據回補進度 ==========
+
+def get_backfill_progress(stock_codes: List[str]) -> Dict[str, Dict]:
+    """獲取股票的回補進度，返回 {stock_code: 進度}"""
+    if not stock_codes:
+        return {}
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        placeholders = ", ".join("?" for _ in stock_codes)
+        cursor.execute(prepare_sql(f"""
+            SELECT stock_code, status, days, rows_saved, last_date, attempts, error
+            FROM backfill_progress WHERE stock_code IN ({placeholders})
+        """), tuple(stock_codes))
+        rows = cursor.fetchall()
+        conn.close()
+        return {
+            row['stock_code']: {
+                'status': row['status'],
+                'days': row['days'],
+                'rowsSaved': row['rows_saved'],
+                'lastDate': row['last_date'],
+                'attempts': row['attempts'],
+                'error': row['error'],
+            }
+            for row in rows
+        }
+    except Exception as e:
+        logger.error(f"獲取回補進度失敗: {str(e)}")
+        return {}
+
+def save_backfill_progress(stock_code: str, status: str, days: int, rows_saved: int = 0,
+                           last_date: Optional[str] = None, error: Optional[str] = None) -> bool:
+    """記錄單檔股票的回補進度（status: done / failed）"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(prepare_sql("""
+            INSERT INTO backfill_progress (stock_code, status, days, rows_saved, last_date, attempts, error, updated_at)
+            VALUES (?, ?, ?, ?, ?, 1, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (stock_code) DO UPDATE SET
+                status = excluded.status,
+                days = excluded.days,
+                rows_saved = excluded.rows_saved,
+                last_date = excluded.last_date,
+                attempts = backfill_progress.attempts + 1,
+                error = excluded.error,
+                updated_at = CURRENT_TIMESTAMP
+        """), (stock_code, status, days, rows_saved, last_date, error))
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        logger.error(f"記錄回補進度失敗: {str(e)}")
+        return False
 
 # ========== 資料庫查詢操作（優先從資料庫讀取） ==========
 
@@ -503,54 +407,216 @@ def get_stock_basic_from_db(stock_code: str) -> Optional[Dict]:
         logger.error(f"從資料庫獲取股票基本資訊失敗: {str(e)}")
         return None
 
+def _format_trade_date(value) -> str:
+    """PostgreSQL 的 DATE 欄位返回 date 物件，統一轉為 API 使用的 YYYY-MM-DD 字串"""
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+def _daily_trade_row_to_dict(row) -> Dict:
+    """daily_trades 資料列轉為 API 使用的日交易記錄"""
+    return {
+        'stockCode': row['stock_code'],
+        'stockName': row['stock_name'],
+        'date': _format_trade_date(row['date']),
+        'closePrice': row['close_price'],
+        'avgPrice': row['avg_price'],
+        'prevClose': row['prev_close'],
+        'openPrice': row['open_price'],
+        'highPrice': row['high_price'],
+        'lowPrice': row['low_price'],
+        'change': row['change'],
+        'changePercent': row['change_percent'],
+        'totalVolume': row['total_volume'],
+        'prevVolume': row['prev_volume'],
+        'innerVolume': row['inner_volume'],
+        'outerVolume': row['outer_volume'],
+        'foreignInvestor': row['foreign_investor'],
+        'investmentTrust': row['investment_trust'],
+        'dealer': row['dealer'],
+        'chips': row['chips'],
+        'mainBuy': row['main_buy'],
+        'mainSell': row['main_sell'],
+        'monthHigh': row['month_high'],
+        'monthLow': row['month_low'],
+        'quarterHigh': row['quarter_high'],
+    }
+
 def get_daily_trades_from_db(stock_code: str, days: int = 5) -> List[Dict]:
     """從資料庫獲取日交易數據"""
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        cursor.execute(prepare_sql("""
-            SELECT * FROM daily_trades 
-            WHERE stock_code = ?
-            ORDER BY date DESC
-            LIMIT ?
-        """), (stock_code, days))
+        rows = []
+        if is_daily_trades_partitioned():
+            # 加上日期下限讓 PostgreSQL 只掃描最近的分區；
+            # N 個交易日約為 1.4N 個日曆日，留足假期餘裕，不足 N 筆時再查全部分區
+            since = date.today() - timedelta(days=days * 2 + 14)
+            cursor.execute(prepare_sql("""
+                SELECT * FROM daily_trades 
+                WHERE stock_code = ? AND date >= ?
+                ORDER BY date DESC
+                LIMIT ?
+            """), (stock_code, since, days))
+            rows = cursor.fetchall()
+        
+        if len(rows) < days:
+            cursor.execute(prepare_sql("""
+                SELECT * FROM daily_trades 
+                WHERE stock_code = ?
+                ORDER BY date DESC
+                LIMIT ?
+            """), (stock_code, days))
+            rows = cursor.fetchall()
+        conn.close()
+        
+        result = [_daily_trade_row_to_dict(row) for row in rows]
+        return result
+    except Exception as e:
+        logger.error(f"從資料庫獲取日交易數據失敗: {str(e)}")
+        return []
+
+def get_daily_trades_batch_from_db(stock_codes: List[str], days: int = 5) -> Dict[str, List[Dict]]:
+    """以單一查詢獲取多檔股票各自最近 days 筆日交易數據
+    
+    返回 {stock_code: 依日期降序的記錄}；沒有數據的股票不會出現在結果中。
+    每檔股票各自沿 (stock_code, date) 主鍵取前 N 筆（PostgreSQL 使用 LATERAL，
+    SQLite 使用 UNION ALL），不像 ROW_NUMBER() 視窗函數需要排序整段歷史。
+    """
+    if not stock_codes:
+        return {}
+    
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        date_filter = ""
+        since = None
+        if is_daily_trades_partitioned():
+            # 與單檔查詢相同，限制日期下限讓 PostgreSQL 只掃描最近的分區
+            date_filter = "AND date >= ?"
+            since = date.today() - timedelta(days=days * 2 + 14)
+        
+        if DB_TYPE == 'postgresql':
+            cursor.execute(prepare_sql(f"""
+                SELECT d.* FROM unnest(?::text[]) AS codes(code)
+                CROSS JOIN LATERAL (
+                    SELECT * FROM daily_trades
+                    WHERE stock_code = codes.code {date_filter}
+                    ORDER BY date DESC
+                    LIMIT ?
+                ) d
+                ORDER BY d.stock_code, d.date DESC
+            """), tuple([list(stock_codes)] + ([since] if since else []) + [days]))
+        else:
+            subquery = "SELECT * FROM (SELECT * FROM daily_trades WHERE stock_code = ? ORDER BY date DESC LIMIT ?)"
+            params = []
+            for stock_code in stock_codes:
+                params.extend((stock_code, days))
+            cursor.execute(f"""
+                SELECT * FROM ({' UNION ALL '.join(subquery for _ in stock_codes)})
+                ORDER BY stock_code, date DESC
+            """, tuple(params))
         
         rows = cursor.fetchall()
         conn.close()
         
-        result = []
+        result: Dict[str, List[Dict]] = {}
         for row in rows:
-            result.append({
-                'stockCode': row['stock_code'],
-                'stockName': row['stock_name'],
-                'date': row['date'],
-                'closePrice': row['close_price'],
-                'avgPrice': row['avg_price'],
-                'prevClose': row['prev_close'],
-                'openPrice': row['open_price'],
-                'highPrice': row['high_price'],
-                'lowPrice': row['low_price'],
-                'change': row['change'],
-                'changePercent': row['change_percent'],
-                'totalVolume': row['total_volume'],
-                'prevVolume': row['prev_volume'],
-                'innerVolume': row['inner_volume'],
-                'outerVolume': row['outer_volume'],
-                'foreignInvestor': row['foreign_investor'],
-                'investmentTrust': row['investment_trust'],
-                'dealer': row['dealer'],
-                'chips': row['chips'],
-                'mainBuy': row['main_buy'],
-                'mainSell': row['main_sell'],
-                'monthHigh': row['month_high'],
-                'monthLow': row['month_low'],
-                'quarterHigh': row['quarter_high'],
-            })
+            result.setdefault(row['stock_code'], []).append(_daily_trade_row_to_dict(row))
+        
+        if date_filter:
+            # 日期下限內不足 days 筆的股票改用單檔查詢（會查詢全部分區）
+            for stock_code in stock_codes:
+                if len(result.get(stock_code, [])) < days:
+                    rows_for_code = get_daily_trades_from_db(stock_code, days)
+                    if rows_for_code:
+                        result[stock_code] = rows_for_code
         return result
     except Exception as e:
-        logger.error(f"從資料庫獲取日交易數據失敗: {str(e)}")
-        return []
+        logger.error(f"批量從資料庫獲取日交易數據失敗: {str(e)}")
+        return {}
+
+def get_daily_trades_page_from_db(stock_code: str, limit: int, before: Optional[date] = None,
+                                  after: Optional[date] = None) -> Tuple[List[Dict], bool]:
+    """鍵集分頁獲取日交易數據
+    
+    before：取日期早於 before 的 limit 筆（往較舊翻頁）；after：取日期晚於 after 的 limit 筆
+    （往較新翻頁）；兩者皆未提供時為最近一頁。查詢沿 (stock_code, date) 主鍵從邊界開始掃描，
+    每頁成本與頁的深度無關。多取一筆判斷該方向是否還有更多。
+    返回 (依日期降序的記錄, 該方向是否還有更多)。
+    """
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        if after is not None:
+            cursor.execute(prepare_sql("""
+                SELECT * FROM daily_trades
+                WHERE stock_code = ? AND date > ?
+                ORDER BY date ASC
+                LIMIT ?
+            """), (stock_code, after, limit + 1))
+        elif before is not None:
+            cursor.execute(prepare_sql("""
+                SELECT * FROM daily_trades
+                WHERE stock_code = ? AND date < ?
+                ORDER BY date DESC
+                LIMIT ?
+            """), (stock_code, before, limit + 1))
+        else:
+            cursor.execute(prepare_sql("""
+                SELECT * FROM daily_trades
+                WHERE stock_code = ?
+                ORDER BY date DESC
+                LIMIT ?
+            """), (stock_code, limit + 1))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if after is not None:
+            rows.reverse()
+        return [_daily_trade_row_to_dict(row) for row in rows], has_more
+    except Exception as e:
+        logger.error(f"分頁從資料庫獲取日交易數據失敗: {str(e)}")
+        return [], False
+
+def iter_daily_trades_from_db(stock_codes: List[str], start_date: Optional[date] = None,
+                              end_date: Optional[date] = None, days: Optional[int] = None) -> Iterator[Dict]:
+    """逐筆產生多檔股票的日交易記錄（生成器，供串流匯出使用）
+    
+    依 stock_codes 的順序逐檔查詢，每檔依日期降序；start_date / end_date 為日期範圍（含），
+    days 為每檔股票最多筆數。每檔股票使用一個伺服器端游標，不會一次載入整段歷史。
+    查詢失敗時記錄錯誤後重新拋出，讓串流回應中斷（客戶端收到不完整的傳輸），
+    不會以看似完整的回應結束。
+    """
+    conditions = ["stock_code = ?"]
+    if start_date is not None:
+        conditions.append("date >= ?")
+    if end_date is not None:
+        conditions.append("date <= ?")
+    sql = prepare_sql(f"""
+        SELECT * FROM daily_trades
+        WHERE {' AND '.join(conditions)}
+        ORDER BY date DESC
+        {'LIMIT ?' if days is not None else ''}
+    """)
+    
+    for stock_code in stock_codes:
+        params = [stock_code]
+        if start_date is not None:
+            params.append(start_date)
+        if end_date is not None:
+            params.append(end_date)
+        if days is not None:
+            params.append(days)
+        try:
+            for row in iter_query_rows(sql, tuple(params)):
+                yield _daily_trade_row_to_dict(row)
+        except Exception as e:
+            logger.error(f"串流讀取日交易數據失敗 ({stock_code}): {str(e)}")
+            raise
 
 def get_income_statement_from_db(stock_code: str) -> Optional[Dict]:
     """從資料庫獲取最新損益表"""
@@ -2,7 +2,10 @@
 
 import logging
 import os
-from typing import Optional, Union
+import re
+import threading
+from datetime import date
+from typing import Optional, Union, List, Dict, Callable, Tuple
 from dotenv import load_dotenv
 
 # 載入環境變數
@@ -23,6 +26,29 @@ DB_PASSWORD = os.getenv('DB_PASSWORD', '')
 # SQLite 配置（作為備選）
 SQLITE_DB_PATH = os.getenv('SQLITE_DB_PATH', 'finfo.db')
 
+# SQLite 效能設定（WAL、每個執行緒重用連接、單一寫入通道）
+SQLITE_PERFORMANCE_PROFILE = os.getenv('SQLITE_PERFORMANCE_PROFILE', 'True').lower() == 'true'
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))  # 位元組
+SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', '-65536'))  # 負值表示 KiB（預設 64MB）
+SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000'))  # 毫秒
+
+# 串流查詢每次從伺服器端游標取回的筆數
+DB_STREAM_FETCH_SIZE = int(os.getenv('DB_STREAM_FETCH_SIZE', '1000'))
+
+# PostgreSQL 的 daily_trades 分區設定：none（不分區）、year 或 month
+DAILY_TRADES_PARTITIONING = os.getenv('DAILY_TRADES_PARTITIONING', 'none').lower()
+# 分區保留月數（0 表示永久保留）；超過的整個分區會被刪除
+DAILY_TRADES_RETENTION_MONTHS = int(os.getenv('DAILY_TRADES_RETENTION_MONTHS', '0'))
+
+# 每個執行緒閒置中的 SQLite 連接，以及進程內共用的寫入鎖
+_sqlite_local = threading.local()
+_sqlite_write_lock = threading.Lock()
+
+_SQLITE_READ_PREFIXES = ('SELECT', 'PRAGMA', 'EXPLAIN')
+_SQLITE_WRITE_KEYWORDS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
 def get_param_placeholder():
     """獲取資料庫參數佔位符
     PostgreSQL 使用 %s，SQLite 使用 ?
@@ -54,17 +80,171 @@ def get_db_connection():
             raise
     else:
         # 使用 SQLite 作為備選
-        import sqlite3
-        from pathlib import Path
+        if not SQLITE_PERFORMANCE_PROFILE:
+            return _open_sqlite_connection()
+        
+        # 重用當前執行緒閒置的連接（巢狀呼叫時另開一個連接）
+        raw_conn = getattr(_sqlite_local, 'conn', None)
+        if raw_conn is not None:
+            _sqlite_local.conn = None
+        else:
+            raw_conn = _open_sqlite_connection()
+        return _SQLiteConnection(raw_conn)
+
+def _open_sqlite_connection():
+    """開啟 SQLite 連接並套用效能設定"""
+    import sqlite3
+    from pathlib import Path
+    
+    db_path = Path(__file__).parent / SQLITE_DB_PATH
+    conn = sqlite3.connect(str(db_path), check_same_thread=False, timeout=SQLITE_BUSY_TIMEOUT / 1000)
+    conn.row_factory = sqlite3.Row
+    
+    if SQLITE_PERFORMANCE_PROFILE:
+        conn.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+        conn.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+        conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size = {SQLITE_CACHE_SIZE}")
+        conn.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT}")
+    return conn
+
+def _is_sqlite_write(sql: str) -> bool:
+    """判斷 SQL 語句是否需要寫入通道"""
+    statement = sql.lstrip().upper()
+    if statement.startswith(_SQLITE_READ_PREFIXES):
+        return False
+    if statement.startswith('WITH'):
+        return any(keyword in statement for keyword in _SQLITE_WRITE_KEYWORDS)
+    return True
+
+class _SQLiteCursor:
+    """SQLite 游標包裝：執行寫入語句前先取得寫入通道"""
+    
+    def __init__(self, connection: '_SQLiteConnection', cursor):
+        self._connection = connection
+        self._cursor = cursor
+    
+    def execute(self, sql, parameters=()):
+        if _is_sqlite_write(sql):
+            self._connection._acquire_writer()
+        self._cursor.execute(sql, parameters)
+        return self
+    
+    def executemany(self, sql, seq_of_parameters):
+        if _is_sqlite_write(sql):
+            self._connection._acquire_writer()
+        self._cursor.executemany(sql, seq_of_parameters)
+        return self
+    
+    def __iter__(self):
+        return iter(self._cursor)
+    
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class _SQLiteConnection:
+    """每個執行緒重用的 SQLite 連接
+    
+    - 寫入交易從第一條寫入語句開始持有進程內寫入鎖，commit/rollback 後釋放，
+      讓快取與 CRUD 的並發寫入依序進行，而不是互相競爭而出現 "database is locked"
+    - close() 結束未提交的交易並將連接放回當前執行緒，而非真正關閉
+    """
+    
+    def __init__(self, raw_conn):
+        self._conn = raw_conn
+        self._holds_writer = False
+        self._closed = False
+    
+    def cursor(self):
+        return _SQLiteCursor(self, self._conn.cursor())
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def _acquire_writer(self):
+        if self._holds_writer:
+            return
+        if not _sqlite_write_lock.acquire(timeout=SQLITE_BUSY_TIMEOUT / 1000):
+            import sqlite3
+            raise sqlite3.OperationalError("database is locked (等待寫入通道逾時)")
+        self._holds_writer = True
+    
+    def _release_writer(self):
+        if self._holds_writer:
+            self._holds_writer = False
+            _sqlite_write_lock.release()
+    
+    def commit(self):
+        try:
+            self._conn.commit()
+        finally:
+            self._release_writer()
+    
+    def rollback(self):
+        try:
+            self._conn.rollback()
+        finally:
+            self._release_writer()
+    
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if self._conn.in_transaction:
+                self._conn.rollback()
+        finally:
+            self._release_writer()
         
-        db_path = Path(__file__).parent / SQLITE_DB_PATH
-        conn = sqlite3.connect(str(db_path), check_same_thread=False)
-        conn.row_factory = sqlite3.Row
-        return conn
+        if getattr(_sqlite_local, 'conn', None) is None:
+            _sqlite_local.conn = self._conn
+        else:
+            self._conn.close()
+    
+    def __del__(self):
+        # 未呼叫 close() 的連接（例如例外路徑）在回收時也要釋放寫入鎖
+        try:
+            self.close()
+        except Exception:
+            pass
+    
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+def iter_query_rows(sql: str, parameters=(), fetch_size: int = DB_STREAM_FETCH_SIZE):
+    """以專用連接逐批取出查詢結果（生成器），記憶體用量只與 fetch_size 有關
+    
+    - PostgreSQL：在唯讀交易中使用具名（伺服器端）游標，每次只從伺服器取回 fetch_size 筆
+    - SQLite：開啟獨立連接（不使用執行緒重用的連接，生成器可能在不同執行緒間被推進），
+      以 fetchmany 逐批讀取
+    連接在生成器結束或被關閉（例如客戶端中斷下載）時釋放。sql 需已經過 prepare_sql 轉換。
+    """
+    if DB_TYPE == 'postgresql':
+        conn = get_db_connection()
+        conn.set_session(readonly=True)
+        cursor = conn.cursor(name=f"stream_{threading.get_ident()}_{id(conn)}")
+        cursor.itersize = fetch_size
+    else:
+        conn = _open_sqlite_connection()
+        cursor = conn.cursor()
+    
+    try:
+        cursor.execute(sql, parameters)
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        try:
+            cursor.close()
+        finally:
+            conn.close()
 
 def init_database():
     """初始化資料庫，創建所有必要的表格（支援 PostgreSQL 和 SQLite）"""
-    conn = get_db_connection()
+    # SQLite 使用獨立連接：初始化時開啟的 PRAGMA foreign_keys 不應留在重用的連接上
+    conn = get_db_connection() if DB_TYPE == 'postgresql' else _open_sqlite_connection()
     cursor = conn.cursor()
     
     try:
@@ -172,38 +352,8 @@ def init_database():
             )
         """)
         
-        # 創建日交易數據表格
-        cursor.execute(f"""
-            CREATE TABLE IF NOT EXISTS daily_trades (
-                id {text_type} PRIMARY KEY,
-                stock_code {text_type} NOT NULL,
-                stock_name {text_type},
-                date {text_type} NOT NULL,
-                close_price {real_type},
-                avg_price {real_type},
-                prev_close {real_type},
-                open_price {real_type},
-                high_price {real_type},
-                low_price {real_type},
-                change {real_type},
-                change_percent {real_type},
-                total_volume {integer_type},
-                prev_volume {integer_type},
-                inner_volume {integer_type},
-                outer_volume {integer_type},
-                foreign_investor {integer_type},
-                investment_trust {integer_type},
-                dealer {integer_type},
-                chips {integer_type},
-                main_buy {integer_type},
-                main_sell {integer_type},
-                month_high {real_type},
-                month_low {real_type},
-                quarter_high {real_type},
-                created_at TIMESTAMP {timestamp_default},
-                UNIQUE(stock_code, date)
-            )
-        """)
+        # 創建日交易數據表格（v2 結構：原生日期/浮點欄位，以 (stock_code, date) 為主鍵）
+        cursor.execute(_daily_trades_v2_ddl('daily_trades', partitioned=_partitioning_enabled()))
         
         # 創建股票群組表格
         cursor.execute(f"""
@@ -287,26 +437,6 @@ def init_database():
             ON stock_basics(stock_code)
         """)
         
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_income_stock_code 
-            ON income_statements(stock_code)
-        """)
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_balance_stock_code 
-            ON balance_sheets(stock_code)
-        """)
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_cashflow_stock_code 
-            ON cash_flows(stock_code)
-        """)
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_daily_trades_stock_code 
-            ON daily_trades(stock_code)
-        """)
-        
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_daily_trades_date 
             ON daily_trades(date)
@@ -338,6 +468,15 @@ def init_database():
         """)
         
         conn.commit()
+        
+        # 套用尚未執行的結構遷移（複合索引、欄位型別變更等）
+        run_migrations()
+        
+        if _partitioning_enabled():
+            ensure_daily_trades_partitioning()
+            drop_expired_daily_trade_partitions()
+        elif DB_TYPE == 'postgresql' and is_daily_trades_partitioned():
+            logger.warning("daily_trades 已分區但 DAILY_TRADES_PARTITIONING=none，保留現有分區結構")
         logger.info(f"資料庫初始化成功（使用 {DB_TYPE.upper()}）")
         
     except Exception as e:
@@ -353,6 +492,500 @@ def init_database():
         except:
             pass
 
+def _daily_trades_v2_ddl(table_name: str, partitioned: bool = False) -> str:
+    """日交易數據表 v2 結構的 CREATE TABLE 語句
+    
+    PostgreSQL 使用 DATE / DOUBLE PRECISION（psycopg2 返回 date / float 而非 Decimal）；
+    SQLite 沒有日期型別，日期保留 ISO 格式 TEXT，以隱含的整數 rowid 作為實體鍵
+    （每列約 200 位元組，實測 WITHOUT ROWID 反而比 rowid 表佔用更多空間）。
+    """
+    if DB_TYPE == 'postgresql':
+        date_type, real_type, integer_type = "DATE", "DOUBLE PRECISION", "BIGINT"
+    else:
+        date_type, real_type, integer_type = "TEXT", "REAL", "INTEGER"
+    
+    return f"""
+        CREATE TABLE IF NOT EXISTS {table_name} (
+            stock_code TEXT NOT NULL,
+            stock_name TEXT,
+            date {date_type} NOT NULL,
+            close_price {real_type},
+            avg_price {real_type},
+            prev_close {real_type},
+            open_price {real_type},
+            high_price {real_type},
+            low_price {real_type},
+            change {real_type},
+            change_percent {real_type},
+            total_volume {integer_type},
+            prev_volume {integer_type},
+            inner_volume {integer_type},
+            outer_volume {integer_type},
+            foreign_investor {integer_type},
+            investment_trust {integer_type},
+            dealer {integer_type},
+            chips {integer_type},
+            main_buy {integer_type},
+            main_sell {integer_type},
+            month_high {real_type},
+            month_low {real_type},
+            quarter_high {real_type},
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (stock_code, date)
+        ){" PARTITION BY RANGE (date)" if partitioned else ""}
+    """
+
+def get_table_columns(cursor, table_name: str) -> List[str]:
+    """獲取表格的欄位名稱（表不存在時返回空列表）"""
+    if DB_TYPE == 'postgresql':
+        from db_utils import prepare_sql
+        cursor.execute(prepare_sql("""
+            SELECT column_name AS name FROM information_schema.columns
+            WHERE table_name = ?
+        """), (table_name,))
+    else:
+        cursor.execute(f"PRAGMA table_info({table_name})")
+    return [row['name'] for row in cursor.fetchall()]
+
+def get_table_sizes(cursor, table_names: List[str]) -> Dict[str, Dict[str, int]]:
+    """獲取表格與其索引佔用的空間（位元組）
+    
+    返回 {表名: {'table_bytes': ..., 'index_bytes': ...}}；
+    SQLite 需要編譯時啟用 dbstat 虛擬表，不支援時返回空字典。
+    """
+    from db_utils import prepare_sql
+    
+    sizes = {}
+    if DB_TYPE == 'postgresql':
+        for table_name in table_names:
+            cursor.execute(prepare_sql("""
+                SELECT pg_relation_size(c.oid) AS table_bytes,
+                       pg_indexes_size(c.oid) AS index_bytes
+                FROM pg_class c
+                WHERE c.relname = ? AND c.relkind IN ('r', 'p')
+            """), (table_name,))
+            row = cursor.fetchone()
+            if row:
+                sizes[table_name] = {
+                    'table_bytes': int(row['table_bytes']),
+                    'index_bytes': int(row['index_bytes']),
+                }
+        return sizes
+    
+    try:
+        for table_name in table_names:
+            cursor.execute("SELECT COALESCE(SUM(pgsize), 0) AS size FROM dbstat WHERE name = ?", (table_name,))
+            table_bytes = cursor.fetchone()['size']
+            cursor.execute("""
+                SELECT COALESCE(SUM(pgsize), 0) AS size FROM dbstat
+                WHERE name IN (SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?)
+            """, (table_name,))
+            sizes[table_name] = {'table_bytes': table_bytes, 'index_bytes': cursor.fetchone()['size']}
+    except Exception as e:
+        logger.warning(f"無法獲取 SQLite 表格大小（dbstat 不可用）: {str(e)}")
+        return {}
+    return sizes
+
+def _format_table_size(size: Optional[Dict[str, int]]) -> str:
+    if not size:
+        return "未知"
+    return f"表 {size['table_bytes'] / 1024:.1f} KiB / 索引 {size['index_bytes'] / 1024:.1f} KiB"
+
+# ========== daily_trades 分區（僅 PostgreSQL） ==========
+
+_PARTITION_NAME_PATTERN = re.compile(r'^daily_trades_p(\d{4})(?:_(\d{2}))?$')
+
+# 已確認存在的分區名稱與 daily_trades 是否已分區（進程內快取）
+_known_partitions = set()
+_partitions_lock = threading.Lock()
+_daily_trades_partitioned: Optional[bool] = None
+
+def _partitioning_enabled() -> bool:
+    return DB_TYPE == 'postgresql' and DAILY_TRADES_PARTITIONING in ('year', 'month')
+
+def _add_months(value: date, months: int) -> date:
+    month_index = value.year * 12 + value.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+def daily_trade_partition_for(trade_date: date) -> Tuple[str, date, date]:
+    """返回日期所屬分區的 (名稱, 起始日, 結束日)，範圍為 [起始日, 結束日)"""
+    if DAILY_TRADES_PARTITIONING == 'month':
+        start = date(trade_date.year, trade_date.month, 1)
+        return f"daily_trades_p{start.year}_{start.month:02d}", start, _add_months(start, 1)
+    start = date(trade_date.year, 1, 1)
+    return f"daily_trades_p{start.year}", start, date(start.year + 1, 1, 1)
+
+def _parse_partition_end(partition_name: str) -> Optional[date]:
+    """從分區名稱推算分區的結束日（不符合命名規則時返回 None）"""
+    match = _PARTITION_NAME_PATTERN.match(partition_name)
+    if not match:
+        return None
+    year, month = int(match.group(1)), match.group(2)
+    if month:
+        return _add_months(date(year, int(month), 1), 1)
+    return date(year + 1, 1, 1)
+
+def _to_date(value) -> date:
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+def is_daily_trades_partitioned() -> bool:
+    """daily_trades 是否為 PostgreSQL 分區表（結果快取於進程內）"""
+    global _daily_trades_partitioned
+    if DB_TYPE != 'postgresql':
+        return False
+    if _daily_trades_partitioned is None:
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT relkind FROM pg_class WHERE relname = 'daily_trades'")
+            row = cursor.fetchone()
+            _daily_trades_partitioned = bool(row) and row['relkind'] == 'p'
+        finally:
+            conn.close()
+    return _daily_trades_partitioned
+
+def _list_daily_trade_partitions(cursor) -> List[str]:
+    cursor.execute("""
+        SELECT c.relname AS name FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = 'daily_trades'
+    """)
+    return [row['name'] for row in cursor.fetchall()]
+
+def _create_daily_trade_partitions(cursor, parent_table: str, dates) -> List[str]:
+    """為日期集合建立缺少的分區，返回本次建立的分區名稱"""
+    from db_utils import prepare_sql
+    
+    created = []
+    partitions = {daily_trade_partition_for(_to_date(d)) for d in dates if d}
+    for name, start, end in sorted(partitions, key=lambda p: p[1]):
+        if name in _known_partitions:
+            continue
+        cursor.execute(prepare_sql("SELECT to_regclass(?) AS oid"), (name,))
+        if cursor.fetchone()['oid'] is None:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {parent_table} "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+            created.append(name)
+        _known_partitions.add(name)
+    return created
+
+def ensure_daily_trade_partitions(dates) -> List[str]:
+    """確保寫入的日期都有對應分區（寫入 daily_trades 前呼叫；未分區時不做任何事）
+    
+    分區在獨立交易中建立並提交，避免寫入交易長時間持有父表的鎖；
+    建立新分區（進入新的年/月）時順便套用保留策略。
+    """
+    if not is_daily_trades_partitioned():
+        return []
+    
+    dates = list(dates)
+    with _partitions_lock:
+        missing = {daily_trade_partition_for(_to_date(d))[0] for d in dates if d} - _known_partitions
+        if not missing:
+            return []
+        
+        conn = get_db_connection()
+        try:
+            created = _create_daily_trade_partitions(conn.cursor(), 'daily_trades', dates)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    if created:
+        logger.info(f"已建立 daily_trades 分區: {', '.join(created)}")
+        drop_expired_daily_trade_partitions()
+    return created
+
+def daily_trades_retention_cutoff() -> Optional[date]:
+    """保留期限的起始日（早於此日的數據不再保存）；未設定保留策略時返回 None"""
+    if DAILY_TRADES_RETENTION_MONTHS <= 0:
+        return None
+    today = date.today()
+    return _add_months(date(today.year, today.month, 1), -DAILY_TRADES_RETENTION_MONTHS)
+
+def drop_expired_daily_trade_partitions() -> List[str]:
+    """刪除結束日早於保留期限的分區，返回被刪除的分區名稱"""
+    cutoff = daily_trades_retention_cutoff()
+    if cutoff is None or not is_daily_trades_partitioned():
+        return []
+    
+    conn = get_db_connection()
+    dropped = []
+    try:
+        cursor = conn.cursor()
+        for name in _list_daily_trade_partitions(cursor):
+            end = _parse_partition_end(name)
+            if end is not None and end <= cutoff:
+                cursor.execute(f"DROP TABLE IF EXISTS {name}")
+                dropped.append(name)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"刪除過期 daily_trades 分區失敗: {str(e)}")
+        return []
+    finally:
+        conn.close()
+    
+    with _partitions_lock:
+        _known_partitions.difference_update(dropped)
+    if dropped:
+        logger.info(f"已依保留策略（{DAILY_TRADES_RETENTION_MONTHS} 個月）刪除分區: {', '.join(dropped)}")
+    return dropped
+
+def ensure_daily_trades_partitioning():
+    """將未分區的 daily_trades 轉換為依日期範圍分區的表格（僅 PostgreSQL）
+    
+    依現有資料的日期建立分區並複製資料後替換舊表；複製期間舊表以 SHARE 模式鎖定，
+    讀取不受影響，寫入會等到轉換完成。已分區時不做任何事。
+    """
+    global _daily_trades_partitioned
+    if not _partitioning_enabled() or is_daily_trades_partitioned():
+        return
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("LOCK TABLE daily_trades IN SHARE MODE")
+        size_before = get_table_sizes(cursor, ['daily_trades']).get('daily_trades')
+        
+        cursor.execute("DROP TABLE IF EXISTS daily_trades_part")
+        cursor.execute(_daily_trades_v2_ddl('daily_trades_part', partitioned=True))
+        
+        cursor.execute("SELECT DISTINCT date_trunc('month', date)::date AS month FROM daily_trades")
+        months = [row['month'] for row in cursor.fetchall()]
+        _known_partitions.clear()
+        created = _create_daily_trade_partitions(cursor, 'daily_trades_part', months)
+        
+        cursor.execute("INSERT INTO daily_trades_part SELECT * FROM daily_trades")
+        row_count = cursor.rowcount
+        
+        cursor.execute("DROP TABLE daily_trades")
+        cursor.execute("ALTER TABLE daily_trades_part RENAME TO daily_trades")
+        cursor.execute("ALTER INDEX daily_trades_part_pkey RENAME TO daily_trades_pkey")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_daily_trades_date ON daily_trades(date)")
+        cursor.execute("ANALYZE daily_trades")
+        conn.commit()
+        
+        _daily_trades_partitioned = True
+        logger.info(
+            f"daily_trades 已轉換為依{'月' if DAILY_TRADES_PARTITIONING == 'month' else '年'}分區"
+            f"（{len(created)} 個分區，{row_count} 筆），轉換前 {_format_table_size(size_before)}"
+        )
+    except Exception as e:
+        conn.rollback()
+        _known_partitions.clear()
+        logger.error(f"daily_trades 分區轉換失敗: {str(e)}")
+        raise
+    finally:
+        conn.close()
+
+# ========== 結構遷移 ==========
+
+def _migration_001_composite_indexes(cursor):
+    """為「依股票代號取最新 N 筆」的查詢建立 (stock_code, date/period DESC) 複合索引
+    
+    單欄 stock_code 索引是複合索引的前綴，一併移除以減少寫入成本。
+    """
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_daily_trades_code_date
+        ON daily_trades(stock_code, date DESC)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_income_code_period
+        ON income_statements(stock_code, period DESC)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_balance_code_period
+        ON balance_sheets(stock_code, period DESC)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_cashflow_code_period
+        ON cash_flows(stock_code, period DESC)
+    """)
+    
+    for index_name in (
+        'idx_daily_trades_stock_code',
+        'idx_income_stock_code',
+        'idx_balance_stock_code',
+        'idx_cashflow_stock_code',
+    ):
+        cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+
+# 搬移資料時每批處理的股票數量，避免單一語句佔用過多記憶體
+DAILY_TRADES_MIGRATION_BATCH = 200
+
+def _migration_002_daily_trades_v2(cursor):
+    """將 daily_trades 轉換為 v2 結構（原生 DATE / 浮點欄位，(stock_code, date) 主鍵，移除 UUID id）
+    
+    以新表分批複製後替換舊表。PostgreSQL 複製期間以 SHARE 模式鎖定舊表：
+    讀取不受影響，寫入會等到遷移提交後再執行，不會遺失資料。
+    """
+    from db_utils import prepare_sql
+    
+    # 新安裝已直接建立 v2 結構，只需移除被主鍵取代的複合索引
+    if 'id' in get_table_columns(cursor, 'daily_trades'):
+        if DB_TYPE == 'postgresql':
+            cursor.execute("LOCK TABLE daily_trades IN SHARE MODE")
+            date_expr, real_cast = "date::date", "::double precision"
+        else:
+            date_expr, real_cast = "date", ""
+        
+        size_before = get_table_sizes(cursor, ['daily_trades']).get('daily_trades')
+        
+        cursor.execute("DROP TABLE IF EXISTS daily_trades_v2")
+        cursor.execute(_daily_trades_v2_ddl('daily_trades_v2'))
+        
+        real_columns = [
+            'close_price', 'avg_price', 'prev_close', 'open_price', 'high_price', 'low_price',
+            'change', 'change_percent', 'month_high', 'month_low', 'quarter_high',
+        ]
+        integer_columns = [
+            'total_volume', 'prev_volume', 'inner_volume', 'outer_volume', 'foreign_investor',
+            'investment_trust', 'dealer', 'chips', 'main_buy', 'main_sell',
+        ]
+        target_columns = ['stock_code', 'stock_name', 'date'] + real_columns + integer_columns + ['created_at']
+        source_columns = (
+            ['stock_code', 'stock_name', date_expr]
+            + [f"{column}{real_cast}" for column in real_columns]
+            + integer_columns
+            + ['created_at']
+        )
+        
+        cursor.execute("SELECT DISTINCT stock_code FROM daily_trades ORDER BY stock_code")
+        stock_codes = [row['stock_code'] for row in cursor.fetchall()]
+        for i in range(0, len(stock_codes), DAILY_TRADES_MIGRATION_BATCH):
+            batch = stock_codes[i:i + DAILY_TRADES_MIGRATION_BATCH]
+            placeholders = ", ".join("?" for _ in batch)
+            cursor.execute(prepare_sql(f"""
+                INSERT INTO daily_trades_v2 ({', '.join(target_columns)})
+                SELECT {', '.join(source_columns)} FROM daily_trades
+                WHERE stock_code IN ({placeholders})
+            """), tuple(batch))
+        
+        cursor.execute("DROP TABLE daily_trades")
+        cursor.execute("ALTER TABLE daily_trades_v2 RENAME TO daily_trades")
+        if DB_TYPE == 'postgresql':
+            cursor.execute("ALTER INDEX daily_trades_v2_pkey RENAME TO daily_trades_pkey")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_daily_trades_date ON daily_trades(date)")
+        cursor.execute("ANALYZE daily_trades")
+        
+        size_after = get_table_sizes(cursor, ['daily_trades']).get('daily_trades')
+        logger.info(
+            f"daily_trades 已轉換為 v2 結構（{len(stock_codes)} 檔股票）："
+            f"轉換前 {_format_table_size(size_before)}，轉換後 {_format_table_size(size_after)}"
+        )
+    
+    # (stock_code, date) 主鍵已涵蓋「依股票取最新 N 筆」的查詢
+    cursor.execute("DROP INDEX IF EXISTS idx_daily_trades_code_date")
+
+def _migration_003_backfill_progress(cursor):
+    """建立歷史數據回補的進度檢查點表（backfill.py 依此跳過已完成的股票）"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS backfill_progress (
+            stock_code TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            days INTEGER,
+            rows_saved INTEGER DEFAULT 0,
+            last_date TEXT,
+            attempts INTEGER DEFAULT 0,
+            error TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+# 版本化遷移列表：(版本號, 名稱, 遷移函數)
+# 新增遷移時只能附加在最後並使用遞增的版本號；已發佈的遷移不可修改
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, 'composite_indexes', _migration_001_composite_indexes),
+    (2, 'daily_trades_v2', _migration_002_daily_trades_v2),
+    (3, 'backfill_progress', _migration_003_backfill_progress),
+]
+
+def get_applied_migrations(cursor) -> List[int]:
+    """獲取已套用的遷移版本號"""
+    cursor.execute("SELECT version FROM schema_migrations ORDER BY version")
+    return [row['version'] for row in cursor.fetchall()]
+
+def run_migrations() -> List[int]:
+    """依版本號順序套用尚未執行的遷移，返回本次套用的版本號
+    
+    每個遷移在獨立的交易中執行並記錄到 schema_migrations；
+    遷移失敗時回滾該遷移並拋出異常，已成功的遷移不受影響。
+    """
+    from db_utils import prepare_sql
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    applied_now = []
+    
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.commit()
+        
+        applied = set(get_applied_migrations(cursor))
+        for version, name, migrate in MIGRATIONS:
+            if version in applied:
+                continue
+            
+            logger.info(f"套用資料庫遷移 {version:03d}_{name}")
+            try:
+                if DB_TYPE != 'postgresql':
+                    # SQLite 的 DDL 不會自動開始交易，明確開始以確保遷移的原子性
+                    cursor.execute("BEGIN")
+                migrate(cursor)
+                cursor.execute(
+                    prepare_sql("INSERT INTO schema_migrations (version, name) VALUES (?, ?)"),
+                    (version, name)
+                )
+                conn.commit()
+                applied_now.append(version)
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"資料庫遷移 {version:03d}_{name} 失敗: {str(e)}")
+                raise
+        
+        return applied_now
+    finally:
+        try:
+            conn.close()
+        except:
+            pass
+
+def explain_query_plan(sql: str, params: tuple = (), conn=None) -> List[str]:
+    """返回查詢計劃的文字描述（SQLite: EXPLAIN QUERY PLAN，PostgreSQL: EXPLAIN）
+    
+    可傳入現有連接（例如已調整規劃器設定的 PostgreSQL 連接）。
+    """
+    from db_utils import prepare_sql
+    
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        if DB_TYPE == 'postgresql':
+            cursor.execute(prepare_sql(f"EXPLAIN {sql}"), params)
+            return [row['QUERY PLAN'] for row in cursor.fetchall()]
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return [row['detail'] for row in cursor.fetchall()]
+    finally:
+        if own_conn:
+            conn.close()
+
 def test_db_connection() -> bool:
     """測試資料庫連接是否正常"""
     try:
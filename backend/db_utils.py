@@ -1,7 +1,13 @@
 # db_utils.py - 資料庫工具函數
 
+import os
+from typing import Iterable, List, Optional, Sequence
+
 from database import DB_TYPE
 
+# 批次筆數達到此門檻時，PostgreSQL 改用 COPY 載入（見 copy_upsert）
+BULK_COPY_THRESHOLD = int(os.getenv('BULK_COPY_THRESHOLD', '1000'))
+
 def prepare_sql(sql: str) -> str:
     """準備 SQL 語句，將 ? 替換為正確的參數佔位符
     
@@ -16,5 +22,94 @@ def prepare_sql(sql: str) -> str:
         # SQLite 使用 ?
         return sql
 
+def execute_batch_sql(cursor, sql: str, rows: list, page_size: int = 500):
+    """以批次方式執行同一語句（sql 使用 ? 佔位符）
+    
+    PostgreSQL 使用 psycopg2.extras.execute_batch 將多筆合併為一次往返，
+    SQLite 使用 executemany。
+    """
+    if not rows:
+        return
+    if DB_TYPE == 'postgresql':
+        from psycopg2.extras import execute_batch
+        execute_batch(cursor, prepare_sql(sql), rows, page_size=page_size)
+    else:
+        cursor.executemany(sql, rows)
 
+def _copy_text_value(value) -> str:
+    """將 Python 值轉為 COPY text 格式的欄位（None 為 \\N，並跳脫特殊字元）"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    text = value if isinstance(value, str) else str(value)
+    return (
+        text.replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
 
+class _CopyStream:
+    """以類檔案介面逐行產生 COPY 數據，避免先在記憶體組出整份內容"""
+    
+    def __init__(self, rows: Iterable[Sequence]):
+        self._lines = ('\t'.join(_copy_text_value(v) for v in row) + '\n' for row in rows)
+        self._buffer = ''
+    
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._buffer += line
+        if size < 0:
+            data, self._buffer = self._buffer, ''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+    
+    readline = read
+
+def copy_upsert(
+    cursor,
+    table: str,
+    columns: List[str],
+    rows: Iterable[Sequence],
+    conflict_columns: List[str],
+    update_columns: Optional[List[str]] = None,
+    touch_columns: Sequence[str] = ()
+) -> int:
+    """以 COPY 將數據串流到暫存表，再以單一 INSERT ... ON CONFLICT 合併到目標表（僅 PostgreSQL）
+    
+    暫存表中相同衝突鍵的多筆以最後一筆為準；update_columns 預設為衝突鍵以外的所有欄位，
+    touch_columns（例如 updated_at）在更新時設為 CURRENT_TIMESTAMP。返回合併的筆數。
+    呼叫端負責提交交易。
+    """
+    if DB_TYPE != 'postgresql':
+        raise RuntimeError("copy_upsert 僅支援 PostgreSQL")
+    
+    stage = f"_stage_{table}"
+    column_list = ', '.join(columns)
+    conflict_list = ', '.join(conflict_columns)
+    if update_columns is None:
+        update_columns = [c for c in columns if c not in conflict_columns]
+    assignments = [f"{c} = excluded.{c}" for c in update_columns]
+    assignments += [f"{c} = CURRENT_TIMESTAMP" for c in touch_columns]
+    
+    cursor.execute(f"DROP TABLE IF EXISTS {stage}")
+    cursor.execute(f"CREATE TEMP TABLE {stage} ON COMMIT DROP AS SELECT {column_list} FROM {table} WITH NO DATA")
+    cursor.execute(f"ALTER TABLE {stage} ADD COLUMN _seq BIGSERIAL")
+    cursor.copy_expert(f"COPY {stage} ({column_list}) FROM STDIN", _CopyStream(rows))
+    
+    conflict_action = f"DO UPDATE SET {', '.join(assignments)}" if assignments else "DO NOTHING"
+    cursor.execute(f"""
+        INSERT INTO {table} ({column_list})
+        SELECT DISTINCT ON ({conflict_list}) {column_list}
+        FROM {stage}
+        ORDER BY {conflict_list}, _seq DESC
+        ON CONFLICT ({conflict_list}) {conflict_action}
+    """)
+    merged = cursor.rowcount
+    cursor.execute(f"DROP TABLE IF EXISTS {stage}")
+    return merged
@@ -1,15 +1,15 @@
 # main.py 是後端主程式，負責提供 API 給前端存取
 
-from fastapi import FastAPI, HTTPException, Query, Path
+from fastapi import FastAPI, HTTPException, Query, Path, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse, HTMLResponse
+from fastapi.responses import JSONResponse, FileResponse, HTMLResponse, StreamingResponse
 from pydantic import BaseModel, EmailStr, Field
-from datetime import datetime
+from datetime import datetime, date
 import json
 import os
 import warnings
 import logging
-from typing import Optional, List
+from typing import Optional, List, Dict
 import sys
 from pathlib import Path as PathlibPath
 
@@ -25,6 +25,9 @@ try:
 		save_daily_trades,
 		get_stock_basic_from_db,
 		get_daily_trades_from_db,
+		get_daily_trades_batch_from_db,
+		get_daily_trades_page_from_db,
+		iter_daily_trades_from_db,
 		get_income_statement_from_db,
 		get_balance_sheet_from_db,
 		get_cash_flow_from_db,
@@ -58,6 +61,10 @@ try:
 		set_to_memory_cache,
 		get_cache_key,
 		get_cache_stats,
+		invalidate_cache_tags,
+		get_daily_trades_from_cache,
+		get_daily_trades_columnar_from_cache,
+		set_daily_trades_cache,
 		CACHE_TTL
 	)
 	from services.api_quota_tracker import quota_tracker
@@ -67,6 +74,21 @@ except ImportError as e:
 	CACHE_AVAILABLE = False
 	logging.warning(f"快取服務未找到: {str(e)}，將跳過快取功能")
 
+# 導入欄位式日線儲存（選用）
+try:
+	from core.config import COLUMNAR_STORE_ENABLED
+	from services.columnar_store import get_daily_trades_from_store, append_daily_bars
+except ImportError as e:
+	COLUMNAR_STORE_ENABLED = False
+	logging.warning(f"欄位式日線儲存未載入: {str(e)}")
+
+# 導入快速 JSON 回應類別（orjson，未載入時使用標準 JSONResponse）
+try:
+	from core.responses import FastJSONResponse
+except ImportError as e:
+	FastJSONResponse = JSONResponse
+	logging.warning(f"快速 JSON 回應類別未載入: {str(e)}")
+
 # 初始化資料庫（應用啟動時）
 if DB_AVAILABLE:
 	try:
@@ -87,11 +109,14 @@ try:
 	from services.yfinance_service import (
 		get_stock_info,
 		get_intraday_data,
+		get_intraday_columns,
 		get_daily_trade_data,
 		get_market_index_data,
+		get_market_index_columns,
 		get_financial_statements,
 		get_yfinance_ticker
 	)
+	from services.bar_series import columnar_payload, records_to_columns
 	# 圖表生成功能已禁用以避免錯誤
 	# from services.chart_service import generate_candlestick_chart
 except ImportError:
@@ -100,11 +125,14 @@ except ImportError:
 		from backend.services.yfinance_service import (
 			get_stock_info,
 			get_intraday_data,
+			get_intraday_columns,
 			get_daily_trade_data,
 			get_market_index_data,
+			get_market_index_columns,
 			get_financial_statements,
 			get_yfinance_ticker
 		)
+		from backend.services.bar_series import columnar_payload, records_to_columns
 		# 圖表生成功能已禁用以避免錯誤
 		# from backend.services.chart_service import generate_candlestick_chart
 	except ImportError:
@@ -113,11 +141,14 @@ except ImportError:
 		from services.yfinance_service import (
 			get_stock_info,
 			get_intraday_data,
+			get_intraday_columns,
 			get_daily_trade_data,
 			get_market_index_data,
+			get_market_index_columns,
 			get_financial_statements,
 			get_yfinance_ticker
 		)
+		from services.bar_series import columnar_payload, records_to_columns
 		# 圖表生成功能已禁用以避免錯誤
 		# from services.chart_service import generate_candlestick_chart
 
@@ -150,9 +181,28 @@ app = FastAPI(
 	""",
 	version="1.0.0",
 	docs_url="/docs",
-	redoc_url="/redoc"
+	redoc_url="/redoc",
+	default_response_class=FastJSONResponse
 )
 
+# 回應快取（需在 CORS 之前加入，使 CORS 標頭在快取命中時仍依請求來源產生）
+try:
+	from core.config import RESPONSE_CACHE_ENABLED
+	if CACHE_AVAILABLE and RESPONSE_CACHE_ENABLED:
+		from core.middleware import ResponseCacheMiddleware
+		app.add_middleware(ResponseCacheMiddleware)
+except ImportError as e:
+	logging.warning(f"回應快取中介層未載入: {str(e)}")
+
+# 回應壓縮（包在回應快取外層，只壓縮未命中的回應；命中時直接送出預先壓縮的版本）
+try:
+	from core.config import COMPRESSION_ENABLED
+	if COMPRESSION_ENABLED:
+		from core.middleware import CompressionMiddleware
+		app.add_middleware(CompressionMiddleware)
+except ImportError as e:
+	logging.warning(f"回應壓縮中介層未載入: {str(e)}")
+
 # 允許前端存取後端 API: 加入 CORS 中介層設定
 app.add_middleware(
 	CORSMiddleware,
@@ -165,6 +215,28 @@ app.add_middleware(
 	allow_headers=["*"],
 )
 
+# 應用程式啟動/關閉事件：管理快取背景任務
+@app.on_event("startup")
+async def startup_event():
+	"""應用程式啟動時執行"""
+	if CACHE_AVAILABLE and DB_AVAILABLE:
+		from core.config import CACHE_JANITOR_ENABLED, CACHE_WARM_START_ENABLED
+		from services.cache_service import start_cache_janitor, start_cache_warm_start
+		if CACHE_JANITOR_ENABLED:
+			start_cache_janitor()
+		if CACHE_WARM_START_ENABLED:
+			start_cache_warm_start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+	"""應用程式關閉時執行"""
+	from services.intraday_stream import intraday_stream_hub
+	intraday_stream_hub.stop()
+	if CACHE_AVAILABLE:
+		from services.cache_service import stop_cache_janitor, flush_db_cache_writes
+		stop_cache_janitor()
+		flush_db_cache_writes()
+
 # 聯絡表單資料模型
 class ContactForm(BaseModel):
 	"""
@@ -517,6 +589,35 @@ async def get_stock_information(
 		logger.error(f"[API 錯誤] 獲取股票資訊時發生錯誤: {str(e)}")
 		raise HTTPException(status_code=500, detail=f"獲取股票資訊時發生錯誤: {str(e)}")
 
+# K 棒類端點的 format 參數：records（每筆一個物件）或 columnar（每個欄位一個陣列，股票代號等共用值只出現一次）
+BAR_FORMAT_DESCRIPTION = "回應格式：records（每筆一個物件）或 columnar（{meta, columns} 欄位陣列，適合圖表）"
+BAR_FORMAT_PATTERN = "^(records|columnar)$"
+
+def _parse_intraday_since(value: Optional[str]) -> Optional[datetime]:
+	"""盤中數據 since 參數（ISO 日期時間，未指定時區時為交易所當地時間）"""
+	if not value:
+		return None
+	try:
+		return datetime.fromisoformat(value)
+	except ValueError:
+		raise HTTPException(status_code=400, detail="since 格式錯誤，請使用 YYYY-MM-DDTHH:MM:SS")
+
+def _daily_response(stock_code: str, data: List[Dict], source: str, format: str):
+	"""日交易回應（records：data 為記錄列表；columnar：meta + columns）"""
+	if format == 'columnar':
+		return FastJSONResponse({
+			"stockCode": stock_code,
+			"format": "columnar",
+			**columnar_payload(records_to_columns(data)),
+			"source": source
+		})
+	return FastJSONResponse({
+		"stockCode": stock_code,
+		"data": data,
+		"count": len(data),
+		"source": source
+	})
+
 # 獲取股票盤中即時數據（成交明細）
 @app.get(
 	"/api/stock/intraday/{stock_code}",
@@ -527,7 +628,9 @@ async def get_stock_information(
 async def get_stock_intraday(
 	stock_code: str = Path(..., description="股票代號（台灣股票為4位數字，例如：2330）", example="2330"),
 	period: str = Query("1d", description="時間週期，可選值: 1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max", example="1d"),
-	interval: str = Query("1m", description="時間間隔，可選值: 1m, 2m, 5m, 15m, 30m, 60m, 90m, 1h, 1d, 5d, 1wk, 1mo, 3mo", example="1m")
+	interval: str = Query("1m", description="時間間隔，可選值: 1m, 2m, 5m, 15m, 30m, 60m, 90m, 1h, 1d, 5d, 1wk, 1mo, 3mo", example="1m"),
+	format: str = Query("records", description=BAR_FORMAT_DESCRIPTION, pattern=BAR_FORMAT_PATTERN),
+	since: Optional[str] = Query(None, description="只返回時間不早於此時間的 K 棒（ISO 日期時間，例如 2024-01-15T10:30:00；傳入目前最後一根的時間，可取得該根的最終值與之後的新 K 棒）", example="2024-01-15T10:30:00")
 ):
 	"""
 	獲取股票盤中即時數據（成交明細）
@@ -550,6 +653,8 @@ async def get_stock_intraday(
 		- `15m`: 15分鐘
 		- `1h`: 1小時
 		- `1d`: 1天
+	- `format`: 回應格式（預設: records）；columnar 時返回 `{meta, columns}`，每個欄位一個陣列
+	- `since`: 只返回時間不早於此時間的 K 棒（ISO 日期時間）；傳入目前最後一根的時間即可只取得增量
 	
 	**響應示例:**
 	```json
@@ -570,8 +675,10 @@ async def get_stock_intraday(
 	```
 	
 	**錯誤響應:**
+	- `400`: since 格式錯誤
 	- `500`: 獲取盤中數據時發生錯誤
 	"""
+	since_time = _parse_intraday_since(since)
 	try:
 		# 記錄 API 請求信息
 		logger = logging.getLogger(__name__)
@@ -579,20 +686,61 @@ async def get_stock_intraday(
 		logger.info("=" * 80)
 		logger.info(f"[API 請求] GET /api/stock/intraday/{stock_code}")
 		logger.info(f"[參數] stock_code: {stock_code} -> yfinance ticker: {yfinance_ticker}")
-		logger.info(f"[參數] period: {period}, interval: {interval}")
+		logger.info(f"[參數] period: {period}, interval: {interval}, since: {since}")
 		logger.info("=" * 80)
 		
-		data = get_intraday_data(stock_code, period=period, interval=interval)
+		if format == 'columnar':
+			payload = columnar_payload(get_intraday_columns(stock_code, period=period, interval=interval, since=since_time))
+			logger.info(f"[API 響應] 成功獲取股票 {stock_code} 的盤中數據（欄位格式），共 {payload['count']} 筆")
+			return FastJSONResponse({"stockCode": stock_code, "format": "columnar", **payload})
+		
+		data = get_intraday_data(stock_code, period=period, interval=interval, since=since_time)
 		logger.info(f"[API 響應] 成功獲取股票 {stock_code} 的盤中數據，共 {len(data)} 筆")
-		return {
+		return FastJSONResponse({
 			"stockCode": stock_code,
 			"data": data,
 			"count": len(data)
-		}
+		})
 	except Exception as e:
 		logger.error(f"[API 錯誤] 獲取盤中數據時發生錯誤: {str(e)}")
 		raise HTTPException(status_code=500, detail=f"獲取盤中數據時發生錯誤: {str(e)}")
 
+# 訂閱盤中數據推送（SSE）
+@app.get(
+	"/api/stock/stream/intraday",
+	summary="訂閱盤中數據推送（SSE）",
+	description="以 Server-Sent Events 推送多個股票的盤中 1 分 K。連線後先收到每檔股票的 snapshot 事件（當日完整數據），"
+				"之後在有新增或更新的 K 棒時收到 bars 事件（依 date + time 覆寫合併）。"
+				"同一檔股票無論有多少訂閱者，伺服器只有一個輪詢任務，開盤時段每數秒更新一次。",
+	tags=["股票數據"]
+)
+async def stream_intraday(
+	stock_codes: str = Query(..., description="股票代號，用逗號分隔（例如: 2330,2317）", example="2330,2317")
+):
+	"""
+	訂閱盤中數據推送
+	
+	**事件:**
+	- `snapshot`: `{"stockCode", "data": [...]}`，當日完整數據，取代既有數據
+	- `bars`: `{"stockCode", "data": [...]}`，新增或更新的 K 棒
+	
+	**錯誤響應:**
+	- `400`: 未提供股票代號或超過每個連線的訂閱上限
+	"""
+	from core.config import INTRADAY_STREAM_MAX_CODES
+	from core.responses import EventStreamResponse
+	from services.intraday_stream import intraday_stream_hub
+	logger = logging.getLogger(__name__)
+	codes = list(dict.fromkeys(code.strip() for code in stock_codes.split(',') if code.strip()))
+	logger.info(f"[API 請求] GET /api/stock/stream/intraday, stock_codes: {codes}")
+	
+	if not codes:
+		raise HTTPException(status_code=400, detail="請提供至少一個股票代號")
+	if len(codes) > INTRADAY_STREAM_MAX_CODES:
+		raise HTTPException(status_code=400, detail=f"一次最多訂閱 {INTRADAY_STREAM_MAX_CODES} 個股票")
+	
+	return EventStreamResponse(intraday_stream_hub.stream(codes))
+
 # 獲取股票日交易檔數據
 @app.get(
 	"/api/stock/daily/{stock_code}",
@@ -602,7 +750,9 @@ async def get_stock_intraday(
 )
 async def get_stock_daily(
 	stock_code: str = Path(..., description="股票代號（台灣股票為4位數字，例如：2330）", example="2330"),
-	days: int = Query(5, description="獲取最近幾天的數據（範圍: 1-2000）", ge=1, le=2000, example=30)
+	days: int = Query(5, description="獲取最近幾天的數據（範圍: 1-2000）", ge=1, le=2000, example=30),
+	format: str = Query("records", description=BAR_FORMAT_DESCRIPTION, pattern=BAR_FORMAT_PATTERN),
+	response: Response = None
 ):
 	"""
 	獲取股票日交易數據
@@ -614,6 +764,7 @@ async def get_stock_daily(
 	
 	**查詢參數:**
 	- `days`: 獲取最近幾天的數據（範圍: 1-2000，預設: 5）
+	- `format`: 回應格式（預設: records）；columnar 時返回 `{meta, columns}`，每個欄位一個陣列
 	
 	**響應示例:**
 	```json
@@ -651,35 +802,47 @@ async def get_stock_daily(
 		logger.info(f"[參數] stock_code: {stock_code}, days: {days}")
 		logger.info("=" * 80)
 		
-		# 1. 嘗試從內存快取獲取
-		cache_key = get_cache_key('daily_trade', stock_code, days)
-		if CACHE_AVAILABLE:
-			cached_data = get_from_memory_cache(cache_key)
-			if cached_data is not None:
-				logger.info(f"[快取] 從內存快取獲取日交易數據: {stock_code}")
-				return {
+		# 1. 嘗試從內存快取獲取（每檔股票一份最寬視窗，較小的 days 直接切片）
+		if CACHE_AVAILABLE and format == 'columnar':
+			# 欄位格式直接由快取中的 BarSeries 輸出，不建立逐筆 dict
+			cached_columnar = get_daily_trades_columnar_from_cache(stock_code, days)
+			if cached_columnar is not None:
+				logger.info(f"[快取] 從內存快取獲取日交易數據（欄位格式）: {stock_code}")
+				return FastJSONResponse({
 					"stockCode": stock_code,
-					"data": cached_data,
-					"count": len(cached_data),
+					"format": "columnar",
+					**cached_columnar,
 					"source": "cache"
-				}
+				})
+		elif CACHE_AVAILABLE:
+			cached_data = get_daily_trades_from_cache(stock_code, days)
+			if cached_data is not None:
+				logger.info(f"[快取] 從內存快取獲取日交易數據: {stock_code}")
+				return _daily_response(stock_code, cached_data, "cache", format)
+		
+		# 2. 嘗試從欄位儲存獲取
+		if COLUMNAR_STORE_ENABLED:
+			# 欄位儲存只保存先前寫入的視窗，筆數不足 days 時改查資料庫
+			store_data = get_daily_trades_from_store(stock_code, days)
+			if len(store_data) >= days:
+				logger.info(f"[欄位儲存] 從欄位儲存獲取日交易數據: {stock_code}, 共 {len(store_data)} 筆")
+				if CACHE_AVAILABLE:
+					set_daily_trades_cache(stock_code, days, store_data)
+				return _daily_response(stock_code, store_data, "columnar", format)
 		
-		# 2. 嘗試從資料庫獲取
+		# 3. 嘗試從資料庫獲取
 		if DB_AVAILABLE:
 			db_data = get_daily_trades_from_db(stock_code, days)
 			if db_data and len(db_data) > 0:
 				logger.info(f"[資料庫] 從資料庫獲取日交易數據: {stock_code}, 共 {len(db_data)} 筆")
 				# 放入快取
 				if CACHE_AVAILABLE:
-					set_to_memory_cache(cache_key, db_data, CACHE_TTL['daily_trade'])
-				return {
-					"stockCode": stock_code,
-					"data": db_data,
-					"count": len(db_data),
-					"source": "database"
-				}
+					set_daily_trades_cache(stock_code, days, db_data)
+				if COLUMNAR_STORE_ENABLED:
+					append_daily_bars(stock_code, db_data)
+				return _daily_response(stock_code, db_data, "database", format)
 		
-		# 3. 檢查 API 限額
+		# 4. 檢查 API 限額
 		if CACHE_AVAILABLE:
 			rate_limits = quota_tracker.check_rate_limit()
 			if not rate_limits['minute_ok']:
@@ -687,11 +850,13 @@ async def get_stock_daily(
 			if not rate_limits['hour_ok']:
 				logger.warning("[API 限額] 每小時請求數已達上限，請稍後再試")
 		
-		# 4. 從 yfinance API 獲取
+		# 5. 從 yfinance API 獲取
 		yfinance_ticker = get_yfinance_ticker(stock_code)
 		logger.info(f"[API] 從 yfinance 獲取日交易數據: {stock_code} -> {yfinance_ticker}")
 		
 		data = get_daily_trade_data(stock_code, days=days)
+		# yfinance 為日期升序，統一為資料庫與快取的日期降序，回應順序不因來源而不同
+		data.sort(key=lambda trade: str(trade.get('date') or ''), reverse=True)
 		response_time = time.time() - start_time
 		
 		# 記錄 API 請求
@@ -702,6 +867,8 @@ async def get_stock_daily(
 		
 		# 如果數據為空，返回警告信息但不拋出錯誤
 		if len(data) == 0:
+			# 診斷結果不應被回應快取保存
+			response.headers["Cache-Control"] = "no-store"
 			logger.warning(f"股票 {stock_code} 的數據為空，開始診斷...")
 			# 嘗試獲取股票信息來驗證股票代號是否有效
 			from services.yfinance_service import get_stock_info
@@ -737,10 +904,14 @@ async def get_stock_daily(
 		
 		logger.info(f"成功返回股票 {stock_code} 的數據，共 {len(data)} 筆")
 		
-		# 5. 保存到快取和資料庫
+		# 6. 保存到快取、欄位儲存和資料庫
 		if len(data) > 0:
 			if CACHE_AVAILABLE:
-				set_to_memory_cache(cache_key, data, CACHE_TTL['daily_trade'])
+				set_daily_trades_cache(stock_code, days, data)
+			
+			if COLUMNAR_STORE_ENABLED:
+				appended = append_daily_bars(stock_code, data)
+				logger.info(f"[欄位儲存] 已寫入 {appended} 筆日交易數據: {stock_code}")
 			
 			if DB_AVAILABLE:
 				try:
@@ -749,12 +920,7 @@ async def get_stock_daily(
 				except Exception as e:
 					logger.warning(f"[資料庫] 保存日交易數據失敗: {str(e)}")
 		
-		return {
-			"stockCode": stock_code,
-			"data": data,
-			"count": len(data),
-			"source": "api"
-		}
+		return _daily_response(stock_code, data, "api", format)
 	except Exception as e:
 		import logging
 		logger = logging.getLogger(__name__)
@@ -763,6 +929,77 @@ async def get_stock_daily(
 		logger.error(f"錯誤堆棧:\n{traceback.format_exc()}")
 		raise HTTPException(status_code=500, detail=f"獲取日交易數據時發生錯誤: {str(e)}")
 
+MAX_DAILY_PAGE_SIZE = 500
+
+def _daily_page_response(stock_code: str, data: List[Dict], limit: int, next_cursor: Optional[str],
+						 prev_cursor: Optional[str], source: str, format: str):
+	"""日交易分頁回應（依日期降序；nextCursor 往較舊、prevCursor 往較新，沒有更多時為 null）"""
+	if format == 'columnar':
+		content = {"stockCode": stock_code, "format": "columnar", **columnar_payload(records_to_columns(data))}
+	else:
+		content = {"stockCode": stock_code, "data": data, "count": len(data)}
+	content.update({"limit": limit, "nextCursor": next_cursor, "prevCursor": prev_cursor, "source": source})
+	return FastJSONResponse(content)
+
+# 分頁獲取股票日交易數據（鍵集分頁）
+@app.get(
+	"/api/stock/daily/{stock_code}/page",
+	summary="分頁獲取股票日交易數據",
+	description="以鍵集分頁瀏覽完整的日交易歷史（依日期降序，游標記錄 (股票代號, 日期) 邊界）。"
+				"不帶 cursor 時為最近一頁（與日交易 API 共用內存快取），之後以回應中的 nextCursor 往較舊、"
+				"prevCursor 往較新翻頁；每頁只沿主鍵索引讀取 limit 筆，翻到多深成本都相同。",
+	tags=["股票數據"]
+)
+async def get_stock_daily_page(
+	stock_code: str = Path(..., description="股票代號（台灣股票為4位數字，例如：2330）", example="2330"),
+	limit: int = Query(100, description=f"每頁筆數（範圍: 1-{MAX_DAILY_PAGE_SIZE}）", ge=1, le=MAX_DAILY_PAGE_SIZE, example=100),
+	cursor: Optional[str] = Query(None, description="上一個回應的 nextCursor 或 prevCursor；不提供時為最近一頁"),
+	format: str = Query("records", description=BAR_FORMAT_DESCRIPTION, pattern=BAR_FORMAT_PATTERN)
+):
+	"""分頁獲取股票日交易數據（只讀取快取與資料庫，不會向 yfinance 請求）"""
+	from utils.pagination import encode_cursor, decode_cursor
+	logger = logging.getLogger(__name__)
+	logger.info("=" * 80)
+	logger.info(f"[API 請求] GET /api/stock/daily/{stock_code}/page")
+	logger.info(f"[參數] stock_code: {stock_code}, limit: {limit}, cursor: {cursor}")
+	logger.info("=" * 80)
+	
+	if cursor is None:
+		# 最近一頁：與日交易 API 共用快取視窗，多取一筆判斷是否還有較舊的數據
+		# 快取視窗可能少於 days 筆（例如 yfinance 以日曆天抓取），筆數不足 limit + 1 時無法判斷，改查資料庫
+		rows = get_daily_trades_from_cache(stock_code, limit + 1) if CACHE_AVAILABLE else None
+		source = "cache"
+		if rows is None or (len(rows) <= limit and DB_AVAILABLE):
+			if not DB_AVAILABLE:
+				raise HTTPException(status_code=503, detail="資料庫未啟用，無法分頁獲取日交易數據")
+			rows = get_daily_trades_from_db(stock_code, limit + 1)
+			source = "database"
+			if rows and CACHE_AVAILABLE:
+				set_daily_trades_cache(stock_code, limit + 1, rows)
+		data = rows[:limit]
+		has_older = len(rows) > limit
+		has_newer = False
+		logger.info(f"[{'快取' if source == 'cache' else '資料庫'}] 獲取最近一頁日交易數據: {stock_code}, 共 {len(data)} 筆")
+	else:
+		decoded = decode_cursor(cursor)
+		if decoded is None or decoded[0] != stock_code:
+			raise HTTPException(status_code=400, detail="cursor 無效")
+		if not DB_AVAILABLE:
+			raise HTTPException(status_code=503, detail="資料庫未啟用，無法分頁獲取日交易數據")
+		_, boundary, direction = decoded
+		source = "database"
+		if direction == 'newer':
+			data, has_newer = get_daily_trades_page_from_db(stock_code, limit, after=boundary)
+			has_older = True
+		else:
+			data, has_older = get_daily_trades_page_from_db(stock_code, limit, before=boundary)
+			has_newer = True
+		logger.info(f"[資料庫] 分頁獲取日交易數據（{direction}）: {stock_code}, 共 {len(data)} 筆")
+	
+	next_cursor = encode_cursor(stock_code, data[-1]['date'], 'older') if data and has_older else None
+	prev_cursor = encode_cursor(stock_code, data[0]['date'], 'newer') if data and has_newer else None
+	return _daily_page_response(stock_code, data, limit, next_cursor, prev_cursor, source, format)
+
 # 批量獲取多個股票的基本資訊
 @app.get(
 	"/api/stock/batch",
@@ -843,6 +1080,160 @@ async def get_multiple_stocks(
 		logger.error(f"[API 錯誤] 批量獲取股票資訊時發生錯誤: {str(e)}")
 		raise HTTPException(status_code=500, detail=f"批量獲取股票資訊時發生錯誤: {str(e)}")
 
+# 批量獲取多個股票的日交易數據
+# 批量日交易查詢一次最多的股票數量
+MAX_BATCH_DAILY_CODES = 100
+
+
+@app.get(
+	"/api/stock/batch/daily",
+	summary="批量獲取日交易數據",
+	description="一次獲取多個股票最近 N 天的日交易數據（以單一資料庫查詢取得），結果依股票代號分組。"
+)
+async def get_multiple_daily_trades(
+	stock_codes: str = Query(..., description="股票代號，用逗號分隔（例如: 2330,2317,2454）", example="2330,2317,2454"),
+	days: int = Query(5, description="每個股票獲取最近幾天的數據（範圍: 1-2000）", ge=1, le=2000, example=30)
+):
+	"""批量獲取多個股票的日交易數據
+	
+	依序使用內存快取、欄位儲存、資料庫（單一查詢）與 yfinance，
+	後面的來源只會查詢前面來源尚未涵蓋 days 的股票。涵蓋與否與單一股票 API 相同，不比較筆數
+	（yfinance 以日曆天抓取，筆數通常少於 days）：快取依記錄的視窗天數、欄位儲存需有 days 筆、
+	資料庫與 yfinance 以 days 查詢到的結果即視為涵蓋。
+	"""
+	try:
+		import time
+		logger = logging.getLogger(__name__)
+		codes = list(dict.fromkeys(code.strip() for code in stock_codes.split(',') if code.strip()))
+		logger.info("=" * 80)
+		logger.info(f"[API 請求] GET /api/stock/batch/daily")
+		logger.info(f"[參數] stock_codes: {codes}, days: {days}")
+		logger.info("=" * 80)
+		
+		if not codes:
+			raise HTTPException(status_code=400, detail="請提供至少一個股票代號")
+		if len(codes) > MAX_BATCH_DAILY_CODES:
+			raise HTTPException(status_code=400, detail=f"一次最多查詢 {MAX_BATCH_DAILY_CODES} 個股票")
+		
+		data: Dict[str, List[Dict]] = {}
+		sources: Dict[str, str] = {}
+		
+		# 1. 內存快取
+		if CACHE_AVAILABLE:
+			for code in codes:
+				cached_data = get_daily_trades_from_cache(code, days)
+				if cached_data is not None:
+					data[code], sources[code] = cached_data, "cache"
+		
+		# 2. 欄位儲存
+		if COLUMNAR_STORE_ENABLED:
+			for code in codes:
+				if code in data:
+					continue
+				store_data = get_daily_trades_from_store(code, days)
+				if len(store_data) >= days:
+					data[code], sources[code] = store_data, "columnar"
+					if CACHE_AVAILABLE:
+						set_daily_trades_cache(code, days, store_data)
+		
+		# 3. 資料庫（單一查詢，只查詢尚未涵蓋的股票）
+		missing = [code for code in codes if code not in data]
+		if DB_AVAILABLE and missing:
+			db_results = get_daily_trades_batch_from_db(missing, days)
+			for code, db_data in db_results.items():
+				data[code], sources[code] = db_data, "database"
+				if CACHE_AVAILABLE:
+					set_daily_trades_cache(code, days, db_data)
+				if COLUMNAR_STORE_ENABLED:
+					append_daily_bars(code, db_data)
+		
+		# 4. yfinance（僅查詢前面都沒有數據的股票）
+		for code in [code for code in codes if code not in data]:
+			if CACHE_AVAILABLE:
+				rate_limits = quota_tracker.check_rate_limit()
+				if not rate_limits['minute_ok'] or not rate_limits['hour_ok']:
+					logger.warning(f"[API 限額] 已達上限，略過剩餘股票的 yfinance 查詢")
+					break
+			
+			request_start = time.time()
+			api_data = get_daily_trade_data(code, days=days)
+			api_data.sort(key=lambda trade: str(trade.get('date') or ''), reverse=True)
+			if CACHE_AVAILABLE:
+				quota_tracker.record_request('daily_trade', code, len(api_data) > 0, time.time() - request_start)
+			if not api_data:
+				continue
+			
+			data[code], sources[code] = api_data, "api"
+			if CACHE_AVAILABLE:
+				set_daily_trades_cache(code, days, api_data)
+			if COLUMNAR_STORE_ENABLED:
+				append_daily_bars(code, api_data)
+			if DB_AVAILABLE:
+				save_daily_trades(code, api_data)
+		
+		missing = [code for code in codes if code not in data]
+		logger.info(f"[API 響應] 成功獲取 {len(data)}/{len(codes)} 個股票的日交易數據")
+		return FastJSONResponse({
+			"data": {code: data[code] for code in codes if code in data},
+			"counts": {code: len(data[code]) for code in codes if code in data},
+			"sources": {code: sources[code] for code in codes if code in sources},
+			"missing": missing,
+			"count": len(data)
+		})
+	except HTTPException:
+		raise
+	except Exception as e:
+		logger = logging.getLogger(__name__)
+		logger.error(f"[API 錯誤] 批量獲取日交易數據時發生錯誤: {str(e)}")
+		raise HTTPException(status_code=500, detail=f"批量獲取日交易數據時發生錯誤: {str(e)}")
+
+def _parse_export_date(value: Optional[str], name: str) -> Optional[date]:
+	if not value:
+		return None
+	try:
+		return date.fromisoformat(value)
+	except ValueError:
+		raise HTTPException(status_code=400, detail=f"{name} 格式錯誤，請使用 YYYY-MM-DD")
+
+# 串流匯出日交易數據
+@app.get(
+	"/api/stock/export/daily",
+	summary="串流匯出日交易數據",
+	description="以 NDJSON 或 CSV 串流匯出多個股票在指定日期範圍內的日交易數據（依股票代號順序，每檔依日期降序），"
+				"由資料庫伺服器端游標逐批讀取，適合匯出長期歷史。",
+	tags=["股票數據"]
+)
+async def export_daily_trades(
+	stock_codes: str = Query(..., description="股票代號，用逗號分隔（例如: 2330,2317,2454）", example="2330,2317"),
+	start_date: Optional[str] = Query(None, description="起始日期（含，YYYY-MM-DD）", example="2020-01-01"),
+	end_date: Optional[str] = Query(None, description="結束日期（含，YYYY-MM-DD）", example="2024-12-31"),
+	days: Optional[int] = Query(None, description="每個股票最多匯出最近幾筆", ge=1, example=2000),
+	format: str = Query("ndjson", description="匯出格式：ndjson 或 csv", pattern="^(ndjson|csv)$")
+):
+	"""串流匯出日交易數據（只讀取資料庫，不會向 yfinance 請求）"""
+	logger = logging.getLogger(__name__)
+	codes = list(dict.fromkeys(code.strip() for code in stock_codes.split(',') if code.strip()))
+	logger.info("=" * 80)
+	logger.info(f"[API 請求] GET /api/stock/export/daily")
+	logger.info(f"[參數] stock_codes: {codes}, start_date: {start_date}, end_date: {end_date}, days: {days}, format: {format}")
+	logger.info("=" * 80)
+	
+	if not codes:
+		raise HTTPException(status_code=400, detail="請提供至少一個股票代號")
+	if len(codes) > MAX_BATCH_DAILY_CODES:
+		raise HTTPException(status_code=400, detail=f"一次最多匯出 {MAX_BATCH_DAILY_CODES} 個股票")
+	if not DB_AVAILABLE:
+		raise HTTPException(status_code=503, detail="資料庫未啟用，無法匯出日交易數據")
+	start = _parse_export_date(start_date, "start_date")
+	end = _parse_export_date(end_date, "end_date")
+	
+	from services.export_service import iter_export, EXPORT_MEDIA_TYPES
+	records = iter_daily_trades_from_db(codes, start_date=start, end_date=end, days=days)
+	headers = {}
+	if format == 'csv':
+		headers["Content-Disposition"] = f'attachment; filename="daily_trades_{"_".join(codes[:5])}.csv"'
+	return StreamingResponse(iter_export(records, format), media_type=EXPORT_MEDIA_TYPES[format], headers=headers)
+
 # 獲取大盤指數數據
 @app.get(
 	"/api/stock/market-index",
@@ -852,7 +1243,8 @@ async def get_multiple_stocks(
 )
 async def get_market_index(
 	index_code: str = Query("^TWII", description="指數代號，預設為 ^TWII (加權指數)，其他選項: ^TWOII (櫃買指數)", example="^TWII"),
-	days: int = Query(5, description="獲取最近幾天的數據（範圍: 1-30）", ge=1, le=30, example=10)
+	days: int = Query(5, description="獲取最近幾天的數據（範圍: 1-30）", ge=1, le=30, example=10),
+	format: str = Query("records", description=BAR_FORMAT_DESCRIPTION, pattern=BAR_FORMAT_PATTERN)
 ):
 	"""
 	獲取大盤指數數據
@@ -864,6 +1256,7 @@ async def get_market_index(
 		- `^TWII`: 加權指數（上市）
 		- `^TWOII`: 櫃買指數（上櫃）
 	- `days`: 獲取最近幾天的數據（範圍: 1-30，預設: 5）
+	- `format`: 回應格式（預設: records）；columnar 時返回 `{meta, columns}`，每個欄位一個陣列
 	
 	**響應示例:**
 	```json
@@ -895,13 +1288,18 @@ async def get_market_index(
 		logger.info(f"[參數] days: {days}")
 		logger.info("=" * 80)
 		
+		if format == 'columnar':
+			payload = columnar_payload(get_market_index_columns(index_code, days=days))
+			logger.info(f"[API 響應] 成功獲取指數 {index_code} 的數據（欄位格式），共 {payload['count']} 筆")
+			return FastJSONResponse({"indexCode": index_code, "format": "columnar", **payload})
+		
 		data = get_market_index_data(index_code, days=days)
 		logger.info(f"[API 響應] 成功獲取指數 {index_code} 的數據，共 {len(data)} 筆")
-		return {
+		return FastJSONResponse({
 			"indexCode": index_code,
 			"data": data,
 			"count": len(data)
-		}
+		})
 	except Exception as e:
 		logger.error(f"[API 錯誤] 獲取大盤指數數據時發生錯誤: {str(e)}")
 		raise HTTPException(status_code=500, detail=f"獲取大盤指數數據時發生錯誤: {str(e)}")
@@ -1919,7 +2317,7 @@ async def get_api_quota_stats():
 @app.get(
 	"/api/stats/cache",
 	summary="獲取快取統計",
-	description="獲取內存快取的統計信息，包括快取鍵數量、快取大小等。",
+	description="獲取內存快取的統計信息，包括快取鍵數量、快取大小，以及各快取類型的命中/未命中/淘汰次數。",
 	tags=["統計"]
 )
 async def get_cache_stats_endpoint():
@@ -1930,7 +2328,8 @@ async def get_cache_stats_endpoint():
 	- 總快取鍵數
 	- 有效快取鍵數
 	- 過期快取鍵數
-	- 快取大小（MB）
+	- 快取大小（MB，寫入時記錄的序列化大小）
+	- 各快取類型的筆數、大小與命中/未命中/淘汰次數
 	
 	**響應示例:**
 	```json
@@ -1938,7 +2337,18 @@ async def get_cache_stats_endpoint():
 		"total_keys": 50,
 		"valid_keys": 45,
 		"expired_keys": 5,
-		"cache_size_mb": 2.5
+		"cache_size_mb": 2.5,
+		"by_type": {
+			"daily_trade": {
+				"entries": 20,
+				"hits": 120,
+				"misses": 20,
+				"evictions": 3,
+				"invalidations": 0,
+				"size_mb": 1.8,
+				"hit_rate": 0.857
+			}
+		}
 	}
 	```
 	"""
@@ -1948,6 +2358,68 @@ async def get_cache_stats_endpoint():
 	stats = get_cache_stats()
 	return stats
 
+@app.get(
+	"/api/stats/intraday-stream",
+	summary="獲取盤中推送統計",
+	description="獲取盤中數據推送（SSE）的統計信息，包括輪詢中的股票與訂閱者數、連線數、輪詢與事件次數，以及因客戶端過慢而丟棄的事件數。",
+	tags=["統計"]
+)
+async def get_intraday_stream_stats():
+	"""獲取盤中推送統計"""
+	from services.intraday_stream import intraday_stream_hub
+	return intraday_stream_hub.get_stats()
+
+class CacheInvalidateRequest(BaseModel):
+	"""依標籤清除快取的請求模型"""
+	stockCodes: List[str] = Field(default_factory=list, description="股票代號（清除該股票的所有快取）", example=["2330"])
+	types: List[str] = Field(default_factory=list, description="快取類型（例如 financial、daily_trade）", example=["financial"])
+	groupIds: List[str] = Field(default_factory=list, description="股票群組 ID（清除群組標籤與群組內所有股票的快取）", example=[])
+	tags: List[str] = Field(default_factory=list, description="其他完整標籤（例如 stock:2330）", example=[])
+
+@app.post(
+	"/api/stats/cache/invalidate",
+	summary="依標籤清除快取",
+	description="依股票代號、快取類型、股票群組或完整標籤清除內存快取（與資料庫快取中的同名鍵）。",
+	tags=["統計"]
+)
+async def invalidate_cache_endpoint(request: CacheInvalidateRequest):
+	"""
+	依標籤清除快取
+	
+	快取寫入時自動標記 `stock:<股票代號>` 與 `type:<快取類型>`，
+	透過標籤索引只清除符合的鍵，不會誤清其他股票（例如 2330 不會清到 23300）。
+	指定群組時會同時清除 `group:<群組 ID>` 標籤與群組內所有股票的快取。
+	
+	**請求示例:**
+	```json
+	{
+		"stockCodes": ["2330"],
+		"types": ["financial"]
+	}
+	```
+	"""
+	if not CACHE_AVAILABLE:
+		raise HTTPException(status_code=503, detail="快取服務未啟用")
+	
+	tags = set(request.tags)
+	tags.update(f"stock:{code}" for code in request.stockCodes)
+	tags.update(f"type:{cache_type}" for cache_type in request.types)
+	for group_id in request.groupIds:
+		tags.add(f"group:{group_id}")
+		if DB_AVAILABLE:
+			tags.update(f"stock:{code}" for code in get_stocks_by_group(group_id))
+	
+	if not tags:
+		raise HTTPException(status_code=400, detail="請提供至少一個股票代號、快取類型、群組或標籤")
+	
+	logger = logging.getLogger(__name__)
+	logger.info(f"[API 請求] POST /api/stats/cache/invalidate 標籤: {sorted(tags)}")
+	invalidated = invalidate_cache_tags(tags)
+	return {
+		"invalidated": invalidated,
+		"tags": sorted(tags)
+	}
+
 if __name__ == "__main__":
 	import uvicorn
 	uvicorn.run("main:app", host="0.0.0.0", port=8000, log_level="info", reload=True)
\ No newline at end of file
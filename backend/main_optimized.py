@@ -24,9 +24,14 @@ from core.config import (
     CORS_ORIGINS,
     HOST,
     PORT,
-    DEBUG
+    DEBUG,
+    CACHE_JANITOR_ENABLED,
+    CACHE_WARM_START_ENABLED,
+    RESPONSE_CACHE_ENABLED,
+    COMPRESSION_ENABLED
 )
 from core.logging_config import setup_logging, get_logger
+from core.responses import FastJSONResponse
 from core.dependencies import DB_AVAILABLE, CACHE_AVAILABLE
 
 # 導入路由
@@ -54,9 +59,20 @@ app = FastAPI(
     description=API_DESCRIPTION,
     version=API_VERSION,
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=FastJSONResponse
 )
 
+# 回應快取（需在 CORS 之前加入，使 CORS 標頭在快取命中時仍依請求來源產生）
+if CACHE_AVAILABLE and RESPONSE_CACHE_ENABLED:
+    from core.middleware import ResponseCacheMiddleware
+    app.add_middleware(ResponseCacheMiddleware)
+
+# 回應壓縮（包在回應快取外層，只壓縮未命中的回應；命中時直接送出預先壓縮的版本）
+if COMPRESSION_ENABLED:
+    from core.middleware import CompressionMiddleware
+    app.add_middleware(CompressionMiddleware)
+
 # 配置 CORS
 app.add_middleware(
     CORSMiddleware,
@@ -84,12 +100,26 @@ async def startup_event():
     logger.info(f"快取服務: {'啟用' if CACHE_AVAILABLE else '未啟用'}")
     logger.info(f"API 文檔: http://{HOST}:{PORT}/docs")
     logger.info("=" * 80)
+    
+    if CACHE_AVAILABLE and DB_AVAILABLE and CACHE_JANITOR_ENABLED:
+        from services.cache_service import start_cache_janitor
+        start_cache_janitor()
+    
+    if CACHE_AVAILABLE and DB_AVAILABLE and CACHE_WARM_START_ENABLED:
+        from services.cache_service import start_cache_warm_start
+        start_cache_warm_start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """應用程式關閉時執行"""
     logger.info("應用程式正在關閉...")
+    from services.intraday_stream import intraday_stream_hub
+    intraday_stream_hub.stop()
+    if CACHE_AVAILABLE:
+        from services.cache_service import stop_cache_janitor, flush_db_cache_writes
+        stop_cache_janitor()
+        flush_db_cache_writes()
 
 
 if __name__ == "__main__":
@@ -1,10 +1,12 @@
 # stats.py - 統計路由
 
 from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from typing import List
 from core.logging_config import get_logger
-from core.dependencies import CACHE_AVAILABLE
+from core.dependencies import CACHE_AVAILABLE, DB_AVAILABLE
 from core.exceptions import CacheError
-from services.cache_service import get_cache_stats
+from services.cache_service import get_cache_stats, invalidate_cache_tags
 from services.api_quota_tracker import quota_tracker
 
 logger = get_logger(__name__)
@@ -12,6 +14,14 @@ logger = get_logger(__name__)
 router = APIRouter(prefix="/api/stats", tags=["統計"])
 
 
+class CacheInvalidateRequest(BaseModel):
+    """依標籤清除快取的請求模型"""
+    stockCodes: List[str] = Field(default_factory=list, description="股票代號（清除該股票的所有快取）", example=["2330"])
+    types: List[str] = Field(default_factory=list, description="快取類型（例如 financial、daily_trade）", example=["financial"])
+    groupIds: List[str] = Field(default_factory=list, description="股票群組 ID（清除群組標籤與群組內所有股票的快取）", example=[])
+    tags: List[str] = Field(default_factory=list, description="其他完整標籤（例如 stock:2330）", example=[])
+
+
 @router.get(
     "/quota",
     summary="獲取 yfinance API 限額統計",
@@ -29,7 +39,7 @@ async def get_api_quota_stats():
 @router.get(
     "/cache",
     summary="獲取快取統計",
-    description="獲取內存快取的統計信息，包括快取鍵數量、快取大小等。"
+    description="獲取內存快取的統計信息，包括快取鍵數量、快取大小，以及各快取類型的命中/未命中/淘汰次數。"
 )
 async def get_cache_stats_endpoint():
     """獲取快取統計信息"""
@@ -38,3 +48,44 @@ async def get_cache_stats_endpoint():
     
     stats = get_cache_stats()
     return stats
+
+
+@router.post(
+    "/cache/invalidate",
+    summary="依標籤清除快取",
+    description="依股票代號、快取類型、股票群組或完整標籤清除內存快取（與資料庫快取中的同名鍵）。"
+)
+async def invalidate_cache_endpoint(request: CacheInvalidateRequest):
+    """依標籤清除快取"""
+    if not CACHE_AVAILABLE:
+        raise CacheError("快取服務未啟用")
+    
+    tags = set(request.tags)
+    tags.update(f"stock:{code}" for code in request.stockCodes)
+    tags.update(f"type:{cache_type}" for cache_type in request.types)
+    for group_id in request.groupIds:
+        tags.add(f"group:{group_id}")
+        if DB_AVAILABLE:
+            from crud import get_stocks_by_group
+            tags.update(f"stock:{code}" for code in get_stocks_by_group(group_id))
+    
+    if not tags:
+        raise HTTPException(status_code=400, detail="請提供至少一個股票代號、快取類型、群組或標籤")
+    
+    logger.info(f"[API 請求] POST /api/stats/cache/invalidate 標籤: {sorted(tags)}")
+    invalidated = invalidate_cache_tags(tags)
+    return {
+        "invalidated": invalidated,
+        "tags": sorted(tags)
+    }
+
+
+@router.get(
+    "/intraday-stream",
+    summary="獲取盤中推送統計",
+    description="獲取盤中數據推送（SSE）的統計信息，包括輪詢中的股票與訂閱者數、連線數、輪詢與事件次數，以及因客戶端過慢而丟棄的事件數。"
+)
+async def get_intraday_stream_stats():
+    """獲取盤中推送統計"""
+    from services.intraday_stream import intraday_stream_hub
+    return intraday_stream_hub.get_stats()
@@ -1,16 +1,22 @@
 # stocks.py - 股票數據路由
 
-from fastapi import APIRouter, HTTPException, Query, Path
+from fastapi import APIRouter, HTTPException, Query, Path, Response
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Optional
+from datetime import date, datetime
 import time
 from core.logging_config import get_logger
 from core.exceptions import StockNotFoundError, YFinanceAPIError
 from core.dependencies import CACHE_AVAILABLE, DB_AVAILABLE
+from core.config import COLUMNAR_STORE_ENABLED, INTRADAY_STREAM_MAX_CODES
+from core.responses import FastJSONResponse, EventStreamResponse
 from services.yfinance_service import (
     get_stock_info,
     get_intraday_data,
+    get_intraday_columns,
     get_daily_trade_data,
     get_market_index_data,
+    get_market_index_columns,
     get_financial_statements,
     get_yfinance_ticker
 )
@@ -18,14 +24,24 @@ from services.cache_service import (
     get_from_memory_cache,
     set_to_memory_cache,
     get_cache_key,
+    get_daily_trades_from_cache,
+    get_daily_trades_columnar_from_cache,
+    set_daily_trades_cache,
     CACHE_TTL
 )
 from services.api_quota_tracker import quota_tracker
+from services.columnar_store import get_daily_trades_from_store, append_daily_bars
+from services.export_service import iter_export, EXPORT_MEDIA_TYPES
+from services.intraday_stream import intraday_stream_hub
+from services.bar_series import columnar_payload, records_to_columns
 from crud import (
     save_stock_basic,
     save_daily_trades,
     get_stock_basic_from_db,
     get_daily_trades_from_db,
+    get_daily_trades_batch_from_db,
+    get_daily_trades_page_from_db,
+    iter_daily_trades_from_db,
     get_income_statement_from_db,
     get_balance_sheet_from_db,
     get_cash_flow_from_db,
@@ -34,11 +50,43 @@ from crud import (
     save_cash_flow
 )
 from utils.stock_helpers import diagnose_empty_data
+from utils.pagination import encode_cursor, decode_cursor
 
 logger = get_logger(__name__)
 
 router = APIRouter(prefix="/api/stock", tags=["股票數據"])
 
+# K 棒類端點的 format 參數：records（每筆一個物件）或 columnar（每個欄位一個陣列，股票代號等共用值只出現一次）
+BAR_FORMAT_DESCRIPTION = "回應格式：records（每筆一個物件）或 columnar（{meta, columns} 欄位陣列，適合圖表）"
+BAR_FORMAT_PATTERN = "^(records|columnar)$"
+
+
+def _parse_intraday_since(value: Optional[str]) -> Optional[datetime]:
+    """盤中數據 since 參數（ISO 日期時間，未指定時區時為交易所當地時間）"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="since 格式錯誤，請使用 YYYY-MM-DDTHH:MM:SS")
+
+
+def _daily_response(stock_code: str, data: List[Dict], source: str, format: str) -> FastJSONResponse:
+    """日交易回應（records：data 為記錄列表；columnar：meta + columns）"""
+    if format == 'columnar':
+        return FastJSONResponse({
+            "stockCode": stock_code,
+            "format": "columnar",
+            **columnar_payload(records_to_columns(data)),
+            "source": source
+        })
+    return FastJSONResponse({
+        "stockCode": stock_code,
+        "data": data,
+        "count": len(data),
+        "source": source
+    })
+
 
 @router.get(
     "/info/{stock_code}",
@@ -123,29 +171,59 @@ async def get_stock_information(
 async def get_stock_intraday(
     stock_code: str = Path(..., description="股票代號（台灣股票為4位數字，例如：2330）", example="2330"),
     period: str = Query("1d", description="時間週期", example="1d"),
-    interval: str = Query("1m", description="時間間隔", example="1m")
+    interval: str = Query("1m", description="時間間隔", example="1m"),
+    format: str = Query("records", description=BAR_FORMAT_DESCRIPTION, pattern=BAR_FORMAT_PATTERN),
+    since: Optional[str] = Query(None, description="只返回時間不早於此時間的 K 棒（ISO 日期時間，例如 2024-01-15T10:30:00；傳入目前最後一根的時間，可取得該根的最終值與之後的新 K 棒）", example="2024-01-15T10:30:00")
 ):
     """獲取股票盤中即時數據（成交明細）"""
+    since_time = _parse_intraday_since(since)
     try:
         yfinance_ticker = get_yfinance_ticker(stock_code)
         logger.info("=" * 80)
         logger.info(f"[API 請求] GET /api/stock/intraday/{stock_code}")
         logger.info(f"[參數] stock_code: {stock_code} -> yfinance ticker: {yfinance_ticker}")
-        logger.info(f"[參數] period: {period}, interval: {interval}")
+        logger.info(f"[參數] period: {period}, interval: {interval}, since: {since}")
         logger.info("=" * 80)
         
-        data = get_intraday_data(stock_code, period=period, interval=interval)
+        if format == 'columnar':
+            payload = columnar_payload(get_intraday_columns(stock_code, period=period, interval=interval, since=since_time))
+            logger.info(f"[API 響應] 成功獲取股票 {stock_code} 的盤中數據（欄位格式），共 {payload['count']} 筆")
+            return FastJSONResponse({"stockCode": stock_code, "format": "columnar", **payload})
+        
+        data = get_intraday_data(stock_code, period=period, interval=interval, since=since_time)
         logger.info(f"[API 響應] 成功獲取股票 {stock_code} 的盤中數據，共 {len(data)} 筆")
-        return {
+        return FastJSONResponse({
             "stockCode": stock_code,
             "data": data,
             "count": len(data)
-        }
+        })
     except Exception as e:
         logger.error(f"[API 錯誤] 獲取盤中數據時發生錯誤: {str(e)}")
         raise HTTPException(status_code=500, detail=f"獲取盤中數據時發生錯誤: {str(e)}")
 
 
+@router.get(
+    "/stream/intraday",
+    summary="訂閱盤中數據推送（SSE）",
+    description="以 Server-Sent Events 推送多個股票的盤中 1 分 K。連線後先收到每檔股票的 snapshot 事件（當日完整數據），"
+                "之後在有新增或更新的 K 棒時收到 bars 事件（依 date + time 覆寫合併）。"
+                "同一檔股票無論有多少訂閱者，伺服器只有一個輪詢任務，開盤時段每數秒更新一次。"
+)
+async def stream_intraday(
+    stock_codes: str = Query(..., description=f"股票代號，用逗號分隔（最多 {INTRADAY_STREAM_MAX_CODES} 個）", example="2330,2317")
+):
+    """訂閱盤中數據推送"""
+    codes = list(dict.fromkeys(code.strip() for code in stock_codes.split(',') if code.strip()))
+    logger.info(f"[API 請求] GET /api/stock/stream/intraday, stock_codes: {codes}")
+    
+    if not codes:
+        raise HTTPException(status_code=400, detail="請提供至少一個股票代號")
+    if len(codes) > INTRADAY_STREAM_MAX_CODES:
+        raise HTTPException(status_code=400, detail=f"一次最多訂閱 {INTRADAY_STREAM_MAX_CODES} 個股票")
+    
+    return EventStreamResponse(intraday_stream_hub.stream(codes))
+
+
 @router.get(
     "/daily/{stock_code}",
     summary="獲取股票日交易數據",
@@ -153,7 +231,9 @@ async def get_stock_intraday(
 )
 async def get_stock_daily(
     stock_code: str = Path(..., description="股票代號（台灣股票為4位數字，例如：2330）", example="2330"),
-    days: int = Query(5, description="獲取最近幾天的數據（範圍: 1-2000）", ge=1, le=2000, example=30)
+    days: int = Query(5, description="獲取最近幾天的數據（範圍: 1-2000）", ge=1, le=2000, example=30),
+    format: str = Query("records", description=BAR_FORMAT_DESCRIPTION, pattern=BAR_FORMAT_PATTERN),
+    response: Response = None
 ):
     """獲取股票日交易數據"""
     try:
@@ -163,34 +243,46 @@ async def get_stock_daily(
         logger.info(f"[參數] stock_code: {stock_code}, days: {days}")
         logger.info("=" * 80)
         
-        # 1. 嘗試從內存快取獲取
-        cache_key = get_cache_key('daily_trade', stock_code, days)
-        if CACHE_AVAILABLE:
-            cached_data = get_from_memory_cache(cache_key)
-            if cached_data is not None:
-                logger.info(f"[快取] 從內存快取獲取日交易數據: {stock_code}")
-                return {
+        # 1. 嘗試從內存快取獲取（每檔股票一份最寬視窗，較小的 days 直接切片）
+        if CACHE_AVAILABLE and format == 'columnar':
+            # 欄位格式直接由快取中的 BarSeries 輸出，不建立逐筆 dict
+            cached_columnar = get_daily_trades_columnar_from_cache(stock_code, days)
+            if cached_columnar is not None:
+                logger.info(f"[快取] 從內存快取獲取日交易數據（欄位格式）: {stock_code}")
+                return FastJSONResponse({
                     "stockCode": stock_code,
-                    "data": cached_data,
-                    "count": len(cached_data),
+                    "format": "columnar",
+                    **cached_columnar,
                     "source": "cache"
-                }
+                })
+        elif CACHE_AVAILABLE:
+            cached_data = get_daily_trades_from_cache(stock_code, days)
+            if cached_data is not None:
+                logger.info(f"[快取] 從內存快取獲取日交易數據: {stock_code}")
+                return _daily_response(stock_code, cached_data, "cache", format)
+        
+        # 2. 嘗試從欄位儲存獲取
+        if COLUMNAR_STORE_ENABLED:
+            # 欄位儲存只保存先前寫入的視窗，筆數不足 days 時改查資料庫
+            store_data = get_daily_trades_from_store(stock_code, days)
+            if len(store_data) >= days:
+                logger.info(f"[欄位儲存] 從欄位儲存獲取日交易數據: {stock_code}, 共 {len(store_data)} 筆")
+                if CACHE_AVAILABLE:
+                    set_daily_trades_cache(stock_code, days, store_data)
+                return _daily_response(stock_code, store_data, "columnar", format)
         
-        # 2. 嘗試從資料庫獲取
+        # 3. 嘗試從資料庫獲取
         if DB_AVAILABLE:
             db_data = get_daily_trades_from_db(stock_code, days)
             if db_data and len(db_data) > 0:
                 logger.info(f"[資料庫] 從資料庫獲取日交易數據: {stock_code}, 共 {len(db_data)} 筆")
                 if CACHE_AVAILABLE:
-                    set_to_memory_cache(cache_key, db_data, CACHE_TTL['daily_trade'])
-                return {
-                    "stockCode": stock_code,
-                    "data": db_data,
-                    "count": len(db_data),
-                    "source": "database"
-                }
+                    set_daily_trades_cache(stock_code, days, db_data)
+                if COLUMNAR_STORE_ENABLED:
+                    append_daily_bars(stock_code, db_data)
+                return _daily_response(stock_code, db_data, "database", format)
         
-        # 3. 檢查 API 限額
+        # 4. 檢查 API 限額
         if CACHE_AVAILABLE:
             rate_limits = quota_tracker.check_rate_limit()
             if not rate_limits['minute_ok']:
@@ -198,11 +290,13 @@ async def get_stock_daily(
             if not rate_limits['hour_ok']:
                 logger.warning("[API 限額] 每小時請求數已達上限，請稍後再試")
         
-        # 4. 從 yfinance API 獲取
+        # 5. 從 yfinance API 獲取
         yfinance_ticker = get_yfinance_ticker(stock_code)
         logger.info(f"[API] 從 yfinance 獲取日交易數據: {stock_code} -> {yfinance_ticker}")
         
         data = get_daily_trade_data(stock_code, days=days)
+        # yfinance 為日期升序，統一為資料庫與快取的日期降序，回應順序不因來源而不同
+        data.sort(key=lambda trade: str(trade.get('date') or ''), reverse=True)
         response_time = time.time() - start_time
         
         # 記錄 API 請求
@@ -213,15 +307,21 @@ async def get_stock_daily(
         
         # 如果數據為空，返回警告信息但不拋出錯誤
         if len(data) == 0:
+            # 診斷結果不應被回應快取保存
+            response.headers["Cache-Control"] = "no-store"
             logger.warning(f"股票 {stock_code} 的數據為空，開始診斷...")
             return diagnose_empty_data(stock_code)
         
         logger.info(f"成功返回股票 {stock_code} 的數據，共 {len(data)} 筆")
         
-        # 5. 保存到快取和資料庫
+        # 6. 保存到快取、欄位儲存和資料庫
         if len(data) > 0:
             if CACHE_AVAILABLE:
-                set_to_memory_cache(cache_key, data, CACHE_TTL['daily_trade'])
+                set_daily_trades_cache(stock_code, days, data)
+            
+            if COLUMNAR_STORE_ENABLED:
+                appended = append_daily_bars(stock_code, data)
+                logger.info(f"[欄位儲存] 已寫入 {appended} 筆日交易數據: {stock_code}")
             
             if DB_AVAILABLE:
                 try:
@@ -230,12 +330,7 @@ async def get_stock_daily(
                 except Exception as e:
                     logger.warning(f"[資料庫] 保存日交易數據失敗: {str(e)}")
         
-        return {
-            "stockCode": stock_code,
-            "data": data,
-            "count": len(data),
-            "source": "api"
-        }
+        return _daily_response(stock_code, data, "api", format)
     except Exception as e:
         logger.error(f"獲取日交易數據時發生異常: {str(e)}")
         import traceback
@@ -243,6 +338,76 @@ async def get_stock_daily(
         raise HTTPException(status_code=500, detail=f"獲取日交易數據時發生錯誤: {str(e)}")
 
 
+MAX_DAILY_PAGE_SIZE = 500
+
+
+def _daily_page_response(stock_code: str, data: List[Dict], limit: int, next_cursor: Optional[str],
+                         prev_cursor: Optional[str], source: str, format: str) -> FastJSONResponse:
+    """日交易分頁回應（依日期降序；nextCursor 往較舊、prevCursor 往較新，沒有更多時為 null）"""
+    if format == 'columnar':
+        content = {"stockCode": stock_code, "format": "columnar", **columnar_payload(records_to_columns(data))}
+    else:
+        content = {"stockCode": stock_code, "data": data, "count": len(data)}
+    content.update({"limit": limit, "nextCursor": next_cursor, "prevCursor": prev_cursor, "source": source})
+    return FastJSONResponse(content)
+
+
+@router.get(
+    "/daily/{stock_code}/page",
+    summary="分頁獲取股票日交易數據",
+    description="以鍵集分頁瀏覽完整的日交易歷史（依日期降序，游標記錄 (股票代號, 日期) 邊界）。"
+                "不帶 cursor 時為最近一頁（與日交易 API 共用內存快取），之後以回應中的 nextCursor 往較舊、"
+                "prevCursor 往較新翻頁；每頁只沿主鍵索引讀取 limit 筆，翻到多深成本都相同。"
+)
+async def get_stock_daily_page(
+    stock_code: str = Path(..., description="股票代號（台灣股票為4位數字，例如：2330）", example="2330"),
+    limit: int = Query(100, description=f"每頁筆數（範圍: 1-{MAX_DAILY_PAGE_SIZE}）", ge=1, le=MAX_DAILY_PAGE_SIZE, example=100),
+    cursor: Optional[str] = Query(None, description="上一個回應的 nextCursor 或 prevCursor；不提供時為最近一頁"),
+    format: str = Query("records", description=BAR_FORMAT_DESCRIPTION, pattern=BAR_FORMAT_PATTERN)
+):
+    """分頁獲取股票日交易數據（只讀取快取與資料庫，不會向 yfinance 請求）"""
+    logger.info("=" * 80)
+    logger.info(f"[API 請求] GET /api/stock/daily/{stock_code}/page")
+    logger.info(f"[參數] stock_code: {stock_code}, limit: {limit}, cursor: {cursor}")
+    logger.info("=" * 80)
+    
+    if cursor is None:
+        # 最近一頁：與日交易 API 共用快取視窗，多取一筆判斷是否還有較舊的數據
+        # 快取視窗可能少於 days 筆（例如 yfinance 以日曆天抓取），筆數不足 limit + 1 時無法判斷，改查資料庫
+        rows = get_daily_trades_from_cache(stock_code, limit + 1) if CACHE_AVAILABLE else None
+        source = "cache"
+        if rows is None or (len(rows) <= limit and DB_AVAILABLE):
+            if not DB_AVAILABLE:
+                raise HTTPException(status_code=503, detail="資料庫未啟用，無法分頁獲取日交易數據")
+            rows = get_daily_trades_from_db(stock_code, limit + 1)
+            source = "database"
+            if rows and CACHE_AVAILABLE:
+                set_daily_trades_cache(stock_code, limit + 1, rows)
+        data = rows[:limit]
+        has_older = len(rows) > limit
+        has_newer = False
+        logger.info(f"[{'快取' if source == 'cache' else '資料庫'}] 獲取最近一頁日交易數據: {stock_code}, 共 {len(data)} 筆")
+    else:
+        decoded = decode_cursor(cursor)
+        if decoded is None or decoded[0] != stock_code:
+            raise HTTPException(status_code=400, detail="cursor 無效")
+        if not DB_AVAILABLE:
+            raise HTTPException(status_code=503, detail="資料庫未啟用，無法分頁獲取日交易數據")
+        _, boundary, direction = decoded
+        source = "database"
+        if direction == 'newer':
+            data, has_newer = get_daily_trades_page_from_db(stock_code, limit, after=boundary)
+            has_older = True
+        else:
+            data, has_older = get_daily_trades_page_from_db(stock_code, limit, before=boundary)
+            has_newer = True
+        logger.info(f"[資料庫] 分頁獲取日交易數據（{direction}）: {stock_code}, 共 {len(data)} 筆")
+    
+    next_cursor = encode_cursor(stock_code, data[-1]['date'], 'older') if data and has_older else None
+    prev_cursor = encode_cursor(stock_code, data[0]['date'], 'newer') if data and has_newer else None
+    return _daily_page_response(stock_code, data, limit, next_cursor, prev_cursor, source, format)
+
+
 @router.get(
     "/batch",
     summary="批量獲取股票資訊",
@@ -285,6 +450,155 @@ async def get_multiple_stocks(
         raise HTTPException(status_code=500, detail=f"批量獲取股票資訊時發生錯誤: {str(e)}")
 
 
+# 批量日交易查詢一次最多的股票數量
+MAX_BATCH_DAILY_CODES = 100
+
+
+@router.get(
+    "/batch/daily",
+    summary="批量獲取日交易數據",
+    description="一次獲取多個股票最近 N 天的日交易數據（以單一資料庫查詢取得），結果依股票代號分組。"
+)
+async def get_multiple_daily_trades(
+    stock_codes: str = Query(..., description="股票代號，用逗號分隔（例如: 2330,2317,2454）", example="2330,2317,2454"),
+    days: int = Query(5, description="每個股票獲取最近幾天的數據（範圍: 1-2000）", ge=1, le=2000, example=30)
+):
+    """批量獲取多個股票的日交易數據
+    
+    依序使用內存快取、欄位儲存、資料庫（單一查詢）與 yfinance，
+    後面的來源只會查詢前面來源尚未涵蓋 days 的股票。涵蓋與否與單一股票 API 相同，不比較筆數
+    （yfinance 以日曆天抓取，筆數通常少於 days）：快取依記錄的視窗天數、欄位儲存需有 days 筆、
+    資料庫與 yfinance 以 days 查詢到的結果即視為涵蓋。
+    """
+    try:
+        codes = list(dict.fromkeys(code.strip() for code in stock_codes.split(',') if code.strip()))
+        logger.info("=" * 80)
+        logger.info(f"[API 請求] GET /api/stock/batch/daily")
+        logger.info(f"[參數] stock_codes: {codes}, days: {days}")
+        logger.info("=" * 80)
+        
+        if not codes:
+            raise HTTPException(status_code=400, detail="請提供至少一個股票代號")
+        if len(codes) > MAX_BATCH_DAILY_CODES:
+            raise HTTPException(status_code=400, detail=f"一次最多查詢 {MAX_BATCH_DAILY_CODES} 個股票")
+        
+        data: Dict[str, List[Dict]] = {}
+        sources: Dict[str, str] = {}
+        
+        # 1. 內存快取
+        if CACHE_AVAILABLE:
+            for code in codes:
+                cached_data = get_daily_trades_from_cache(code, days)
+                if cached_data is not None:
+                    data[code], sources[code] = cached_data, "cache"
+        
+        # 2. 欄位儲存
+        if COLUMNAR_STORE_ENABLED:
+            for code in codes:
+                if code in data:
+                    continue
+                store_data = get_daily_trades_from_store(code, days)
+                if len(store_data) >= days:
+                    data[code], sources[code] = store_data, "columnar"
+                    if CACHE_AVAILABLE:
+                        set_daily_trades_cache(code, days, store_data)
+        
+        # 3. 資料庫（單一查詢，只查詢尚未涵蓋的股票）
+        missing = [code for code in codes if code not in data]
+        if DB_AVAILABLE and missing:
+            db_results = get_daily_trades_batch_from_db(missing, days)
+            for code, db_data in db_results.items():
+                data[code], sources[code] = db_data, "database"
+                if CACHE_AVAILABLE:
+                    set_daily_trades_cache(code, days, db_data)
+                if COLUMNAR_STORE_ENABLED:
+                    append_daily_bars(code, db_data)
+        
+        # 4. yfinance（僅查詢前面都沒有數據的股票）
+        for code in [code for code in codes if code not in data]:
+            if CACHE_AVAILABLE:
+                rate_limits = quota_tracker.check_rate_limit()
+                if not rate_limits['minute_ok'] or not rate_limits['hour_ok']:
+                    logger.warning(f"[API 限額] 已達上限，略過剩餘股票的 yfinance 查詢")
+                    break
+            
+            request_start = time.time()
+            api_data = get_daily_trade_data(code, days=days)
+            api_data.sort(key=lambda trade: str(trade.get('date') or ''), reverse=True)
+            if CACHE_AVAILABLE:
+                quota_tracker.record_request('daily_trade', code, len(api_data) > 0, time.time() - request_start)
+            if not api_data:
+                continue
+            
+            data[code], sources[code] = api_data, "api"
+            if CACHE_AVAILABLE:
+                set_daily_trades_cache(code, days, api_data)
+            if COLUMNAR_STORE_ENABLED:
+                append_daily_bars(code, api_data)
+            if DB_AVAILABLE:
+                save_daily_trades(code, api_data)
+        
+        missing = [code for code in codes if code not in data]
+        logger.info(f"[API 響應] 成功獲取 {len(data)}/{len(codes)} 個股票的日交易數據")
+        return FastJSONResponse({
+            "data": {code: data[code] for code in codes if code in data},
+            "counts": {code: len(data[code]) for code in codes if code in data},
+            "sources": {code: sources[code] for code in codes if code in sources},
+            "missing": missing,
+            "count": len(data)
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"[API 錯誤] 批量獲取日交易數據時發生錯誤: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"批量獲取日交易數據時發生錯誤: {str(e)}")
+
+
+def _parse_export_date(value: Optional[str], name: str) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} 格式錯誤，請使用 YYYY-MM-DD")
+
+
+@router.get(
+    "/export/daily",
+    summary="串流匯出日交易數據",
+    description="以 NDJSON 或 CSV 串流匯出多個股票在指定日期範圍內的日交易數據（依股票代號順序，每檔依日期降序），"
+                "由資料庫伺服器端游標逐批讀取，適合匯出長期歷史。"
+)
+async def export_daily_trades(
+    stock_codes: str = Query(..., description="股票代號，用逗號分隔（例如: 2330,2317,2454）", example="2330,2317"),
+    start_date: Optional[str] = Query(None, description="起始日期（含，YYYY-MM-DD）", example="2020-01-01"),
+    end_date: Optional[str] = Query(None, description="結束日期（含，YYYY-MM-DD）", example="2024-12-31"),
+    days: Optional[int] = Query(None, description="每個股票最多匯出最近幾筆", ge=1, example=2000),
+    format: str = Query("ndjson", description="匯出格式：ndjson 或 csv", pattern="^(ndjson|csv)$")
+):
+    """串流匯出日交易數據（只讀取資料庫，不會向 yfinance 請求）"""
+    codes = list(dict.fromkeys(code.strip() for code in stock_codes.split(',') if code.strip()))
+    logger.info("=" * 80)
+    logger.info(f"[API 請求] GET /api/stock/export/daily")
+    logger.info(f"[參數] stock_codes: {codes}, start_date: {start_date}, end_date: {end_date}, days: {days}, format: {format}")
+    logger.info("=" * 80)
+    
+    if not codes:
+        raise HTTPException(status_code=400, detail="請提供至少一個股票代號")
+    if len(codes) > MAX_BATCH_DAILY_CODES:
+        raise HTTPException(status_code=400, detail=f"一次最多匯出 {MAX_BATCH_DAILY_CODES} 個股票")
+    if not DB_AVAILABLE:
+        raise HTTPException(status_code=503, detail="資料庫未啟用，無法匯出日交易數據")
+    start = _parse_export_date(start_date, "start_date")
+    end = _parse_export_date(end_date, "end_date")
+    
+    records = iter_daily_trades_from_db(codes, start_date=start, end_date=end, days=days)
+    headers = {}
+    if format == 'csv':
+        headers["Content-Disposition"] = f'attachment; filename="daily_trades_{"_".join(codes[:5])}.csv"'
+    return StreamingResponse(iter_export(records, format), media_type=EXPORT_MEDIA_TYPES[format], headers=headers)
+
+
 @router.get(
     "/market-index",
     summary="獲取大盤指數數據",
@@ -292,7 +606,8 @@ async def get_multiple_stocks(
 )
 async def get_market_index(
     index_code: str = Query("^TWII", description="指數代號，預設為 ^TWII (加權指數)", example="^TWII"),
-    days: int = Query(5, description="獲取最近幾天的數據（範圍: 1-30）", ge=1, le=30, example=10)
+    days: int = Query(5, description="獲取最近幾天的數據（範圍: 1-30）", ge=1, le=30, example=10),
+    format: str = Query("records", description=BAR_FORMAT_DESCRIPTION, pattern=BAR_FORMAT_PATTERN)
 ):
     """獲取大盤指數數據"""
     try:
@@ -302,13 +617,18 @@ async def get_market_index(
         logger.info(f"[參數] days: {days}")
         logger.info("=" * 80)
         
+        if format == 'columnar':
+            payload = columnar_payload(get_market_index_columns(index_code, days=days))
+            logger.info(f"[API 響應] 成功獲取指數 {index_code} 的數據（欄位格式），共 {payload['count']} 筆")
+            return FastJSONResponse({"indexCode": index_code, "format": "columnar", **payload})
+        
         data = get_market_index_data(index_code, days=days)
         logger.info(f"[API 響應] 成功獲取指數 {index_code} 的數據，共 {len(data)} 筆")
-        return {
+        return FastJSONResponse({
             "indexCode": index_code,
             "data": data,
             "count": len(data)
-        }
+        })
     except Exception as e:
         logger.error(f"[API 錯誤] 獲取大盤指數數據時發生錯誤: {str(e)}")
         raise HTTPException(status_code=500, detail=f"獲取大盤指數數據時發生錯誤: {str(e)}")
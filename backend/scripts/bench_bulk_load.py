@@ -0,0 +1,83 @@
+# bench_bulk_load.py - daily_trades 批次寫入路徑基準測試
+#
+# 比較 execute_batch（參數化 INSERT ... ON CONFLICT）與 COPY 暫存表合併（copy_upsert）
+# 寫入大量日交易數據的速度。COPY 路徑僅適用於 PostgreSQL；SQLite 只量測 executemany。
+#
+# 用法（在 backend 目錄下執行，使用 .env 中設定的資料庫，測試後刪除 BENCH 數據）：
+#     python scripts/bench_bulk_load.py [--stocks 50] [--days 2000]
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database import init_database, get_db_connection, DB_TYPE  # noqa: E402
+from db_utils import prepare_sql, execute_batch_sql, copy_upsert  # noqa: E402
+from crud import DAILY_TRADE_FIELDS  # noqa: E402
+from scripts.bench_columnar_store import make_records  # noqa: E402
+
+COLUMNS = [column for column, _ in DAILY_TRADE_FIELDS]
+UPDATE_COLUMNS = [c for c in COLUMNS if c not in ('stock_code', 'date')]
+
+
+def make_rows(prefix, stocks, days):
+    rows = []
+    for i in range(stocks):
+        for record in make_records(f"{prefix}{i:04d}", days):
+            rows.append(tuple(record.get(key) for _, key in DAILY_TRADE_FIELDS))
+    return rows
+
+
+def load_with_batch(rows):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    execute_batch_sql(cursor, f"""
+        INSERT INTO daily_trades ({', '.join(COLUMNS)})
+        VALUES ({', '.join('?' for _ in COLUMNS)})
+        ON CONFLICT (stock_code, date) DO UPDATE SET
+            {', '.join(f'{c} = excluded.{c}' for c in UPDATE_COLUMNS)}
+    """, rows)
+    conn.commit()
+    conn.close()
+
+
+def load_with_copy(rows):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    copy_upsert(cursor, 'daily_trades', COLUMNS, rows, ['stock_code', 'date'], UPDATE_COLUMNS)
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="daily_trades 批次寫入基準測試")
+    parser.add_argument("--stocks", type=int, default=50, help="模擬股票數量")
+    parser.add_argument("--days", type=int, default=2000, help="每檔股票的交易日數")
+    args = parser.parse_args()
+
+    init_database()
+    paths = [('execute_batch', 'BENCHB', load_with_batch)]
+    if DB_TYPE == 'postgresql':
+        paths.append(('COPY + 合併', 'BENCHC', load_with_copy))
+
+    print(f"資料庫: {DB_TYPE}，{args.stocks} 檔股票 x {args.days} 日")
+    try:
+        for name, prefix, load in paths:
+            rows = make_rows(prefix, args.stocks, args.days)
+            for label in ('新增', '更新'):
+                start = time.perf_counter()
+                load(rows)
+                elapsed = time.perf_counter() - start
+                print(f"{name:<14}{label}: {len(rows)} 筆，{elapsed:.2f} 秒（{len(rows) / elapsed:,.0f} rows/s）")
+    finally:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(prepare_sql("DELETE FROM daily_trades WHERE stock_code LIKE ?"), ('BENCH%',))
+        conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
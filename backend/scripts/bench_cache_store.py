@@ -0,0 +1,128 @@
+# bench_cache_store.py - cache_store 寫入效能與儲存大小基準測試
+#
+# 比較舊版寫入路徑（每次寫入都建立連接、執行 DDL、以 JSON 文字儲存）
+# 與新版路徑（pickle + zlib 壓縮、緩衝區批次寫入）。
+#
+# 用法（在 backend 目錄下執行）：
+#     python scripts/bench_cache_store.py [--writes 200] [--rows 2000]
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 使用臨時 SQLite 資料庫，避免影響正式資料
+_tmp_dir = tempfile.mkdtemp(prefix="finfo_bench_")
+os.environ["DB_TYPE"] = "sqlite"
+os.environ["SQLITE_DB_PATH"] = str(Path(_tmp_dir) / "bench.db")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database import get_db_connection  # noqa: E402
+from services import cache_service  # noqa: E402
+
+
+def make_daily_payload(stock_code: str, rows: int):
+    """產生與 get_daily_trade_data 相同結構的日交易數據"""
+    start = datetime(2018, 1, 1)
+    payload = []
+    price = 500.0
+    for i in range(rows):
+        price += (i % 7 - 3) * 0.5
+        volume = 20_000_000 + (i % 13) * 150_000
+        payload.append({
+            'stockCode': stock_code,
+            'stockName': 'Taiwan Semiconductor Manufacturing Company Limited',
+            'date': (start + timedelta(days=i)).strftime('%Y-%m-%d'),
+            'closePrice': price,
+            'avgPrice': round(price - 0.3, 2),
+            'prevClose': price - 0.5,
+            'openPrice': price - 1.0,
+            'highPrice': price + 2.0,
+            'lowPrice': price - 2.5,
+            'change': 0.5,
+            'changePercent': 0.1,
+            'totalVolume': volume,
+            'prevVolume': volume - 1000,
+            'innerVolume': int(volume * 0.48),
+            'outerVolume': int(volume * 0.52),
+            'foreignInvestor': int(volume * 0.2),
+            'investmentTrust': int(volume * 0.05),
+            'dealer': int(volume * 0.08),
+            'chips': int(volume * 0.28),
+            'mainBuy': int(volume * 0.6),
+            'mainSell': int(volume * 0.4),
+            'monthHigh': price + 30,
+            'monthLow': price - 30,
+            'quarterHigh': price + 30,
+        })
+    return payload
+
+
+def legacy_write(cache_key: str, data, ttl: int):
+    """舊版 save_to_db_cache 的寫入方式"""
+    conn = sqlite3.connect(os.environ["SQLITE_DB_PATH"], check_same_thread=False)
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cache_store_legacy (
+            cache_key TEXT PRIMARY KEY,
+            cache_type TEXT NOT NULL,
+            data TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cache_legacy_type ON cache_store_legacy(cache_type)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cache_legacy_expires ON cache_store_legacy(expires_at)")
+    expires_at = (datetime.now() + timedelta(seconds=ttl)).isoformat()
+    cursor.execute("""
+        INSERT OR REPLACE INTO cache_store_legacy (cache_key, cache_type, data, expires_at)
+        VALUES (?, ?, ?, ?)
+    """, (cache_key, 'daily_trade', json.dumps(data, ensure_ascii=False), expires_at))
+    conn.commit()
+    conn.close()
+
+
+def stored_bytes(table: str, column: str) -> int:
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT SUM(LENGTH({column})) AS total FROM {table}")
+    total = cursor.fetchone()['total'] or 0
+    conn.close()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="cache_store 寫入基準測試")
+    parser.add_argument("--writes", type=int, default=200, help="寫入次數")
+    parser.add_argument("--rows", type=int, default=2000, help="每筆快取的日交易數據行數")
+    args = parser.parse_args()
+
+    payloads = [make_daily_payload(f"{2000 + i}", args.rows) for i in range(10)]
+
+    start = time.perf_counter()
+    for i in range(args.writes):
+        legacy_write(f"daily_trade:{i}", payloads[i % len(payloads)], 3600)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(args.writes):
+        cache_service.save_to_db_cache(f"daily_trade:{i}", payloads[i % len(payloads)], 'daily_trade', 3600)
+    cache_service.flush_db_cache_writes()
+    new_seconds = time.perf_counter() - start
+
+    legacy_size = stored_bytes("cache_store_legacy", "data")
+    new_size = stored_bytes("cache_store", "payload")
+
+    print(f"寫入 {args.writes} 筆，每筆 {args.rows} 行日交易數據")
+    print(f"舊版（JSON 文字、逐筆寫入）: {legacy_seconds:.3f} 秒, 儲存 {legacy_size / 1024 / 1024:.2f} MB")
+    print(f"新版（pickle+zlib、批次寫入）: {new_seconds:.3f} 秒, 儲存 {new_size / 1024 / 1024:.2f} MB")
+    print(f"寫入加速: {legacy_seconds / new_seconds:.2f}x, 儲存縮減: {legacy_size / max(new_size, 1):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# bench_columnar_response.py - 欄位格式（format=columnar）回應的大小與編碼時間基準測試
+#
+# 比較 records（每筆一個物件）與 columnar（{meta, columns} 欄位陣列）兩種回應：
+#   - 日交易 2000 筆：快取命中路徑，由 BarSeries 輸出 to_records() 或 to_columnar()
+#   - 盤中 1 分 K 5 天：由 yfinance 的 DataFrame 建立記錄列表或欄位陣列
+# 時間包含建立回應內容與 FastJSONResponse 序列化；大小列出原始 JSON 與 gzip 後的位元組數。
+# 模擬數據的價格為完整精度的浮點數（如 yfinance 還原權息後的價格），
+# 以 --price-decimals 2 可模擬台股價格只到小數兩位的情況（數值變短，鍵名佔比更高）。
+#
+# 用法（在 backend 目錄下執行）：
+#     python scripts/bench_columnar_response.py [--days 2000] [--repeat 20] [--price-decimals 2]
+
+import argparse
+import gzip
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def make_intraday_history(days):
+    """模擬 yfinance 盤中 1 分 K（每日 09:00-13:29，270 根）"""
+    index = pd.DatetimeIndex([
+        ts for day in pd.bdate_range('2024-01-02', periods=days)
+        for ts in pd.date_range(day + pd.Timedelta(hours=9), periods=270, freq='min')
+    ], tz='Asia/Taipei')
+    rng = np.random.default_rng(0)
+    close = 600 + rng.normal(0, 0.5, len(index)).cumsum()
+    return pd.DataFrame({
+        'Open': close + rng.normal(0, 0.2, len(index)),
+        'High': close + 0.5,
+        'Low': close - 0.5,
+        'Close': close,
+        'Volume': rng.integers(0, 500_000, len(index)),
+    }, index=index)
+
+
+def timed(func, repeat):
+    func()  # 預熱
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = func()
+    return (time.perf_counter() - start) / repeat * 1000, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description="欄位格式回應基準測試")
+    parser.add_argument("--days", type=int, default=2000, help="日交易筆數")
+    parser.add_argument("--intraday-days", type=int, default=5, help="盤中數據天數")
+    parser.add_argument("--repeat", type=int, default=20, help="每種回應重複次數")
+    parser.add_argument("--price-decimals", type=int, default=None, help="將浮點數欄位四捨五入到指定小數位數")
+    args = parser.parse_args()
+
+    os.environ["DB_TYPE"] = "sqlite"
+    os.environ["SQLITE_DB_PATH"] = str(Path(tempfile.mkdtemp(prefix="finfo_columnar_")) / "bench.db")
+    sys.path.insert(0, str(BACKEND_DIR))
+    from core.responses import FastJSONResponse
+    from services.bar_series import BarSeries, columnar_payload
+    from services.yfinance_service import build_intraday_columns, _columns_to_records
+    from scripts.bench_columnar_store import make_records
+
+    records = make_records('2330', args.days)
+    hist = make_intraday_history(args.intraday_days)
+    if args.price_decimals is not None:
+        records = [
+            {key: round(value, args.price_decimals) if isinstance(value, float) else value for key, value in record.items()}
+            for record in records
+        ]
+        hist = hist.round(args.price_decimals)
+    series = BarSeries.from_records(records)
+
+    cases = [
+        (f"日交易 {args.days} 筆", "records",
+         lambda: FastJSONResponse({'stockCode': '2330', 'data': series.to_records(), 'count': len(series)}).body),
+        (f"日交易 {args.days} 筆", "columnar",
+         lambda: FastJSONResponse({'stockCode': '2330', 'format': 'columnar', **series.to_columnar()}).body),
+        (f"盤中 {len(hist)} 筆", "records",
+         lambda: FastJSONResponse({'stockCode': '2330', 'data': _columns_to_records(build_intraday_columns('2330', hist))}).body),
+        (f"盤中 {len(hist)} 筆", "columnar",
+         lambda: FastJSONResponse({'stockCode': '2330', 'format': 'columnar',
+                                   **columnar_payload(build_intraday_columns('2330', hist))}).body),
+    ]
+
+    print(f"{'回應':<18}{'格式':<10}{'大小 (KiB)':>12}{'gzip (KiB)':>12}{'建立+編碼 (ms)':>18}")
+    for name, fmt, func in cases:
+        ms, body = timed(func, args.repeat)
+        print(f"{name:<18}{fmt:<10}{len(body) / 1024:>12.0f}{len(gzip.compress(body, 6)) / 1024:>12.0f}{ms:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
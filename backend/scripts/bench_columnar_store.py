@@ -0,0 +1,117 @@
+# bench_columnar_store.py - 欄位式日線儲存與資料庫逐列讀取的基準測試
+#
+# 比較兩種讀取路徑：
+#   1. 資料庫：get_daily_trades_from_db（逐列查詢並組成 25 欄位的 dict）
+#   2. 欄位儲存：get_daily_trades_from_store（memmap 切片 + 向量運算組成記錄）
+# 以及分析用途（計算收盤價 20 日均線）：SQL 取出收盤價 vs 直接對 memmap 陣列運算。
+#
+# 用法（在 backend 目錄下執行）：
+#     python scripts/bench_columnar_store.py [--stocks 20] [--days 2000] [--repeat 20]
+#     python scripts/bench_columnar_store.py --use-env   # 使用 .env 中的資料庫（例如 PostgreSQL），測試後刪除 BENCH 數據
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def make_records(stock_code, days):
+    """產生依日期升序的模擬日交易記錄"""
+    import numpy as np
+    import pandas as pd
+    from services.yfinance_service import build_daily_trade_records
+
+    rng = np.random.default_rng(abs(hash(stock_code)) % (2 ** 32))
+    dates = pd.bdate_range('2015-01-01', periods=days).strftime('%Y-%m-%d').tolist()
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.01, days))
+    open_ = close * (1 + rng.normal(0, 0.003, days))
+    high = np.maximum(open_, close) * 1.01
+    low = np.minimum(open_, close) * 0.99
+    volume = rng.integers(1_000_000, 50_000_000, days)
+    return build_daily_trade_records(stock_code, f'Bench {stock_code}', dates, open_, high, low, close, volume)
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="欄位式日線儲存基準測試")
+    parser.add_argument("--stocks", type=int, default=20, help="模擬股票數量")
+    parser.add_argument("--days", type=int, default=2000, help="每檔股票的交易日數")
+    parser.add_argument("--repeat", type=int, default=20, help="每種讀取重複次數")
+    parser.add_argument("--use-env", action="store_true", help="使用環境變數設定的資料庫")
+    args = parser.parse_args()
+
+    tmp_dir = Path(tempfile.mkdtemp(prefix="finfo_columnar_"))
+    if not args.use_env:
+        os.environ["DB_TYPE"] = "sqlite"
+        os.environ["SQLITE_DB_PATH"] = str(tmp_dir / "bench.db")
+    os.environ["COLUMNAR_STORE_DIR"] = str(tmp_dir / "columnar")
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    import numpy as np
+    from database import init_database, get_db_connection, DB_TYPE
+    from db_utils import prepare_sql
+    from crud import save_daily_trades, get_daily_trades_from_db
+    from services.columnar_store import append_daily_bars, get_daily_trades_from_store, read_daily_bars
+
+    init_database()
+    codes = [f"BENCH{i:04d}" for i in range(args.stocks)]
+
+    print(f"資料庫: {DB_TYPE}，{args.stocks} 檔股票 x {args.days} 日")
+    start = time.perf_counter()
+    for code in codes:
+        save_daily_trades(code, make_records(code, args.days))
+    print(f"寫入資料庫: {time.perf_counter() - start:.1f} 秒")
+
+    start = time.perf_counter()
+    for code in codes:
+        append_daily_bars(code, make_records(code, args.days))
+    print(f"寫入欄位儲存: {time.perf_counter() - start:.2f} 秒")
+
+    def sql_sma():
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(prepare_sql("""
+            SELECT close_price FROM daily_trades WHERE stock_code = ? ORDER BY date DESC LIMIT ?
+        """), (codes[0], args.days))
+        closes = np.array([row['close_price'] for row in cursor.fetchall()][::-1], dtype=float)
+        conn.close()
+        return np.convolve(closes, np.ones(20) / 20, mode='valid')
+
+    def memmap_sma():
+        closes = read_daily_bars(codes[0], args.days).columns['close']
+        return np.convolve(closes, np.ones(20) / 20, mode='valid')
+
+    try:
+        print(f"\n{'讀取路徑':<28}{'天數':>8}{'平均耗時 (ms)':>16}")
+        for window in (30, 250, args.days):
+            db_ms, db_rows = timed(lambda: get_daily_trades_from_db(codes[0], window), args.repeat)
+            store_ms, store_rows = timed(lambda: get_daily_trades_from_store(codes[0], window), args.repeat)
+            assert [r['closePrice'] for r in db_rows] == [r['closePrice'] for r in store_rows]
+            print(f"{'資料庫 get_daily_trades_from_db':<28}{window:>8}{db_ms:>16.2f}")
+            print(f"{'欄位儲存 get_daily_trades_from_store':<28}{window:>8}{store_ms:>16.2f}  ({db_ms / store_ms:.1f}x)")
+
+        sql_ms, sql_result = timed(sql_sma, args.repeat)
+        mm_ms, mm_result = timed(memmap_sma, args.repeat)
+        assert np.allclose(sql_result, mm_result)
+        print(f"\n20 日均線（{args.days} 日）: SQL {sql_ms:.2f} ms，memmap {mm_ms:.2f} ms ({sql_ms / mm_ms:.1f}x)")
+    finally:
+        if args.use_env:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute(prepare_sql("DELETE FROM daily_trades WHERE stock_code LIKE ?"), ('BENCH%',))
+            conn.commit()
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
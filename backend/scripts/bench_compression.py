@@ -0,0 +1,77 @@
+# bench_compression.py - 回應壓縮基準測試
+#
+# 比較日交易與批量日交易回應在三種情況下的大小與伺服器端延遲：
+#   1. 不壓縮
+#   2. CompressionMiddleware 每次請求即時壓縮（回應快取未命中或停用時）
+#   3. 回應快取命中，直接送出預先壓縮的版本（每筆熱門回應只壓縮一次）
+# 並依 --bandwidth-mbps 估算在慢速鏈路（例如台灣到美國辦公室）上的傳輸時間。
+#
+# 用法（在 backend 目錄下執行，使用臨時 SQLite 資料庫）：
+#     python scripts/bench_compression.py [--days 2000] [--repeat 20] [--bandwidth-mbps 5]
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回應壓縮基準測試")
+    parser.add_argument("--days", type=int, default=2000, help="日交易筆數")
+    parser.add_argument("--repeat", type=int, default=20, help="每種情況重複次數")
+    parser.add_argument("--bandwidth-mbps", type=float, default=5.0, help="估算傳輸時間使用的頻寬（Mbps）")
+    args = parser.parse_args()
+
+    tmp_dir = Path(tempfile.mkdtemp(prefix="finfo_compression_"))
+    os.environ["DB_TYPE"] = "sqlite"
+    os.environ["SQLITE_DB_PATH"] = str(tmp_dir / "bench.db")
+    os.environ["RESPONSE_CACHE_ENABLED"] = "False"
+    os.environ["COMPRESSION_ENABLED"] = "False"
+    os.environ["LOG_LEVEL"] = "WARNING"
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    import logging
+    from crud import save_daily_trades
+    from scripts.bench_columnar_store import make_records
+    from scripts.bench_response_cache import timed
+    import main_optimized
+    from core.middleware import ResponseCacheMiddleware, CompressionMiddleware, _supported_encodings
+
+    logging.disable(logging.INFO)
+    codes = [f"{1000 + i}" for i in range(20)]
+    save_daily_trades('BENCH', make_records('BENCH', args.days))
+    for code in codes:
+        save_daily_trades(code, make_records(code, 250))
+
+    app = main_optimized.app
+    compressed_app = CompressionMiddleware(app)
+    cached_app = CompressionMiddleware(ResponseCacheMiddleware(app))
+    requests = [
+        (f"日交易 {args.days} 筆", '/api/stock/daily/BENCH', f'days={args.days}'.encode()),
+        ("批量日交易 20x250 筆", '/api/stock/batch/daily', f'stock_codes={",".join(codes)}&days=250'.encode()),
+    ]
+    bytes_per_ms = args.bandwidth_mbps * 1_000_000 / 8 / 1000
+
+    async def run():
+        print(f"壓縮格式: {', '.join(_supported_encodings())}；傳輸時間以 {args.bandwidth_mbps:g} Mbps 估算")
+        print(f"{'回應':<20}{'情況':<16}{'大小 (KiB)':>12}{'伺服器 (ms)':>14}{'傳輸 (ms)':>12}")
+        for name, path, query in requests:
+            for encoding in _supported_encodings():
+                cases = [
+                    ("不壓縮", app, None),
+                    (f"即時 {encoding}", compressed_app, encoding.encode()),
+                    (f"快取 {encoding}", cached_app, encoding.encode()),
+                ]
+                for label, target, accept_encoding in cases:
+                    ms, headers, body = await timed(target, path, query, args.repeat, accept_encoding)
+                    print(f"{name:<20}{label:<16}{len(body) / 1024:>12.0f}{ms:>14.2f}{len(body) / bytes_per_ms:>12.0f}")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# bench_intraday_delta.py - 盤中數據增量更新基準測試
+#
+# 模擬一個完整交易日（09:00-13:30，每分鐘一根 1 分 K），客戶端每 --poll-seconds 秒請求一次盤中數據：
+#   1. 整日重抓：每次請求都向上游抓取當日全部 K 棒並重建（增量更新前的行為），回應為整日數據
+#   2. 增量更新：快取保存當日序列，每次只向上游抓取最後幾根並依時間戳合併；
+#      客戶端以 since=最後一根的時間 只取得最後一根與新的 K 棒
+# 上游（yfinance）以模擬的 DataFrame 代替，列出上游返回的 K 棒總數、回應位元組總數與每次請求的伺服器端時間。
+#
+# 用法（在 backend 目錄下執行）：
+#     python scripts/bench_intraday_delta.py [--poll-seconds 10]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def make_day_history(now):
+    """截至 now 的當日 1 分 K（最後一根仍在更新，收盤價與成交量隨秒數變化）"""
+    index = pd.date_range(now.normalize() + pd.Timedelta(hours=9), now.floor('min'), freq='min')
+    n = len(index)
+    rng = np.random.default_rng(0)
+    close = 600 + rng.normal(0, 0.5, 271).cumsum()[:n]
+    close[-1] += now.second / 100
+    volume = rng.integers(0, 500_000, 271)[:n].astype(float)
+    volume[-1] = volume[-1] * now.second / 60
+    return pd.DataFrame({
+        'Open': close - 0.1, 'High': close + 0.5, 'Low': close - 0.5, 'Close': close, 'Volume': volume,
+        'Dividends': 0.0, 'Stock Splits': 0.0,
+    }, index=index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="盤中數據增量更新基準測試")
+    parser.add_argument("--poll-seconds", type=int, default=10, help="客戶端請求間隔（模擬時間，秒）")
+    args = parser.parse_args()
+
+    os.environ["DB_TYPE"] = "sqlite"
+    os.environ["SQLITE_DB_PATH"] = str(Path(tempfile.mkdtemp(prefix="finfo_intraday_")) / "bench.db")
+    os.environ["INTRADAY_REFRESH_INTERVAL"] = "0"
+    os.environ["LOG_LEVEL"] = "WARNING"
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    import logging
+    import services.yfinance_service as yfinance_service
+    from core.responses import dumps
+
+    logging.disable(logging.INFO)
+    clock = {'now': None, 'rows': 0}
+
+    class SimulatedTicker:
+        def __init__(self, ticker):
+            pass
+
+        def history(self, period=None, interval='1m', start=None, timeout=None):
+            hist = make_day_history(clock['now'])
+            if start is not None:
+                hist = hist[hist.index >= start]
+            clock['rows'] += len(hist)
+            return hist
+
+    yfinance_service.yf.Ticker = SimulatedTicker
+    session = pd.date_range('2024-01-02 09:00:05', '2024-01-02 13:30:00', freq=f'{args.poll_seconds}s', tz='Asia/Taipei')
+
+    def run(delta):
+        yfinance_service.INTRADAY_CACHE_AVAILABLE = delta
+        clock['rows'] = 0
+        sent = 0
+        elapsed = 0.0
+        last_bar = None
+        for now in session:
+            clock['now'] = now
+            since = None
+            if delta and last_bar is not None:
+                since = pd.Timestamp(f"{last_bar['date']} {last_bar['time']}").to_pydatetime()
+            start = time.perf_counter()
+            data = yfinance_service.get_intraday_data('BENCH', since=since)
+            body = dumps({'stockCode': 'BENCH', 'data': data, 'count': len(data)})
+            elapsed += time.perf_counter() - start
+            sent += len(body)
+            if data:
+                last_bar = data[-1]
+        return clock['rows'], sent, elapsed / len(session) * 1000
+
+    print(f"模擬一個交易日，每 {args.poll_seconds} 秒請求一次（共 {len(session)} 次）")
+    print(f"{'方式':<10}{'上游 K 棒':>12}{'回應 (KiB)':>14}{'每次 (ms)':>12}")
+    for name, delta in (("整日重抓", False), ("增量+since", True)):
+        rows, sent, ms = run(delta)
+        print(f"{name:<10}{rows:>12}{sent / 1024:>14.0f}{ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# bench_intraday_stream.py - 盤中數據：客戶端輪詢與 SSE 推送的上游請求數與延遲基準測試
+#
+# 模擬 N 個客戶端同時看同一檔股票 --duration 秒：
+#   1. 輪詢：每個客戶端每 --poll-interval 秒 GET /api/stock/intraday/{stock_code}
+#   2. SSE：每個客戶端訂閱 /api/stock/stream/intraday，伺服器端一個輪詢任務分送新的 K 棒
+# 上游（yfinance）以模擬函數代替：每次呼叫等待 --upstream-ms 毫秒，並在每次呼叫時新增一根 K 棒。
+# 列出客戶端收到的更新數、上游呼叫次數、伺服器送出的位元組數，以及 SSE 從上游取得新 K 棒到客戶端收到的延遲。
+# 注意：盤中數據 API 在事件迴圈中同步呼叫上游，輪詢模式下的請求會互相排隊，實際秒數可能超過 --duration。
+#
+# 用法（在 backend 目錄下執行）：
+#     python scripts/bench_intraday_stream.py [--clients 100] [--duration 5] [--poll-interval 1]
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+async def sse_client(app, stock_code, stop, received):
+    """以 ASGI 介面訂閱 SSE，記錄每個 bars 事件的收到時間"""
+    path = '/api/stock/stream/intraday'
+    scope = {
+        'type': 'http', 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': f'stock_codes={stock_code}'.encode(),
+        'root_path': '', 'headers': [(b'host', b'bench')], 'client': ('127.0.0.1', 0), 'server': ('bench', 80),
+    }
+
+    async def receive():
+        await stop.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.body' and message.get('body'):
+            received.append((time.perf_counter(), message['body']))
+
+    await app(scope, receive, send)
+
+
+async def polling_client(app, stock_code, interval, stop, received):
+    from scripts.bench_response_cache import call
+
+    while not stop.is_set():
+        _, _, body = await call(app, f'/api/stock/intraday/{stock_code}', b'')
+        received.append((time.perf_counter(), body))
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="盤中數據推送基準測試")
+    parser.add_argument("--clients", type=int, default=100, help="同時觀看的客戶端數")
+    parser.add_argument("--duration", type=float, default=5.0, help="測試秒數")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="客戶端輪詢與伺服器輪詢間隔（秒）")
+    parser.add_argument("--upstream-ms", type=float, default=200.0, help="模擬上游每次請求的延遲（毫秒）")
+    args = parser.parse_args()
+
+    os.environ["DB_TYPE"] = "sqlite"
+    os.environ["SQLITE_DB_PATH"] = str(Path(tempfile.mkdtemp(prefix="finfo_stream_")) / "bench.db")
+    os.environ["RESPONSE_CACHE_ENABLED"] = "False"
+    os.environ["COMPRESSION_ENABLED"] = "False"
+    os.environ["INTRADAY_STREAM_INTERVAL"] = str(args.poll_interval)
+    os.environ["INTRADAY_STREAM_IDLE_INTERVAL"] = str(args.poll_interval)
+    os.environ["LOG_LEVEL"] = "WARNING"
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    import logging
+    import main_optimized
+    import routers.stocks
+    import services.intraday_stream
+
+    logging.disable(logging.INFO)
+    upstream = {'calls': 0, 'fetched_at': []}
+
+    def fake_intraday_data(stock_code, period="1d", interval="1m"):
+        time.sleep(args.upstream_ms / 1000)
+        upstream['calls'] += 1
+        upstream['fetched_at'].append(time.perf_counter())
+        return [
+            {'stockCode': stock_code, 'date': '2024-01-02', 'time': f'{9 + minute // 60:02d}:{minute % 60:02d}:00',
+             'price': 600.0 + minute * 0.5, 'lots': 12.3, 'totalVolume': 12300}
+            for minute in range(upstream['calls'])
+        ]
+
+    routers.stocks.get_intraday_data = fake_intraday_data
+    services.intraday_stream.get_intraday_data = fake_intraday_data
+    app = main_optimized.app
+
+    async def run(mode):
+        upstream['calls'] = 0
+        upstream['fetched_at'] = []
+        stop = asyncio.Event()
+        received = [[] for _ in range(args.clients)]
+        if mode == 'sse':
+            clients = [sse_client(app, '2330', stop, r) for r in received]
+        else:
+            clients = [polling_client(app, '2330', args.poll_interval, stop, r) for r in received]
+        tasks = [asyncio.create_task(client) for client in clients]
+        await asyncio.sleep(args.duration)
+        stop.set()
+        await asyncio.gather(*tasks)
+        return received
+
+    print(f"{args.clients} 個客戶端觀看同一檔股票 {args.duration:g} 秒，間隔 {args.poll_interval:g} 秒，上游延遲 {args.upstream_ms:g} ms")
+    print(f"{'方式':<8}{'實際秒數':>10}{'客戶端更新':>12}{'上游呼叫':>10}{'送出 (KiB)':>14}{'分送延遲 p50/max (ms)':>26}")
+    for mode in ('polling', 'sse'):
+        start = time.perf_counter()
+        received = asyncio.run(run(mode))
+        elapsed = time.perf_counter() - start
+        sent = sum(len(body) for chunks in received for _, body in chunks)
+        updates = sum(1 for chunks in received for _, body in chunks if mode == 'polling' or body.startswith(b'event: '))
+        latency = ''
+        if mode == 'sse':
+            # 第 k 個 bars 事件對應第 k+1 次上游呼叫（第一次為 snapshot）
+            delays = []
+            for chunks in received:
+                events = [at for at, body in chunks if body.startswith(b'event: bars')]
+                delays.extend((at - upstream['fetched_at'][k + 1]) * 1000
+                              for k, at in enumerate(events) if k + 1 < len(upstream['fetched_at']))
+            delays.sort()
+            if delays:
+                latency = f"{delays[len(delays) // 2]:.2f} / {delays[-1]:.2f}"
+        print(f"{mode:<8}{elapsed:>10.1f}{updates:>12}{upstream['calls']:>10}{sent / 1024:>14.0f}{latency:>26}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# bench_json_response.py - JSON 回應序列化基準測試
+#
+# 比較最大的幾個股票端點在序列化階段的耗時：
+#   1. FastAPI 預設路徑：jsonable_encoder + JSONResponse（json.dumps）
+#   2. FastJSONResponse：路由直接返回回應實例，由 orjson 一次完成序列化
+# 測試的回應：日交易 2000 筆、批量日交易（20 檔 x 250 筆）、盤中數據（含 NumPy 純量與 Decimal）。
+#
+# 用法（在 backend 目錄下執行）：
+#     python scripts/bench_json_response.py [--days 2000] [--repeat 20]
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def make_intraday(count):
+    """模擬盤中數據：NumPy 純量（DataFrame 取值）與 Decimal（資料庫 NUMERIC 欄位）混用"""
+    return [
+        {
+            'time': f"2024-01-02 {9 + i // 60 % 5:02d}:{i % 60:02d}:00",
+            'price': np.float64(600.0 + i % 17 * 0.5),
+            'volume': np.int64(1000 + i * 3),
+            'change': Decimal(f"{(i % 11 - 5) * 0.5:.2f}"),
+        }
+        for i in range(count)
+    ]
+
+
+def timed(func, repeat):
+    func()  # 預熱
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = func()
+    return (time.perf_counter() - start) / repeat * 1000, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON 回應序列化基準測試")
+    parser.add_argument("--days", type=int, default=2000, help="日交易筆數")
+    parser.add_argument("--repeat", type=int, default=20, help="每種回應重複次數")
+    args = parser.parse_args()
+
+    os.environ["DB_TYPE"] = "sqlite"
+    os.environ["SQLITE_DB_PATH"] = str(Path(tempfile.mkdtemp(prefix="finfo_json_")) / "bench.db")
+    sys.path.insert(0, str(BACKEND_DIR))
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from core.responses import FastJSONResponse, ORJSON_AVAILABLE
+    from scripts.bench_columnar_store import make_records
+
+    daily = make_records('2330', args.days)
+    payloads = [
+        (f"日交易 {args.days} 筆", {'stockCode': '2330', 'data': daily, 'count': len(daily), 'source': 'cache'}),
+        ("批量日交易 20x250 筆", {
+            'data': {f"{1000 + i}": make_records(f"{1000 + i}", 250) for i in range(20)},
+            'count': 20
+        }),
+        ("盤中數據 270 筆", {'stockCode': '2330', 'data': make_intraday(270), 'count': 270}),
+    ]
+
+    def encode_default(content):
+        # jsonable_encoder 不認得 NumPy 純量，比照路由中常見的 custom_encoder 轉換
+        encoded = jsonable_encoder(content, custom_encoder={np.generic: lambda v: v.item()})
+        return JSONResponse(encoded).body
+
+    print(f"orjson: {'已安裝' if ORJSON_AVAILABLE else '未安裝（退回 json）'}")
+    print(f"{'回應':<22}{'大小 (KiB)':>12}{'預設 (ms)':>12}{'Fast (ms)':>12}{'加速':>8}")
+    for name, content in payloads:
+        default_ms, default_body = timed(lambda: encode_default(content), args.repeat)
+        fast_ms, fast_body = timed(lambda: FastJSONResponse(content).body, args.repeat)
+        assert json.loads(default_body) == json.loads(fast_body)
+        print(f"{name:<22}{len(fast_body) / 1024:>12.0f}{default_ms:>12.2f}{fast_ms:>12.2f}{default_ms / fast_ms:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# bench_keyset_pagination.py - 日交易歷史分頁：OFFSET 與鍵集分頁（keyset）的延遲基準測試
+#
+# 在單一股票的長歷史上，比較取得第 N 頁的資料庫查詢時間：
+#   1. OFFSET：ORDER BY date DESC LIMIT ? OFFSET ?，需先略過前面 (N-1) x limit 列
+#   2. 鍵集分頁：crud.get_daily_trades_page_from_db(before=上一頁最後日期)，沿 (stock_code, date) 主鍵從邊界開始讀取
+# 兩者都包含轉為 API 記錄的時間；另列出 /api/stock/daily/{stock_code}/page 最近一頁（命中快取）與最後一頁的時間。
+#
+# 用法（在 backend 目錄下執行，使用臨時 SQLite 資料庫）：
+#     python scripts/bench_keyset_pagination.py [--days 20000] [--limit 100] [--repeat 50]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def timed(func, repeat):
+    func()  # 預熱
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="鍵集分頁基準測試")
+    parser.add_argument("--days", type=int, default=20000, help="單一股票的日交易筆數")
+    parser.add_argument("--stocks", type=int, default=20, help="其他股票數量（每檔 2000 筆，讓資料表接近實際大小）")
+    parser.add_argument("--limit", type=int, default=100, help="每頁筆數")
+    parser.add_argument("--repeat", type=int, default=50, help="每種查詢重複次數")
+    args = parser.parse_args()
+
+    tmp_dir = Path(tempfile.mkdtemp(prefix="finfo_keyset_"))
+    os.environ["DB_TYPE"] = "sqlite"
+    os.environ["SQLITE_DB_PATH"] = str(tmp_dir / "bench.db")
+    os.environ["RESPONSE_CACHE_ENABLED"] = "False"
+    os.environ["LOG_LEVEL"] = "WARNING"
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    import logging
+    from database import init_database, get_db_connection
+    from db_utils import prepare_sql
+    from crud import save_daily_trades, get_daily_trades_page_from_db, _daily_trade_row_to_dict
+    from scripts.bench_columnar_store import make_records
+
+    logging.disable(logging.INFO)
+    init_database()
+    records = make_records('BENCH', args.days)
+    save_daily_trades('BENCH', records)
+    for i in range(args.stocks):
+        save_daily_trades(f"{1000 + i}", make_records(f"{1000 + i}", 2000))
+    dates = sorted((record['date'] for record in records), reverse=True)
+
+    def offset_page(offset):
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(prepare_sql("""
+            SELECT * FROM daily_trades
+            WHERE stock_code = ?
+            ORDER BY date DESC
+            LIMIT ? OFFSET ?
+        """), ('BENCH', args.limit, offset))
+        rows = [_daily_trade_row_to_dict(row) for row in cursor.fetchall()]
+        conn.close()
+        return rows
+
+    pages = [1, 10, 50, 100, args.days // args.limit]
+    print(f"單一股票 {args.days} 筆日交易，每頁 {args.limit} 筆")
+    print(f"{'頁數':>8}{'OFFSET (ms)':>14}{'鍵集 (ms)':>12}{'加速':>10}")
+    for page in sorted(set(p for p in pages if 1 <= p <= args.days // args.limit)):
+        offset = (page - 1) * args.limit
+        before = date.fromisoformat(dates[offset - 1]) if offset else None
+        offset_ms, offset_rows = timed(lambda: offset_page(offset), args.repeat)
+        keyset_ms, (keyset_rows, _) = timed(
+            lambda: get_daily_trades_page_from_db('BENCH', args.limit, before=before), args.repeat)
+        assert offset_rows == keyset_rows, f"第 {page} 頁結果不一致"
+        print(f"{page:>8}{offset_ms:>14.2f}{keyset_ms:>12.2f}{offset_ms / keyset_ms:>9.1f}x")
+
+    from fastapi.testclient import TestClient
+    import main_optimized
+    from utils.pagination import encode_cursor
+
+    client = TestClient(main_optimized.app)
+    deepest = encode_cursor('BENCH', dates[-args.limit - 1], 'older')
+    api_cases = [
+        ("最近一頁（快取命中）", {'limit': args.limit}, 'cache'),
+        ("最後一頁（鍵集）", {'limit': args.limit, 'cursor': deepest}, 'database'),
+    ]
+    print("API /api/stock/daily/BENCH/page（含 TestClient 開銷）")
+    for name, query, source in api_cases:
+        api_ms, response = timed(lambda: client.get('/api/stock/daily/BENCH/page', params=query), args.repeat)
+        assert response.json()['source'] == source
+        print(f"  {name}: {api_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
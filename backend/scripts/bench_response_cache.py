@@ -0,0 +1,95 @@
+# bench_response_cache.py - 回應快取（編碼後位元組）命中延遲基準測試
+#
+# 比較日交易 API 在快取命中時的延遲：
+#   1. 數據快取命中：路由從內存快取取出記錄後，FastAPI 重新 jsonable_encoder + json.dumps
+#   2. 回應快取命中：ResponseCacheMiddleware 直接送出保存的 JSON 位元組（或 gzip 版本）
+# 直接以 ASGI 介面呼叫應用程式，不經過網路與 HTTP 客戶端。
+#
+# 用法（在 backend 目錄下執行，使用臨時 SQLite 資料庫）：
+#     python scripts/bench_response_cache.py [--days 2000] [--repeat 50]
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+async def call(app, path, query=b'', accept_encoding=None):
+    """以 ASGI 介面送出 GET 請求，返回 (狀態, 標頭, 主體)"""
+    headers = [(b'host', b'bench')]
+    if accept_encoding:
+        headers.append((b'accept-encoding', accept_encoding))
+    scope = {
+        'type': 'http', 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': query, 'root_path': '',
+        'headers': headers, 'client': ('127.0.0.1', 0), 'server': ('bench', 80),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start = messages[0]
+    body = b''.join(m.get('body', b'') for m in messages[1:])
+    return start['status'], dict(start['headers']), body
+
+
+async def timed(app, path, query, repeat, accept_encoding=None):
+    await call(app, path, query, accept_encoding)  # 預熱快取
+    start = time.perf_counter()
+    for _ in range(repeat):
+        status, headers, body = await call(app, path, query, accept_encoding)
+    return (time.perf_counter() - start) / repeat * 1000, headers, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回應快取命中延遲基準測試")
+    parser.add_argument("--days", type=int, default=2000, help="日交易筆數")
+    parser.add_argument("--repeat", type=int, default=50, help="每種路徑重複次數")
+    args = parser.parse_args()
+
+    tmp_dir = Path(tempfile.mkdtemp(prefix="finfo_response_"))
+    os.environ["DB_TYPE"] = "sqlite"
+    os.environ["SQLITE_DB_PATH"] = str(tmp_dir / "bench.db")
+    os.environ["RESPONSE_CACHE_ENABLED"] = "False"
+    os.environ["LOG_LEVEL"] = "WARNING"
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    import logging
+    from crud import save_daily_trades
+    from scripts.bench_columnar_store import make_records
+    import main_optimized
+    from core.middleware import ResponseCacheMiddleware
+
+    logging.disable(logging.INFO)
+    save_daily_trades('BENCH', make_records('BENCH', args.days))
+    app = main_optimized.app
+    cached_app = ResponseCacheMiddleware(app)
+    path, query = '/api/stock/daily/BENCH', f'days={args.days}'.encode()
+
+    async def run():
+        data_ms, _, body = await timed(app, path, query, args.repeat)
+        resp_ms, headers, cached_body = await timed(cached_app, path, query, args.repeat)
+        gzip_ms, gzip_headers, gzip_body = await timed(cached_app, path, query, args.repeat, b'gzip, br')
+        assert headers[b'x-response-cache'] == b'HIT' and cached_body == body
+        assert gzip_headers.get(b'content-encoding') == b'gzip'
+        print(f"日交易 {args.days} 筆，回應 {len(body) / 1024:.0f} KiB（gzip {len(gzip_body) / 1024:.0f} KiB）")
+        print(f"{'命中路徑':<24}{'平均延遲 (ms)':>16}")
+        print(f"{'數據快取 + 重新序列化':<24}{data_ms:>16.2f}")
+        print(f"{'回應快取（原始位元組）':<24}{resp_ms:>16.3f}  ({data_ms / resp_ms:.0f}x)")
+        print(f"{'回應快取（gzip）':<24}{gzip_ms:>16.3f}  ({data_ms / gzip_ms:.0f}x)")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
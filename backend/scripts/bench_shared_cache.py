@@ -0,0 +1,92 @@
+# bench_shared_cache.py - 多進程快取命中率與 API 限額計數基準測試
+#
+# 模擬以多個 worker 進程提供服務：每個進程處理一批股票查詢（少數熱門股票佔大部分請求），
+# 未命中時模擬一次 yfinance 請求（記錄到限額追蹤器並寫入快取）。
+# 分別以 CACHE_BACKEND=memory（各進程獨立快取）與 CACHE_BACKEND=sqlite（共用快取檔案）執行，
+# 比較合併命中率、實際上游請求數，以及限額追蹤器看到的請求數。
+#
+# 用法（在 backend 目錄下執行）：
+#     python scripts/bench_shared_cache.py [--workers 4] [--requests 2000] [--stocks 200]
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def run_worker(worker_id, args, results):
+    sys.path.insert(0, str(BACKEND_DIR))
+    from services.cache_service import get_from_memory_cache, set_to_memory_cache, get_cache_key
+    from services.api_quota_tracker import quota_tracker
+
+    rng = random.Random(worker_id)
+    codes = [f"{1000 + i}" for i in range(args.stocks)]
+    # Zipf 分佈：排名越前的股票越常被查詢
+    weights = [1 / (rank + 1) for rank in range(args.stocks)]
+    payload = [{'date': f'2024-01-{d:02d}', 'closePrice': 100.0 + d, 'totalVolume': 1000 * d} for d in range(1, 31)]
+
+    hits = misses = 0
+    start = time.perf_counter()
+    for code in rng.choices(codes, weights, k=args.requests):
+        key = get_cache_key('stock_info', code)
+        if get_from_memory_cache(key) is not None:
+            hits += 1
+            continue
+        misses += 1
+        time.sleep(args.upstream_ms / 1000)  # 模擬 yfinance 請求延遲
+        quota_tracker.record_request('stock_info', code, True, args.upstream_ms / 1000)
+        set_to_memory_cache(key, payload, 600)
+    elapsed = time.perf_counter() - start
+    results.put((worker_id, hits, misses, elapsed, quota_tracker.get_stats()['daily_requests']))
+
+
+def run(backend, args):
+    tmp_dir = Path(tempfile.mkdtemp(prefix="finfo_shared_"))
+    os.environ["CACHE_BACKEND"] = backend
+    os.environ["CACHE_SHARED_PATH"] = str(tmp_dir / "shared_cache.db")
+    os.environ["DB_TYPE"] = "sqlite"
+    os.environ["SQLITE_DB_PATH"] = str(tmp_dir / "bench.db")
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    processes = [ctx.Process(target=run_worker, args=(i, args, results)) for i in range(args.workers)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    rows = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    wall = time.perf_counter() - start
+
+    hits = sum(row[1] for row in rows)
+    misses = sum(row[2] for row in rows)
+    seen_by_tracker = max(row[4] for row in rows)
+    print(
+        f"{backend:<8}{hits / (hits + misses) * 100:>10.1f}%{misses:>12}{seen_by_tracker:>14}"
+        f"{sum(row[3] for row in rows) / len(rows):>12.2f}{wall:>10.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多進程共用快取基準測試")
+    parser.add_argument("--workers", type=int, default=4, help="worker 進程數")
+    parser.add_argument("--requests", type=int, default=2000, help="每個 worker 的查詢次數")
+    parser.add_argument("--stocks", type=int, default=200, help="股票數量")
+    parser.add_argument("--upstream-ms", type=float, default=2.0, help="模擬 yfinance 請求延遲（毫秒）")
+    args = parser.parse_args()
+
+    print(f"{args.workers} 個 worker x {args.requests} 次查詢，{args.stocks} 檔股票（Zipf 分佈）")
+    print(f"{'後端':<8}{'合併命中率':>10}{'上游請求數':>12}{'限額計數':>14}{'worker 秒':>12}{'總秒數':>10}")
+    for backend in ("memory", "sqlite"):
+        run(backend, args)
+    print("限額計數：單一 worker 的限額追蹤器看到的一天內請求數（memory 後端只看得到自己的請求）")
+
+
+if __name__ == "__main__":
+    main()
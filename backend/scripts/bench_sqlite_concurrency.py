@@ -0,0 +1,142 @@
+# bench_sqlite_concurrency.py - SQLite 並發讀寫基準測試
+#
+# 以多個讀取執行緒（get_daily_trades_from_db）與寫入執行緒
+# （save_daily_trades、save_to_db_cache）同時存取同一個 SQLite 檔案，
+# 比較預設設定（每次開新連接、rollback journal）與效能設定
+# （WAL、每個執行緒重用連接、單一寫入通道）的吞吐量與 "database is locked" 錯誤數。
+#
+# 用法（在 backend 目錄下執行）：
+#     python scripts/bench_sqlite_concurrency.py [--readers 8] [--writers 4] [--seconds 5]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def make_trades(stock_code: str, rows: int, offset: int = 0):
+    start = datetime(2020, 1, 1) + timedelta(days=offset)
+    return [{
+        'stockCode': stock_code,
+        'stockName': stock_code,
+        'date': (start + timedelta(days=i)).strftime('%Y-%m-%d'),
+        'closePrice': 100.0 + i,
+        'openPrice': 99.0 + i,
+        'highPrice': 101.0 + i,
+        'lowPrice': 98.0 + i,
+        'totalVolume': 1000 * i,
+    } for i in range(rows)]
+
+
+def run_worker(args):
+    """在子進程中執行一種模式的測試（環境變數已由父進程設定）"""
+    sys.path.insert(0, str(BACKEND_DIR))
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    from database import init_database
+    from crud import save_daily_trades, get_daily_trades_from_db
+    from services import cache_service
+
+    init_database()
+    codes = [f"{1100 + i}" for i in range(20)]
+    for code in codes:
+        save_daily_trades(code, make_trades(code, 250))
+
+    stop = threading.Event()
+    counters = {'reads': 0, 'writes': 0, 'locked': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def count(name):
+        with lock:
+            counters[name] += 1
+
+    # crud 函數會記錄錯誤並返回空結果，透過日誌處理器統計 "database is locked"
+    class LockedCounter(logging.Handler):
+        def emit(self, record):
+            if 'locked' in record.getMessage():
+                count('locked')
+
+    logging.disable(logging.NOTSET)
+    root = logging.getLogger()
+    root.handlers = [LockedCounter()]
+    root.setLevel(logging.WARNING)
+
+    def reader(idx):
+        i = idx
+        while not stop.is_set():
+            get_daily_trades_from_db(codes[i % len(codes)], 60)
+            count('reads')
+            i += 1
+
+    def writer(idx):
+        i = 0
+        while not stop.is_set():
+            code = codes[(idx + i) % len(codes)]
+            try:
+                save_daily_trades(code, make_trades(code, 5, offset=i % 200))
+                cache_service.save_to_db_cache(f"bench:{idx}:{i % 50}", {'i': i}, 'bench', 60)
+                cache_service.flush_db_cache_writes()
+                count('writes')
+            except Exception as e:
+                count('locked' if 'locked' in str(e) else 'errors')
+            i += 1
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        'reads_per_sec': counters['reads'] / elapsed,
+        'writes_per_sec': counters['writes'] / elapsed,
+        'locked': counters['locked'],
+        'errors': counters['errors'],
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite 並發讀寫基準測試")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    for label, profile in (("預設設定", "False"), ("效能設定", "True")):
+        tmp_dir = tempfile.mkdtemp(prefix="finfo_bench_")
+        env = dict(os.environ,
+                   DB_TYPE="sqlite",
+                   SQLITE_DB_PATH=str(Path(tmp_dir) / "bench.db"),
+                   SQLITE_PERFORMANCE_PROFILE=profile)
+        output = subprocess.run(
+            [sys.executable, __file__, "--worker",
+             "--readers", str(args.readers), "--writers", str(args.writers),
+             "--seconds", str(args.seconds)],
+            env=env, cwd=str(BACKEND_DIR), capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        result = json.loads(output)
+        print(f"{label}: 讀取 {result['reads_per_sec']:.0f}/秒, 寫入 {result['writes_per_sec']:.0f}/秒, "
+              f"database is locked {result['locked']} 次, 其他錯誤 {result['errors']} 次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# bench_stream_export.py - 串流匯出的首位元組時間與峰值記憶體基準測試
+#
+# 以 10 檔股票 x 2000 筆日交易比較：
+#   1. 批量日交易 API（/api/stock/batch/daily）：先組出完整列表，再序列化成一個 JSON 主體
+#   2. 串流匯出（/api/stock/export/daily，NDJSON / CSV）：伺服器端游標逐批讀取、逐塊送出
+# 每種情況在獨立的子進程中執行，記錄首位元組時間（TTFB）、總時間、回應大小，
+# 以及處理請求期間峰值 RSS（ru_maxrss）的增加量。客戶端只計算位元組數，不保存主體。
+#
+# 用法（在 backend 目錄下執行，使用臨時 SQLite 資料庫）：
+#     python scripts/bench_stream_export.py [--stocks 10] [--days 2000]
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+async def measure(app, path, query):
+    """以 ASGI 介面送出 GET 請求，返回 (狀態, TTFB 毫秒, 總毫秒, 位元組數)"""
+    scope = {
+        'type': 'http', 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': query, 'root_path': '',
+        'headers': [(b'host', b'bench')], 'client': ('127.0.0.1', 0), 'server': ('bench', 80),
+    }
+    state = {'status': 0, 'ttfb': None, 'bytes': 0}
+    start = time.perf_counter()
+
+    async def receive():
+        await asyncio.sleep(3600)  # 客戶端不會中斷連線
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            state['status'] = message['status']
+        elif message['type'] == 'http.response.body' and message.get('body'):
+            if state['ttfb'] is None:
+                state['ttfb'] = (time.perf_counter() - start) * 1000
+            state['bytes'] += len(message['body'])
+
+    await app(scope, receive, send)
+    return state['status'], state['ttfb'], (time.perf_counter() - start) * 1000, state['bytes']
+
+
+def run_case(env, path, query, results):
+    os.environ.update(env)
+    sys.path.insert(0, str(BACKEND_DIR))
+    import logging
+    import main_optimized
+
+    logging.disable(logging.INFO)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    status, ttfb, total, size = asyncio.run(measure(main_optimized.app, path, query))
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((status, ttfb, total, size, (peak - baseline) / 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="串流匯出基準測試")
+    parser.add_argument("--stocks", type=int, default=10, help="股票數量")
+    parser.add_argument("--days", type=int, default=2000, help="每檔股票的日交易筆數")
+    args = parser.parse_args()
+
+    tmp_dir = Path(tempfile.mkdtemp(prefix="finfo_export_"))
+    env = {
+        "DB_TYPE": "sqlite",
+        "SQLITE_DB_PATH": str(tmp_dir / "bench.db"),
+        "RESPONSE_CACHE_ENABLED": "False",
+        "COMPRESSION_ENABLED": "False",
+        "LOG_LEVEL": "WARNING",
+    }
+    os.environ.update(env)
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    import logging
+    from database import init_database
+    from crud import save_daily_trades
+    from scripts.bench_columnar_store import make_records
+
+    logging.disable(logging.INFO)
+    init_database()
+    codes = [f"{2000 + i}" for i in range(args.stocks)]
+    for code in codes:
+        save_daily_trades(code, make_records(code, args.days))
+
+    stock_codes = ",".join(codes)
+    cases = [
+        ("批量 JSON", '/api/stock/batch/daily', f'stock_codes={stock_codes}&days={args.days}'),
+        ("串流 NDJSON", '/api/stock/export/daily', f'stock_codes={stock_codes}&days={args.days}'),
+        ("串流 CSV", '/api/stock/export/daily', f'stock_codes={stock_codes}&days={args.days}&format=csv'),
+    ]
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{args.stocks} 檔股票 x {args.days} 筆日交易")
+    print(f"{'方式':<14}{'TTFB (ms)':>12}{'總時間 (ms)':>14}{'大小 (MiB)':>12}{'峰值 RSS 增加 (MiB)':>22}")
+    for name, path, query in cases:
+        results = ctx.Queue()
+        process = ctx.Process(target=run_case, args=(env, path, query.encode(), results))
+        process.start()
+        status, ttfb, total, size, rss = results.get()
+        process.join()
+        assert status == 200, f"{name} 回應狀態 {status}"
+        print(f"{name:<14}{ttfb:>12.1f}{total:>14.1f}{size / 1024 / 1024:>12.1f}{rss:>22.1f}")
+
+
+if __name__ == "__main__":
+    main()
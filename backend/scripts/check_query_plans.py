@@ -0,0 +1,95 @@
+# check_query_plans.py - 以 EXPLAIN 驗證熱門查詢使用複合索引
+#
+# 驗證「依股票代號取最新 N 筆」的日交易查詢（daily_trades 的 (stock_code, date) 主鍵）
+# 與財務報表最新一期查詢（(stock_code, period DESC) 複合索引）不需要額外排序。
+#
+# 用法（在 backend 目錄下執行）：
+#     python scripts/check_query_plans.py            # 使用臨時 SQLite 資料庫
+#     python scripts/check_query_plans.py --use-env  # 使用 .env 中設定的資料庫（例如 PostgreSQL）
+
+import argparse
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# 需要驗證的查詢：(說明, SQL, 參數, 預期使用的索引（任一名稱出現在計劃中即可）)
+QUERIES = [
+    (
+        "get_daily_trades_from_db",
+        "SELECT * FROM daily_trades WHERE stock_code = ? ORDER BY date DESC LIMIT ?",
+        ('2330', 30),
+        ('daily_trades_pkey', 'sqlite_autoindex_daily_trades_1'),
+    ),
+    (
+        "get_income_statement_from_db",
+        "SELECT * FROM income_statements WHERE stock_code = ? ORDER BY period DESC LIMIT 1",
+        ('2330',),
+        ('idx_income_code_period',),
+    ),
+    (
+        "get_balance_sheet_from_db",
+        "SELECT * FROM balance_sheets WHERE stock_code = ? ORDER BY period DESC LIMIT 1",
+        ('2330',),
+        ('idx_balance_code_period',),
+    ),
+    (
+        "get_cash_flow_from_db",
+        "SELECT * FROM cash_flows WHERE stock_code = ? ORDER BY period DESC LIMIT 1",
+        ('2330',),
+        ('idx_cashflow_code_period',),
+    ),
+]
+
+
+def check_plan(plan, expected_indexes, db_type):
+    """檢查計劃是否使用預期索引且沒有額外排序步驟"""
+    text = "\n".join(plan)
+    uses_index = any(index_name in text for index_name in expected_indexes)
+    if db_type == 'postgresql':
+        needs_sort = any(line.strip().startswith('Sort') or '->  Sort' in line for line in plan)
+    else:
+        needs_sort = 'TEMP B-TREE' in text.upper()
+    return uses_index and not needs_sort
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以 EXPLAIN 驗證查詢計劃")
+    parser.add_argument("--use-env", action="store_true", help="使用環境變數設定的資料庫")
+    args = parser.parse_args()
+
+    if not args.use_env:
+        os.environ["DB_TYPE"] = "sqlite"
+        os.environ["SQLITE_DB_PATH"] = str(Path(tempfile.mkdtemp(prefix="finfo_plan_")) / "plan.db")
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    from database import init_database, explain_query_plan, get_db_connection, DB_TYPE
+
+    init_database()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    if DB_TYPE == 'postgresql':
+        # 小表上規劃器傾向全表掃描，關閉後才能確認索引可被使用
+        cursor.execute("SET enable_seqscan = off")
+    else:
+        cursor.execute("ANALYZE")
+        conn.commit()
+
+    failed = 0
+    for name, sql, params, expected_indexes in QUERIES:
+        plan = explain_query_plan(sql, params, conn=conn)
+        ok = check_plan(plan, expected_indexes, DB_TYPE)
+        failed += 0 if ok else 1
+        print(f"[{'OK' if ok else 'FAIL'}] {name}（預期索引: {' / '.join(expected_indexes)}）")
+        for line in plan:
+            print(f"    {line}")
+    conn.close()
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
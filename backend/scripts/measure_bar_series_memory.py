@@ -0,0 +1,93 @@
+# measure_bar_series_memory.py - 以 tracemalloc 量測快取 K 棒的記憶體用量
+#
+# 比較兩種快取表示方式每 1,000 筆 K 棒佔用的記憶體：
+#   1. 記錄列表：每筆一個 dict（目前 API 回應的格式）
+#   2. BarSeries：array.array 欄位 + 駐留字串
+# 並確認 BarSeries.to_records() 還原的記錄與原始記錄完全相同。
+#
+# 用法（在 backend 目錄下執行）：
+#     python scripts/measure_bar_series_memory.py [--bars 10000]
+
+import argparse
+import gc
+import random
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.bar_series import BarSeries  # noqa: E402
+from scripts.bench_columnar_store import make_records  # noqa: E402
+
+
+def make_intraday_records(stock_code, bars):
+    """產生與 get_intraday_data 格式相同的模擬盤中記錄（每日 270 根 1 分 K）"""
+    rng = random.Random(42)
+    records = []
+    price = 600.0
+    day = datetime(2024, 1, 2, 9, 0)
+    while len(records) < bars:
+        for minute in range(270):
+            if len(records) >= bars:
+                break
+            ts = day + timedelta(minutes=minute)
+            price *= 1 + rng.uniform(-0.002, 0.002)
+            volume = rng.randint(1000, 500_000)
+            records.append({
+                'stockCode': stock_code,
+                'date': ts.strftime('%Y-%m-%d'),
+                'time': ts.strftime('%H:%M:%S'),
+                'price': price,
+                'change': round(price - 600.0, 2),
+                'changePercent': round((price - 600.0) / 6, 2),
+                'lots': round(volume / 1000, 2),
+                'period': '早盤' if ts.hour < 12 else '午盤',
+                'openPrice': price,
+                'highPrice': price * 1.001,
+                'lowPrice': price * 0.999,
+                'totalVolume': volume,
+                'estimatedVolume': volume,
+            })
+        day += timedelta(days=1)
+    return records
+
+
+def measure(build):
+    """返回 build() 建立的物件與其保留的記憶體位元組數"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description="量測快取 K 棒的記憶體用量")
+    parser.add_argument("--bars", type=int, default=10000, help="每種數據的 K 棒數量")
+    args = parser.parse_args()
+
+    cases = [
+        ('日線', lambda: make_records('2330', args.bars)),
+        ('盤中 1 分 K', lambda: make_intraday_records('2330', args.bars)),
+    ]
+    per = 1000 / args.bars
+    make_records('2330', 10)  # 先載入 pandas / numpy，避免模組匯入計入量測
+
+    print(f"{'數據':<12}{'記錄列表 (KiB/千筆)':>22}{'BarSeries (KiB/千筆)':>24}{'縮減':>8}")
+    for label, build in cases:
+        records, records_bytes = measure(build)
+        series, series_bytes = measure(lambda: BarSeries.from_records(records))
+        assert series.to_records() == records
+        print(
+            f"{label:<12}{records_bytes * per / 1024:>22.1f}{series_bytes * per / 1024:>24.1f}"
+            f"{records_bytes / series_bytes:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
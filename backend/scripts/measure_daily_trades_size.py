@@ -0,0 +1,122 @@
+# measure_daily_trades_size.py - 量測 daily_trades v1 → v2 結構轉換前後的表格與索引大小
+#
+# 在臨時 SQLite 資料庫建立舊版（UUID TEXT id、TEXT 日期）daily_trades 並填入模擬數據，
+# 再執行 init_database() 套用遷移 002，輸出轉換前後的空間與資料筆數。
+#
+# 用法（在 backend 目錄下執行）：
+#     python scripts/measure_daily_trades_size.py --stocks 200 --days 500
+#     python scripts/measure_daily_trades_size.py --use-env   # 只回報 .env 資料庫目前的大小，不寫入數據
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# 遷移 002 之前的 daily_trades 結構（含遷移 001 的複合索引）
+LEGACY_DDL = [
+    """
+    CREATE TABLE daily_trades (
+        id TEXT PRIMARY KEY,
+        stock_code TEXT NOT NULL,
+        stock_name TEXT,
+        date TEXT NOT NULL,
+        close_price REAL, avg_price REAL, prev_close REAL, open_price REAL,
+        high_price REAL, low_price REAL, change REAL, change_percent REAL,
+        total_volume INTEGER, prev_volume INTEGER, inner_volume INTEGER, outer_volume INTEGER,
+        foreign_investor INTEGER, investment_trust INTEGER, dealer INTEGER, chips INTEGER,
+        main_buy INTEGER, main_sell INTEGER,
+        month_high REAL, month_low REAL, quarter_high REAL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(stock_code, date)
+    )
+    """,
+    "CREATE INDEX idx_daily_trades_date ON daily_trades(date)",
+    "CREATE INDEX idx_daily_trades_code_date ON daily_trades(stock_code, date DESC)",
+]
+
+
+def seed_legacy_table(db_path, stocks, days):
+    import sqlite3
+
+    conn = sqlite3.connect(db_path)
+    for ddl in LEGACY_DDL:
+        conn.execute(ddl)
+
+    rng = random.Random(42)
+    start = date(2020, 1, 1)
+    rows = []
+    for s in range(stocks):
+        code = f"{1000 + s}.TW"
+        price = rng.uniform(20, 800)
+        for d in range(days):
+            price *= 1 + rng.uniform(-0.03, 0.03)
+            volume = rng.randint(1000, 5_000_000)
+            rows.append((
+                str(uuid.uuid4()), code, f"股票{s}", (start + timedelta(days=d)).isoformat(),
+                round(price, 2), round(price, 2), round(price, 2), round(price * 0.99, 2),
+                round(price * 1.01, 2), round(price * 0.98, 2), 0.5, 0.1,
+                volume, volume, volume // 2, volume // 2, 0, 0, 0, 0, 0, 0,
+                round(price * 1.1, 2), round(price * 0.9, 2), round(price * 1.2, 2),
+            ))
+    conn.executemany(f"INSERT INTO daily_trades VALUES ({', '.join('?' for _ in range(25))}, CURRENT_TIMESTAMP)", rows)
+    conn.commit()
+    conn.close()
+    return len(rows)
+
+
+def print_sizes(label, sizes):
+    size = sizes.get('daily_trades')
+    if not size:
+        print(f"{label}: 無法取得大小")
+        return
+    total = size['table_bytes'] + size['index_bytes']
+    print(f"{label}: 表 {size['table_bytes'] / 1024:>10.1f} KiB  索引 {size['index_bytes'] / 1024:>10.1f} KiB  合計 {total / 1024:>10.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="量測 daily_trades 結構轉換前後的大小")
+    parser.add_argument("--stocks", type=int, default=100, help="模擬股票數量")
+    parser.add_argument("--days", type=int, default=500, help="每檔股票的交易日數")
+    parser.add_argument("--use-env", action="store_true", help="只回報環境變數設定之資料庫目前的大小")
+    args = parser.parse_args()
+
+    if not args.use_env:
+        db_path = str(Path(tempfile.mkdtemp(prefix="finfo_size_")) / "size.db")
+        os.environ["DB_TYPE"] = "sqlite"
+        os.environ["SQLITE_DB_PATH"] = db_path
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    from database import init_database, get_db_connection, get_table_sizes
+
+    if args.use_env:
+        conn = get_db_connection()
+        print_sizes("目前", get_table_sizes(conn.cursor(), ['daily_trades']))
+        conn.close()
+        return
+
+    row_count = seed_legacy_table(db_path, args.stocks, args.days)
+    print(f"模擬數據: {args.stocks} 檔股票 x {args.days} 日 = {row_count} 筆")
+
+    conn = get_db_connection()
+    print_sizes("v1（UUID id / TEXT 日期）", get_table_sizes(conn.cursor(), ['daily_trades']))
+    conn.close()
+
+    init_database()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    print_sizes("v2（(stock_code, date) 主鍵）", get_table_sizes(cursor, ['daily_trades']))
+    cursor.execute("SELECT COUNT(*) AS n FROM daily_trades")
+    migrated = cursor.fetchone()['n']
+    conn.close()
+    print(f"轉換後筆數: {migrated}（{'一致' if migrated == row_count else '不一致'}）")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,14 @@
 
 import time
 import logging
+import threading
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 from collections import deque
 from dataclasses import dataclass, asdict
 
+from services.shared_cache import get_shared_store
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -19,7 +22,11 @@ class APIRequest:
     response_time: float
 
 class APIQuotaTracker:
-    """yfinance API 限額追蹤器"""
+    """yfinance API 限額追蹤器
+    
+    CACHE_BACKEND=sqlite 時，各時間窗口的請求數以共用快取檔案計算，
+    多個 worker 進程共用同一份限額；成功率、回應時間等明細仍為各進程自己的統計。
+    """
     
     # yfinance 的實際限制（根據經驗值）
     RATE_LIMITS = {
@@ -31,11 +38,21 @@ class APIQuotaTracker:
     def __init__(self):
         self.requests: deque = deque(maxlen=10000)  # 保留最近 10000 個請求
         self.start_time = time.time()
+        self._quota_lock = threading.Lock()
+        self._shared = get_shared_store()
     
-    def record_request(self, endpoint: str, stock_code: str, success: bool, response_time: float = 0):
+    def record_request(self, endpoint: str, stock_code: str, success: bool, response_time: float = 0) -> APIRequest:
         """記錄 API 請求"""
+        request = self._append_request(endpoint, stock_code, success, response_time)
+        if self._shared is not None:
+            self._shared.record_request(request.timestamp, endpoint, stock_code)
+        return request
+    
+    def _append_request(self, endpoint: str, stock_code: str, success: bool, response_time: float = 0,
+                        timestamp: Optional[float] = None) -> APIRequest:
+        """將請求加入本進程的記錄"""
         request = APIRequest(
-            timestamp=time.time(),
+            timestamp=time.time() if timestamp is None else timestamp,
             endpoint=endpoint,
             stock_code=stock_code,
             success=success,
@@ -43,18 +60,22 @@ class APIQuotaTracker:
         )
         self.requests.append(request)
         logger.debug(f"記錄 API 請求: {endpoint} - {stock_code} - {'成功' if success else '失敗'}")
+        return request
+    
+    def _window_counts(self, now: float) -> List[int]:
+        """返回最近一分鐘、一小時、一天的請求數"""
+        windows = (60, 3600, 86400)
+        if self._shared is not None:
+            return self._shared.count_requests(now, windows)
+        timestamps = [r.timestamp for r in list(self.requests)]
+        return [sum(1 for t in timestamps if t >= now - window) for window in windows]
     
     def get_stats(self) -> Dict[str, Any]:
         """獲取統計信息"""
         now = time.time()
-        one_minute_ago = now - 60
-        one_hour_ago = now - 3600
-        one_day_ago = now - 86400
+        recent_count, hourly_count, daily_count = self._window_counts(now)
         
         all_requests = list(self.requests)
-        recent_requests = [r for r in all_requests if r.timestamp >= one_minute_ago]
-        hourly_requests = [r for r in all_requests if r.timestamp >= one_hour_ago]
-        daily_requests = [r for r in all_requests if r.timestamp >= one_day_ago]
         
         successful_requests = [r for r in all_requests if r.success]
         failed_requests = [r for r in all_requests if not r.success]
@@ -70,19 +91,19 @@ class APIQuotaTracker:
             'failed_requests': len(failed_requests),
             'success_rate': len(successful_requests) / len(all_requests) * 100 if all_requests else 0,
             'avg_response_time': round(avg_response_time, 3),
-            'recent_requests': len(recent_requests),
-            'hourly_requests': len(hourly_requests),
-            'daily_requests': len(daily_requests),
+            'recent_requests': recent_count,
+            'hourly_requests': hourly_count,
+            'daily_requests': daily_count,
             'rate_limits': self.RATE_LIMITS,
             'usage_percentage': {
-                'minute': len(recent_requests) / self.RATE_LIMITS['requests_per_minute'] * 100,
-                'hour': len(hourly_requests) / self.RATE_LIMITS['requests_per_hour'] * 100,
-                'day': len(daily_requests) / self.RATE_LIMITS['requests_per_day'] * 100,
+                'minute': recent_count / self.RATE_LIMITS['requests_per_minute'] * 100,
+                'hour': hourly_count / self.RATE_LIMITS['requests_per_hour'] * 100,
+                'day': daily_count / self.RATE_LIMITS['requests_per_day'] * 100,
             },
             'remaining_quota': {
-                'minute': max(0, self.RATE_LIMITS['requests_per_minute'] - len(recent_requests)),
-                'hour': max(0, self.RATE_LIMITS['requests_per_hour'] - len(hourly_requests)),
-                'day': max(0, self.RATE_LIMITS['requests_per_day'] - len(daily_requests)),
+                'minute': max(0, self.RATE_LIMITS['requests_per_minute'] - recent_count),
+                'hour': max(0, self.RATE_LIMITS['requests_per_hour'] - hourly_count),
+                'day': max(0, self.RATE_LIMITS['requests_per_day'] - daily_count),
             },
             'uptime_seconds': now - self.start_time,
         }
@@ -101,6 +122,43 @@ class APIQuotaTracker:
             'day_ok': stats['daily_requests'] < self.RATE_LIMITS['requests_per_day'],
         }
 
+    def wait_for_quota(self, endpoint: str, stock_code: str, timeout: Optional[float] = None) -> Optional[APIRequest]:
+        """等待到有可用限額後預先記錄一筆請求並返回（逾時返回 None）
+        
+        供背景批次工作使用：多個執行緒同時等待時依序取得限額，不會超出上限。
+        呼叫端完成請求後應更新返回記錄的 success 與 response_time。
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        windows = (
+            (60, self.RATE_LIMITS['requests_per_minute']),
+            (3600, self.RATE_LIMITS['requests_per_hour']),
+            (86400, self.RATE_LIMITS['requests_per_day']),
+        )
+        
+        with self._quota_lock:
+            while True:
+                now = time.time()
+                if self._shared is not None:
+                    # 檢查與記錄在共用檔案的同一個交易中完成，跨進程也不會超出上限
+                    wait = self._shared.try_acquire(now, windows, endpoint, stock_code)
+                    if wait <= 0:
+                        return self._append_request(endpoint, stock_code, False, timestamp=now)
+                else:
+                    timestamps = [r.timestamp for r in self.requests if r.timestamp >= now - 86400]
+                    wait = 0.0
+                    for window, limit in windows:
+                        in_window = [t for t in timestamps if t >= now - window]
+                        if len(in_window) >= limit:
+                            # 等到窗口內最早的請求過期，使數量降到上限以下
+                            wait = max(wait, in_window[len(in_window) - limit] + window - now)
+                    
+                    if wait <= 0:
+                        return self.record_request(endpoint, stock_code, False)
+                if deadline is not None and now + wait > deadline:
+                    return None
+                logger.info(f"API 限額已滿，等待 {wait:.1f} 秒")
+                time.sleep(wait)
+
 # 全局追蹤器實例
 quota_tracker = APIQuotaTracker()
 
@@ -0,0 +1,163 @@
+# bar_series.py - 快取用的欄位式 K 棒序列（array.array 欄位 + 字串駐留）
+
+"""
+快取中的日線 / 盤中 K 棒原本是一筆一個 dict（約 25 個字串鍵），
+一萬筆就要數 MB 且分散在堆積中。BarSeries 依欄位保存同一批記錄：
+
+- 整數欄位：array('q')；浮點欄位：array('d')
+- ISO 日期字串（YYYY-MM-DD）：以 array('i') 保存日序數
+- 其他字串：以 sys.intern 駐留後保存於 list（時間、盤別等重複值共用同一物件）
+- 所有列都相同的值（股票代號、名稱）只保存一份
+- 含 None 的數值欄位另以 bytearray 標記空值位置
+
+只在產生回應時以 to_records() 轉回原本的記錄格式（鍵順序與值型別不變），
+或以 to_columns() / to_columnar() 直接輸出欄位格式。
+"""
+
+import sys
+from array import array
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+# 欄位編碼方式
+_CONST = 'const'
+_INT = 'int'
+_FLOAT = 'float'
+_DATE = 'date'
+_STR = 'str'
+_OBJECT = 'object'
+
+# (編碼方式, 數據, 空值標記)
+Column = Tuple[str, Any, Optional[bytearray]]
+
+# 欄位格式回應中，所有列都相同時只在 meta 出現一次的欄位
+META_FIELDS = ('stockCode', 'stockName', 'indexName')
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if type(value) is str else value
+
+
+def _is_iso_date(value: str) -> bool:
+    if len(value) != 10 or value[4] != '-' or value[7] != '-':
+        return False
+    try:
+        return date.fromisoformat(value).isoformat() == value
+    except ValueError:
+        return False
+
+
+def _encode_column(values: List[Any]) -> Column:
+    """依欄位內容選擇最精簡的編碼；無法精確還原的欄位保留為 list"""
+    first = values[0]
+    if all(type(v) is type(first) and v == first for v in values):
+        return _CONST, _intern(first), None
+
+    present = [v for v in values if v is not None]
+    mask = bytearray(v is None for v in values) if len(present) < len(values) else None
+    types = {type(v) for v in present}
+
+    if types == {int}:
+        try:
+            return _INT, array('q', (0 if v is None else v for v in values)), mask
+        except OverflowError:
+            return _OBJECT, list(values), None
+    if types == {float}:
+        return _FLOAT, array('d', (0.0 if v is None else v for v in values)), mask
+    if types == {str}:
+        if mask is None and all(_is_iso_date(v) for v in values):
+            return _DATE, array('i', (date.fromisoformat(v).toordinal() for v in values)), None
+        return _STR, [_intern(v) for v in values], None
+    return _OBJECT, list(values), None
+
+
+def _decode_column(column: Column, start: int, stop: int) -> List[Any]:
+    kind, payload, mask = column
+    if kind == _CONST:
+        return [payload] * (stop - start)
+    if kind == _DATE:
+        return [date.fromordinal(v).isoformat() for v in payload[start:stop]]
+    values = payload[start:stop].tolist() if isinstance(payload, array) else payload[start:stop]
+    if mask is not None:
+        values = [None if is_null else v for v, is_null in zip(values, mask[start:stop])]
+    return values
+
+
+class BarSeries:
+    """一段依固定順序排列的 K 棒記錄（欄位式保存，切片與轉換時才建立 dict）"""
+
+    __slots__ = ('fields', 'columns', 'length')
+
+    def __init__(self, fields: List[str], columns: Dict[str, Column], length: int):
+        self.fields = fields
+        self.columns = columns
+        self.length = length
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]]) -> 'BarSeries':
+        """由記錄列表建立序列（欄位以第一筆記錄的鍵順序為準，缺少的鍵視為 None）"""
+        if not records:
+            return cls([], {}, 0)
+        fields = [_intern(key) for key in records[0]]
+        for record in records:
+            for key in record:
+                if key not in fields:
+                    fields.append(_intern(key))
+        columns = {key: _encode_column([record.get(key) for record in records]) for key in fields}
+        return cls(fields, columns, len(records))
+
+    def __len__(self) -> int:
+        return self.length
+
+    def to_columns(self, start: int = 0, stop: Optional[int] = None) -> Dict[str, List[Any]]:
+        """輸出 [start, stop) 範圍的欄位格式 {欄位: 值列表}"""
+        start, stop, _ = slice(start, stop).indices(self.length)
+        return {key: _decode_column(self.columns[key], start, stop) for key in self.fields}
+
+    def to_columnar(self, start: int = 0, stop: Optional[int] = None) -> Dict[str, Any]:
+        """輸出 [start, stop) 範圍的欄位格式回應主體（格式同 columnar_payload）"""
+        start, stop, _ = slice(start, stop).indices(self.length)
+        meta = {
+            key: self.columns[key][1] for key in META_FIELDS
+            if key in self.columns and self.columns[key][0] == _CONST
+        }
+        columns = {
+            key: _decode_column(self.columns[key], start, stop) for key in self.fields if key not in meta
+        }
+        return {'count': max(0, stop - start), 'meta': meta, 'columns': columns}
+
+    def to_records(self, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        """轉回 [start, stop) 範圍的記錄列表（與建立時的記錄格式相同）"""
+        columns = self.to_columns(start, stop)
+        fields = self.fields
+        return [dict(zip(fields, row)) for row in zip(*(columns[key] for key in fields))]
+
+
+def records_to_columns(records: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """記錄列表轉為 {欄位: 值列表}（欄位以第一筆記錄的鍵順序為準，缺少的鍵視為 None）"""
+    if not records:
+        return {}
+    fields = list(records[0])
+    for record in records:
+        if len(record) != len(fields) or any(key not in fields for key in record):
+            fields.extend(key for key in record if key not in fields)
+    return {key: [record.get(key) for record in records] for key in fields}
+
+
+def columnar_payload(columns: Dict[str, List[Any]]) -> Dict[str, Any]:
+    """欄位格式回應主體 {count, meta, columns}
+
+    META_FIELDS 中所有列都相同的欄位（股票代號、名稱、指數名稱）移到 meta，只出現一次；
+    其餘欄位各為一個與 count 等長的陣列。
+    """
+    count = len(next(iter(columns.values()))) if columns else 0
+    meta = {}
+    for key in META_FIELDS:
+        values = columns.get(key)
+        if values and values.count(values[0]) == len(values):
+            meta[key] = values[0]
+    return {
+        'count': count,
+        'meta': meta,
+        'columns': {key: values for key, values in columns.items() if key not in meta}
+    }
@@ -1,10 +1,29 @@
 # cache_service.py - 快取服務（內存快取 + 資料庫快取）
 
 import time
+import asyncio
+import atexit
+import pickle
+import zlib
 import logging
-from typing import Optional, Dict, Any, List
+import threading
+from typing import Optional, Dict, Any, List, Iterable, Set, Tuple
 from datetime import datetime, timedelta
 from functools import wraps
+from core.config import (
+    CACHE_DB_BATCH_SIZE,
+    CACHE_DB_FLUSH_INTERVAL,
+    CACHE_DB_COMPRESS_LEVEL,
+    CACHE_JANITOR_INTERVAL,
+    CACHE_JANITOR_BATCH_SIZE,
+    CACHE_STORE_UNLOGGED,
+    CACHE_WARM_START_LIMIT,
+    CACHE_WARM_START_CHUNK,
+    CACHE_DB_WRITE_THROUGH
+)
+
+from services.bar_series import BarSeries
+from services.shared_cache import get_shared_store
 
 logger = logging.getLogger(__name__)
 
@@ -21,13 +40,31 @@ except ImportError:
 # 內存快取（簡單的字典實現）
 _memory_cache: Dict[str, Dict[str, Any]] = {}
 
+# CACHE_BACKEND=sqlite 時改用多個 worker 共用的快取檔案（此時不使用 _memory_cache 與 _tag_index，
+# 命中/未命中等計數仍為各進程自己的統計）
+_shared_store = get_shared_store()
+
+# 內存快取統計：各快取類型的筆數、大小與命中/未命中/淘汰次數（寫入與刪除時增量維護）
+_memory_lock = threading.Lock()
+_memory_type_stats: Dict[str, Dict[str, int]] = {}
+_memory_total_bytes = 0
+
+# 標籤索引：標籤 -> 快取鍵集合（與 _memory_cache 一同在 _memory_lock 下維護）
+# 標籤格式為 "stock:2330"、"type:financial"、"group:<群組 ID>"
+_tag_index: Dict[str, Set[str]] = {}
+
+# 快取鍵第二段為股票代號的快取類型（寫入時自動加上 stock: 標籤）
+STOCK_CACHE_TYPES = {'stock_info', 'daily_trade', 'intraday', 'financial'}
+
 # 快取配置
 CACHE_TTL = {
     'stock_info': 300,  # 5分鐘（股票基本資訊更新頻繁）
     'daily_trade': 3600,  # 1小時（日交易數據一天更新一次）
-    'intraday': 60,  # 1分鐘（盤中數據更新頻繁）
+    'intraday': 3600,  # 1小時（當日盤中 K 棒序列；新鮮度由 INTRADAY_REFRESH_INTERVAL 控制，重新整理時只增量抓取）
     'market_index': 300,  # 5分鐘
     'financial': 86400,  # 24小時（財務報表更新不頻繁）
+    'stock_groups': 300,  # 5分鐘（群組異動時由回應快取中介層主動清除）
+    'bom': 300,  # 5分鐘（BOM 異動時由回應快取中介層主動清除）
 }
 
 def get_cache_key(prefix: str, *args, **kwargs) -> str:
@@ -40,51 +77,272 @@ def get_cache_key(prefix: str, *args, **kwargs) -> str:
         key_parts.extend(f"{k}={v}" for k, v in sorted_kwargs)
     return ":".join(key_parts)
 
+def _cache_type_of(key: str) -> str:
+    """從快取鍵取得快取類型（鍵的第一段前綴）"""
+    return key.split(':', 1)[0]
+
+def get_cache_tags(key: str, tags: Optional[Iterable[str]] = None) -> Set[str]:
+    """取得快取鍵的標籤：由鍵推導的 type:/stock: 標籤加上呼叫端指定的標籤"""
+    parts = key.split(':', 2)
+    result = {f"type:{parts[0]}"}
+    if parts[0] in STOCK_CACHE_TYPES and len(parts) > 1 and parts[1]:
+        result.add(f"stock:{parts[1]}")
+    if tags:
+        result.update(tags)
+    return result
+
+def _unindex_tags(key: str, tags: Iterable[str]):
+    """從標籤索引移除快取鍵（呼叫端需持有 _memory_lock）"""
+    for tag in tags:
+        keys = _tag_index.get(tag)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del _tag_index[tag]
+
+def _type_stats_template() -> Dict[str, int]:
+    return {'entries': 0, 'bytes': 0, 'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+def _type_stats(cache_type: str) -> Dict[str, int]:
+    """取得快取類型的統計計數（呼叫端需持有 _memory_lock）"""
+    stats = _memory_type_stats.get(cache_type)
+    if stats is None:
+        stats = _type_stats_template()
+        _memory_type_stats[cache_type] = stats
+    return stats
+
+def _count_access(key: str, counter: str):
+    with _memory_lock:
+        _type_stats(_cache_type_of(key))[counter] += 1
+
+def _store_memory_entry(key: str, data: Any, expires_at: float, size: int, tags: Set[str]):
+    """寫入內存快取並更新統計與標籤索引（取代既有鍵時扣除舊的大小與標籤）"""
+    global _memory_total_bytes
+    with _memory_lock:
+        stats = _type_stats(_cache_type_of(key))
+        old = _memory_cache.get(key)
+        if old is not None:
+            stats['entries'] -= 1
+            stats['bytes'] -= old.get('size', 0)
+            _memory_total_bytes -= old.get('size', 0)
+            _unindex_tags(key, old.get('tags', ()))
+        _memory_cache[key] = {
+            'data': data,
+            'expires_at': expires_at,
+            'cached_at': time.time(),
+            'size': size,
+            'tags': frozenset(tags)
+        }
+        for tag in tags:
+            _tag_index.setdefault(tag, set()).add(key)
+        stats['entries'] += 1
+        stats['bytes'] += size
+        _memory_total_bytes += size
+
+def _remove_memory_entry(key: str, counter: str):
+    """刪除內存快取並更新統計（counter 為 evictions 或 invalidations）"""
+    global _memory_total_bytes
+    with _memory_lock:
+        entry = _memory_cache.pop(key, None)
+        if entry is None:
+            return
+        stats = _type_stats(_cache_type_of(key))
+        stats['entries'] -= 1
+        stats['bytes'] -= entry.get('size', 0)
+        stats[counter] += 1
+        _memory_total_bytes -= entry.get('size', 0)
+        _unindex_tags(key, entry.get('tags', ()))
+
+def _remove_keys(keys: Iterable[str], counter: str) -> int:
+    """刪除多個快取鍵並更新統計，返回刪除的鍵數"""
+    if _shared_store is not None:
+        deleted = _shared_store.delete(keys)
+        for key in deleted:
+            _count_access(key, counter)
+        return len(deleted)
+    keys = list(keys)
+    for key in keys:
+        _remove_memory_entry(key, counter)
+    return len(keys)
+
+def _peek_cache(key: str) -> Optional[Any]:
+    """讀取未過期的快取數據（不計入命中統計）"""
+    if _shared_store is not None:
+        payload, _ = _shared_store.get(key, time.time())
+        return None if payload is None else pickle.loads(payload)
+    entry = _memory_cache.get(key)
+    if entry is None or time.time() >= entry.get('expires_at', 0):
+        return None
+    return entry.get('data')
+
+def _get_from_shared_cache(key: str) -> Optional[Any]:
+    payload, expired = _shared_store.get(key, time.time())
+    if payload is None:
+        if expired:
+            _count_access(key, 'evictions')
+        _count_access(key, 'misses')
+        return None
+    _count_access(key, 'hits')
+    if CACHE_DB_WRITE_THROUGH:
+        _touch_db_cache(key)
+    return pickle.loads(payload)
+
 def get_from_memory_cache(key: str) -> Optional[Dict[str, Any]]:
-    """從內存快取獲取數據"""
-    if key in _memory_cache:
-        cached_data = _memory_cache[key]
+    """從內存快取（或共用快取檔案）獲取數據"""
+    if _shared_store is not None:
+        return _get_from_shared_cache(key)
+    cached_data = _memory_cache.get(key)
+    if cached_data is not None:
         # 檢查是否過期
         if time.time() < cached_data.get('expires_at', 0):
             logger.debug(f"快取命中: {key}")
+            _count_access(key, 'hits')
+            if CACHE_DB_WRITE_THROUGH:
+                _touch_db_cache(key)
             return cached_data.get('data')
         else:
             # 過期，刪除
-            del _memory_cache[key]
+            _remove_memory_entry(key, 'evictions')
             logger.debug(f"快取過期: {key}")
+    _count_access(key, 'misses')
     return None
 
-def set_to_memory_cache(key: str, data: Any, ttl: int):
-    """設置內存快取"""
-    _memory_cache[key] = {
-        'data': data,
-        'expires_at': time.time() + ttl,
-        'cached_at': time.time()
-    }
+def set_to_memory_cache(key: str, data: Any, ttl: float, tags: Optional[Iterable[str]] = None,
+                        write_through: bool = True):
+    """設置內存快取
+    
+    寫入時序列化一次，以序列化後的大小作為此筆快取的大小；
+    啟用寫穿時同一份序列化結果直接交給資料庫快取（write_through=False 時不寫穿，
+    例如數據本來就來自資料庫快取，或呼叫端會自行以指定的快取類型寫入）。
+    除了由鍵推導的 type:/stock: 標籤外，可用 tags 加上額外標籤（例如 group:<群組 ID>）。
+    """
+    serialized = _serialize_cache_data(data)
+    if _shared_store is not None:
+        _shared_store.set(key, _cache_type_of(key), serialized, time.time() + ttl, get_cache_tags(key, tags))
+    else:
+        _store_memory_entry(key, data, time.time() + ttl, len(serialized), get_cache_tags(key, tags))
     logger.debug(f"設置快取: {key}, TTL: {ttl}秒")
+    if CACHE_DB_WRITE_THROUGH and write_through:
+        save_to_db_cache(key, data, _cache_type_of(key), ttl, serialized=serialized)
 
 def clear_memory_cache(pattern: str = None):
-    """清除內存快取"""
+    """清除內存快取（pattern 為子字串比對，需逐一掃描所有鍵；精確失效請使用 invalidate_cache_tags）"""
+    if _shared_store is not None:
+        keys = _shared_store.keys_matching(pattern or None)
+    elif pattern:
+        keys = [k for k in list(_memory_cache.keys()) if pattern in k]
+    else:
+        keys = list(_memory_cache.keys())
+    deleted = _remove_keys(keys, 'invalidations')
     if pattern:
-        keys_to_delete = [k for k in _memory_cache.keys() if pattern in k]
-        for key in keys_to_delete:
-            del _memory_cache[key]
-        logger.info(f"清除快取: {len(keys_to_delete)} 個鍵（模式: {pattern}）")
+        logger.info(f"清除快取: {deleted} 個鍵（模式: {pattern}）")
     else:
-        _memory_cache.clear()
         logger.info("清除所有快取")
 
+def invalidate_cache_tags(tags: Iterable[str]) -> int:
+    """清除帶有任一指定標籤的快取，返回清除的鍵數
+    
+    透過標籤索引直接找到對應的鍵，成本只與符合的鍵數有關；
+    資料庫快取中的同名鍵一併刪除，避免重新啟動預熱時載回已失效的數據。
+    """
+    tags = set(tags)
+    if _shared_store is not None:
+        keys = _shared_store.keys_with_tags(tags)
+    else:
+        with _memory_lock:
+            keys = set().union(*(_tag_index.get(tag, ()) for tag in tags)) if tags else set()
+    deleted = _remove_keys(keys, 'invalidations')
+    if keys:
+        delete_from_db_cache(keys)
+    logger.info(f"依標籤清除快取: {deleted} 個鍵（標籤: {', '.join(sorted(tags))}）")
+    return deleted
+
+def get_daily_trades_from_cache(stock_code: str, days: int) -> Optional[List[Dict[str, Any]]]:
+    """從日交易快取取出最近 days 筆（依日期降序）
+
+    每檔股票只保存一份目前抓取過最寬的視窗，較小的 days 直接從中切片；
+    快取不存在或涵蓋的天數不足時返回 None，由呼叫端向下一層來源取得後再擴充。
+    """
+    entry = get_from_memory_cache(get_cache_key('daily_trade', stock_code))
+    if not isinstance(entry, dict) or entry.get('days', 0) < days:
+        return None
+    return entry['data'].to_records(0, days)
+
+def get_daily_trades_columnar_from_cache(stock_code: str, days: int) -> Optional[Dict[str, Any]]:
+    """同 get_daily_trades_from_cache，但直接由 BarSeries 輸出欄位格式 {count, meta, columns}"""
+    entry = get_from_memory_cache(get_cache_key('daily_trade', stock_code))
+    if not isinstance(entry, dict) or entry.get('days', 0) < days:
+        return None
+    return entry['data'].to_columnar(0, days)
+
+def set_daily_trades_cache(stock_code: str, days: int, data: List[Dict[str, Any]]):
+    """以 days 天的視窗更新日交易快取（僅在比既有視窗更寬時覆蓋）
+
+    各來源的排序不同（yfinance 為升序，資料庫與欄位儲存為降序），
+    保存前統一依日期降序排列，切片即為最近的 N 筆；記錄以 BarSeries
+    欄位式保存，回應時才轉回 dict。
+    """
+    cache_key = get_cache_key('daily_trade', stock_code)
+    existing = _peek_cache(cache_key)
+    if isinstance(existing, dict) and existing.get('days', 0) >= days:
+        return
+    rows = sorted(data, key=lambda trade: str(trade.get('date') or ''), reverse=True)
+    set_to_memory_cache(cache_key, {'days': days, 'data': BarSeries.from_records(rows)}, CACHE_TTL['daily_trade'])
+
+def get_intraday_series_from_cache(stock_code: str, interval: str) -> Optional[Dict[str, Any]]:
+    """取出當日盤中 K 棒序列 {'hist': yfinance DataFrame, 'refreshed_at': 上次向 yfinance 更新的時間戳}"""
+    entry = get_from_memory_cache(get_cache_key('intraday', stock_code, interval))
+    if not isinstance(entry, dict) or 'hist' not in entry:
+        return None
+    return entry
+
+def set_intraday_series_cache(stock_code: str, interval: str, hist: Any, refreshed_at: float):
+    """保存當日盤中 K 棒序列（每次增量更新後整份覆寫）"""
+    set_to_memory_cache(
+        get_cache_key('intraday', stock_code, interval),
+        {'hist': hist, 'refreshed_at': refreshed_at},
+        CACHE_TTL['intraday']
+    )
+
 def get_cache_stats() -> Dict[str, Any]:
-    """獲取快取統計信息"""
-    total_keys = len(_memory_cache)
-    expired_keys = sum(1 for v in _memory_cache.values() if time.time() >= v.get('expires_at', 0))
+    """獲取快取統計信息
+    
+    大小為寫入時記錄的序列化大小，總計與各類型計數皆為增量維護，
+    不需要逐筆序列化快取內容。使用共用快取檔案時，筆數與大小為所有 worker 共用的數字，
+    命中/未命中等計數為目前進程的統計。
+    """
+    now = time.time()
+    with _memory_lock:
+        total_bytes = _memory_total_bytes
+        by_type = {cache_type: dict(stats) for cache_type, stats in _memory_type_stats.items()}
+    
+    if _shared_store is not None:
+        shared = _shared_store.stats(now)
+        for cache_type, counts in shared.items():
+            stats = by_type.setdefault(cache_type, _type_stats_template())
+            stats['entries'], stats['bytes'] = counts['entries'], counts['bytes']
+        total_keys = sum(counts['entries'] for counts in shared.values())
+        expired_keys = sum(counts['expired'] for counts in shared.values())
+        total_bytes = sum(counts['bytes'] for counts in shared.values())
+    else:
+        total_keys = len(_memory_cache)
+        expired_keys = sum(1 for v in list(_memory_cache.values()) if now >= v.get('expires_at', 0))
     valid_keys = total_keys - expired_keys
     
+    for stats in by_type.values():
+        lookups = stats['hits'] + stats['misses']
+        stats['size_mb'] = stats.pop('bytes') / 1024 / 1024
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+    
     return {
         'total_keys': total_keys,
         'valid_keys': valid_keys,
         'expired_keys': expired_keys,
-        'cache_size_mb': sum(len(str(v).encode('utf-8')) for v in _memory_cache.values()) / 1024 / 1024
+        'cache_size_mb': total_bytes / 1024 / 1024,
+        'by_type': by_type,
+        'backend': 'sqlite' if _shared_store is not None else 'memory',
+        'db_janitor': dict(_janitor_stats),
+        'warm_start': dict(_warm_start_stats),
     }
 
 def cached(cache_type: str = 'stock_info', use_db: bool = True):
@@ -110,10 +368,13 @@ def cached(cache_type: str = 'stock_info', use_db: bool = True):
             # 2. 如果啟用資料庫快取，嘗試從資料庫獲取
             if use_db and DB_AVAILABLE:
                 try:
-                    db_data = get_from_db_cache(cache_key, cache_type)
-                    if db_data is not None:
-                        # 將資料庫數據放入內存快取
-                        set_to_memory_cache(cache_key, db_data, ttl)
+                    db_entry = get_db_cache_entry(cache_key, cache_type)
+                    if db_entry is not None:
+                        # 將資料庫數據放入內存快取：沿用原本的到期時間且不寫回資料庫，
+                        # 否則持續被讀取的快取每次都會延長到期時間而永不過期
+                        db_data, expires_at = db_entry
+                        remaining = (expires_at - datetime.now()).total_seconds()
+                        set_to_memory_cache(cache_key, db_data, remaining, write_through=False)
                         logger.info(f"從資料庫快取獲取: {cache_key}")
                         return db_data
                 except Exception as e:
@@ -125,7 +386,8 @@ def cached(cache_type: str = 'stock_info', use_db: bool = True):
                 
                 # 4. 保存到快取
                 if result is not None:
-                    set_to_memory_cache(cache_key, result, ttl)
+                    # 使用資料庫快取時由下方以 cache_type 寫入一次，不再經由寫穿重複寫入
+                    set_to_memory_cache(cache_key, result, ttl, write_through=not (use_db and DB_AVAILABLE))
                     
                     # 如果啟用資料庫快取，保存到資料庫
                     if use_db and DB_AVAILABLE:
@@ -150,99 +412,279 @@ try:
 except ImportError:
     pass
 
+# 資料庫快取寫入緩衝區（cache_key -> 待寫入的資料列），批次寫入以減少連接和交易次數
+_pending_db_writes: Dict[str, tuple] = {}
+_pending_db_lock = threading.Lock()
+_last_db_flush = time.time()
+
+# 快取命中的最近存取時間（cache_key -> 存取時間），隨批次寫入一併更新 last_accessed_at
+_pending_db_touches: Dict[str, datetime] = {}
+
+# 進行中的批次寫入數，以及期間被刪除的鍵（寫入失敗放回緩衝區時略過，避免已失效的快取復活）
+_db_flushes_in_progress = 0
+_deleted_during_flush: Set[str] = set()
+
+# 是否已排定背景批次寫入（同一時間最多一個，避免每次寫入快取都建立新的工作）
+_db_flush_scheduled = False
+_db_flush_tasks: Set[asyncio.Task] = set()
+
+# 啟動預熱的狀態
+_warm_start_stats: Dict[str, Any] = {
+    'loaded': 0,
+    'started_at': None,
+    'finished_at': None,
+}
+
+# 過期快取清理任務的狀態
+_janitor_task: Optional[asyncio.Task] = None
+_janitor_stats: Dict[str, Any] = {
+    'runs': 0,
+    'rows_reclaimed': 0,
+    'last_run_at': None,
+    'last_rows_reclaimed': 0,
+}
+
+def _db_timestamp(value: datetime):
+    """將時間轉換為資料庫參數（SQLite 以固定格式字串比較，PostgreSQL 直接使用 datetime）"""
+    if DB_TYPE == 'postgresql':
+        return value
+    return value.isoformat(sep=' ', timespec='seconds')
+
+def _parse_db_timestamp(value) -> datetime:
+    """將資料庫返回的時間（SQLite 為字串）轉換為 datetime"""
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+def _touch_db_cache(cache_key: str):
+    """記錄快取鍵的最近存取時間，於下次批次寫入時更新"""
+    with _pending_db_lock:
+        _pending_db_touches[cache_key] = datetime.now()
+
+def _serialize_cache_data(data: Any) -> bytes:
+    """序列化快取數據（pickle），其長度即為內存快取統計使用的大小"""
+    return pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+
+def _encode_cache_payload(data: Any, serialized: Optional[bytes] = None) -> bytes:
+    """序列化並壓縮快取數據（pickle + zlib），可傳入已序列化的結果"""
+    if serialized is None:
+        serialized = _serialize_cache_data(data)
+    return zlib.compress(serialized, CACHE_DB_COMPRESS_LEVEL)
+
+def _decode_cache_payload(payload) -> Any:
+    """解壓縮並反序列化快取數據（PostgreSQL BYTEA 可能返回 memoryview）"""
+    return pickle.loads(zlib.decompress(bytes(payload)))
+
 def get_from_db_cache(cache_key: str, cache_type: str) -> Optional[Any]:
     """從資料庫快取獲取數據"""
+    entry = get_db_cache_entry(cache_key, cache_type)
+    return entry[0] if entry is not None else None
+
+def get_db_cache_entry(cache_key: str, cache_type: str) -> Optional[Tuple[Any, datetime]]:
+    """從資料庫快取獲取 (數據, 到期時間)，放回內存快取時沿用原本的到期時間"""
     if not DB_AVAILABLE:
         return None
     
+    # 優先查看尚未寫入資料庫的緩衝區
+    with _pending_db_lock:
+        pending = _pending_db_writes.get(cache_key)
+    if pending is not None:
+        _, pending_type, payload, expires_at = pending
+        if pending_type == cache_type and expires_at > datetime.now():
+            return _decode_cache_payload(payload), expires_at
+    
     try:
-        from database import DB_TYPE
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # 根據資料庫類型選擇合適的時間函數
-        if DB_TYPE == 'postgresql':
-            time_func = "CURRENT_TIMESTAMP"
-        else:
-            time_func = "datetime('now')"
-        
-        cursor.execute(prepare_sql(f"""
-            SELECT data, expires_at FROM cache_store 
-            WHERE cache_key = ? AND cache_type = ? AND expires_at > {time_func}
-        """), (cache_key, cache_type))
+        cursor.execute(prepare_sql("""
+            SELECT payload, expires_at FROM cache_store 
+            WHERE cache_key = ? AND cache_type = ? AND expires_at > ?
+        """), (cache_key, cache_type, _db_timestamp(datetime.now())))
         
         row = cursor.fetchone()
         conn.close()
         
         if row:
-            import json
-            return json.loads(row['data'])
+            _touch_db_cache(cache_key)
+            return _decode_cache_payload(row['payload']), _parse_db_timestamp(row['expires_at'])
         return None
     except Exception as e:
         logger.warning(f"從資料庫快取獲取失敗: {str(e)}")
         return None
 
-def save_to_db_cache(cache_key: str, data: Any, cache_type: str, ttl: int):
-    """保存數據到資料庫快取"""
+def save_to_db_cache(cache_key: str, data: Any, cache_type: str, ttl: int, serialized: Optional[bytes] = None):
+    """保存數據到資料庫快取（先放入緩衝區，達到批次大小或時間間隔後批次寫入）"""
     if not DB_AVAILABLE:
         return
     
     try:
-        import json
-        import sqlite3
-        from datetime import datetime, timedelta
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        expires_at = datetime.now() + timedelta(seconds=ttl)
+        payload = _encode_cache_payload(data, serialized)
         
-        # 創建快取表（如果不存在）
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS cache_store (
-                cache_key TEXT PRIMARY KEY,
-                cache_type TEXT NOT NULL,
-                data TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                expires_at TIMESTAMP NOT NULL
+        with _pending_db_lock:
+            _pending_db_writes[cache_key] = (cache_key, cache_type, payload, expires_at)
+            should_flush = (
+                len(_pending_db_writes) >= CACHE_DB_BATCH_SIZE or
+                time.time() - _last_db_flush >= CACHE_DB_FLUSH_INTERVAL
             )
-        """)
         
-        # 創建索引
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_cache_type ON cache_store(cache_type)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache_store(expires_at)
-        """)
+        logger.debug(f"加入資料庫快取寫入緩衝區: {cache_key}")
+        if should_flush:
+            _schedule_db_cache_flush()
+    except Exception as e:
+        logger.warning(f"保存到資料庫快取失敗: {str(e)}")
+
+def _schedule_db_cache_flush():
+    """排定批次寫入：在事件迴圈中時交給執行緒執行，不在請求路徑上做資料庫 I/O；
+    沒有事件迴圈時（例如命令列腳本）直接寫入"""
+    global _db_flush_scheduled
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        flush_db_cache_writes()
+        return
+    
+    with _pending_db_lock:
+        if _db_flush_scheduled:
+            return
+        _db_flush_scheduled = True
+    task = loop.create_task(_run_scheduled_db_flush())
+    _db_flush_tasks.add(task)
+    task.add_done_callback(_db_flush_tasks.discard)
+
+async def _run_scheduled_db_flush():
+    global _db_flush_scheduled
+    try:
+        await asyncio.to_thread(flush_db_cache_writes)
+    finally:
+        with _pending_db_lock:
+            _db_flush_scheduled = False
+
+def delete_from_db_cache(cache_keys: Iterable[str]) -> int:
+    """刪除資料庫快取（含寫入緩衝區）中的指定鍵，返回資料庫刪除的筆數"""
+    if not DB_AVAILABLE:
+        return 0
+    
+    cache_keys = list(cache_keys)
+    with _pending_db_lock:
+        for cache_key in cache_keys:
+            _pending_db_writes.pop(cache_key, None)
+            _pending_db_touches.pop(cache_key, None)
+        if _db_flushes_in_progress:
+            _deleted_during_flush.update(cache_keys)
+    
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.executemany(
+            prepare_sql("DELETE FROM cache_store WHERE cache_key = ?"),
+            [(cache_key,) for cache_key in cache_keys]
+        )
+        deleted = cursor.rowcount or 0
+        conn.commit()
+        conn.close()
+        return deleted
+    except Exception as e:
+        logger.warning(f"刪除資料庫快取失敗: {str(e)}")
+        return 0
+
+def flush_db_cache_writes() -> int:
+    """將緩衝區中的快取數據批次寫入資料庫，返回寫入筆數
+    
+    寫入失敗時資料列放回緩衝區等待下次寫入；期間已有較新數據或已被刪除的鍵不放回。
+    """
+    global _last_db_flush, _db_flushes_in_progress
+    if not DB_AVAILABLE:
+        return 0
+    
+    with _pending_db_lock:
+        if not _pending_db_writes and not _pending_db_touches:
+            _last_db_flush = time.time()
+            return 0
+        rows = list(_pending_db_writes.values())
+        pending_touches = {
+            cache_key: accessed_at
+            for cache_key, accessed_at in _pending_db_touches.items()
+            if cache_key not in _pending_db_writes
+        }
+        _pending_db_writes.clear()
+        _pending_db_touches.clear()
+        _last_db_flush = time.time()
+        _db_flushes_in_progress += 1
+    
+    touches = [(_db_timestamp(accessed_at), cache_key) for cache_key, accessed_at in pending_touches.items()]
+    written = False
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
         
-        expires_at = (datetime.now() + timedelta(seconds=ttl)).isoformat()
-        data_json = json.dumps(data, ensure_ascii=False)
+        now = _db_timestamp(datetime.now())
+        params = [
+            (cache_key, cache_type, payload, _db_timestamp(expires_at), now)
+            for cache_key, cache_type, payload, expires_at in rows
+        ]
         
         # 根據資料庫類型選擇合適的插入語句
-        if DB_TYPE == 'postgresql':
+        if params and DB_TYPE == 'postgresql':
             # PostgreSQL 使用 ON CONFLICT
-            cursor.execute(prepare_sql("""
-                INSERT INTO cache_store (cache_key, cache_type, data, expires_at)
-                VALUES (?, ?, ?, ?)
+            cursor.executemany(prepare_sql("""
+                INSERT INTO cache_store (cache_key, cache_type, payload, expires_at, last_accessed_at)
+                VALUES (?, ?, ?, ?, ?)
                 ON CONFLICT (cache_key) DO UPDATE SET
                     cache_type = EXCLUDED.cache_type,
-                    data = EXCLUDED.data,
-                    expires_at = EXCLUDED.expires_at
-            """), (cache_key, cache_type, data_json, expires_at))
-        else:
+                    payload = EXCLUDED.payload,
+                    expires_at = EXCLUDED.expires_at,
+                    last_accessed_at = EXCLUDED.last_accessed_at
+            """), params)
+        elif params:
             # SQLite 使用 INSERT OR REPLACE
-            cursor.execute(prepare_sql("""
-            INSERT OR REPLACE INTO cache_store (cache_key, cache_type, data, expires_at)
-            VALUES (?, ?, ?, ?)
-            """), (cache_key, cache_type, data_json, expires_at))
+            cursor.executemany(prepare_sql("""
+                INSERT OR REPLACE INTO cache_store (cache_key, cache_type, payload, expires_at, last_accessed_at)
+                VALUES (?, ?, ?, ?, ?)
+            """), params)
+        
+        if touches:
+            cursor.executemany(prepare_sql("""
+                UPDATE cache_store SET last_accessed_at = ? WHERE cache_key = ?
+            """), touches)
         
         conn.commit()
         conn.close()
-        logger.debug(f"保存到資料庫快取: {cache_key}")
+        written = True
+        logger.debug(f"批次寫入資料庫快取: {len(rows)} 筆")
+        return len(rows)
     except Exception as e:
-        logger.warning(f"保存到資料庫快取失敗: {str(e)}")
+        logger.warning(f"批次寫入資料庫快取失敗（{len(rows)} 筆，已放回緩衝區）: {str(e)}")
+        return 0
+    finally:
+        with _pending_db_lock:
+            if not written:
+                now = datetime.now()
+                for row in rows:
+                    cache_key, expires_at = row[0], row[3]
+                    if cache_key not in _deleted_during_flush and expires_at > now:
+                        _pending_db_writes.setdefault(cache_key, row)
+                for cache_key, accessed_at in pending_touches.items():
+                    if cache_key not in _deleted_during_flush:
+                        _pending_db_touches.setdefault(cache_key, accessed_at)
+            _db_flushes_in_progress -= 1
+            if not _db_flushes_in_progress:
+                _deleted_during_flush.clear()
+
+def _get_cache_store_columns(cursor) -> List[str]:
+    """獲取現有 cache_store 表的欄位名稱（表不存在時返回空列表）"""
+    if DB_TYPE == 'postgresql':
+        cursor.execute("""
+            SELECT column_name AS name FROM information_schema.columns
+            WHERE table_name = 'cache_store'
+        """)
+    else:
+        cursor.execute("PRAGMA table_info(cache_store)")
+    return [row['name'] for row in cursor.fetchall()]
 
 def init_cache_table():
-    """初始化快取表"""
+    """初始化快取表（應用啟動時執行一次，寫入路徑不再執行 DDL）"""
     if not DB_AVAILABLE:
         return
     
@@ -250,31 +692,58 @@ def init_cache_table():
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS cache_store (
+        # 舊版快取表以 TEXT 儲存 JSON，純快取數據直接重建即可
+        columns = _get_cache_store_columns(cursor)
+        if columns and 'payload' not in columns:
+            logger.info("偵測到舊版快取表格式，重建 cache_store")
+            cursor.execute("DROP TABLE cache_store")
+        
+        blob_type = "BYTEA" if DB_TYPE == 'postgresql' else "BLOB"
+        # 快取數據可隨時重建，PostgreSQL 可選擇使用 UNLOGGED 表以省去 WAL 寫入
+        table_kind = "UNLOGGED TABLE" if DB_TYPE == 'postgresql' and CACHE_STORE_UNLOGGED else "TABLE"
+        cursor.execute(f"""
+            CREATE {table_kind} IF NOT EXISTS cache_store (
                 cache_key TEXT PRIMARY KEY,
                 cache_type TEXT NOT NULL,
-                data TEXT NOT NULL,
+                payload {blob_type} NOT NULL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                expires_at TIMESTAMP NOT NULL
+                expires_at TIMESTAMP NOT NULL,
+                last_accessed_at TIMESTAMP
             )
         """)
         
+        # 補上預熱功能所需的最近存取時間欄位
+        if columns and 'payload' in columns and 'last_accessed_at' not in columns:
+            cursor.execute("ALTER TABLE cache_store ADD COLUMN last_accessed_at TIMESTAMP")
+            cursor.execute("UPDATE cache_store SET last_accessed_at = created_at")
+        
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_cache_type ON cache_store(cache_type)
         """)
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache_store(expires_at)
         """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_cache_last_accessed ON cache_store(last_accessed_at)
+        """)
         
-        # 清理過期快取
-        from database import DB_TYPE
+        # 既有的表依設定切換 LOGGED / UNLOGGED
         if DB_TYPE == 'postgresql':
-            time_func = "CURRENT_TIMESTAMP"
-        else:
-            time_func = "datetime('now')"
+            cursor.execute("SELECT relpersistence FROM pg_class WHERE relname = 'cache_store'")
+            row = cursor.fetchone()
+            is_unlogged = row is not None and row['relpersistence'] == 'u'
+            if CACHE_STORE_UNLOGGED and not is_unlogged:
+                cursor.execute("ALTER TABLE cache_store SET UNLOGGED")
+                logger.info("cache_store 已切換為 UNLOGGED 表")
+            elif not CACHE_STORE_UNLOGGED and is_unlogged:
+                cursor.execute("ALTER TABLE cache_store SET LOGGED")
+                logger.info("cache_store 已切換為一般（LOGGED）表")
         
-        cursor.execute(f"DELETE FROM cache_store WHERE expires_at < {time_func}")
+        # 清理過期快取
+        cursor.execute(
+            prepare_sql("DELETE FROM cache_store WHERE expires_at < ?"),
+            (_db_timestamp(datetime.now()),)
+        )
         
         conn.commit()
         conn.close()
@@ -282,10 +751,160 @@ def init_cache_table():
     except Exception as e:
         logger.error(f"快取表初始化失敗: {str(e)}")
 
+def purge_expired_db_cache(batch_size: int = CACHE_JANITOR_BATCH_SIZE) -> int:
+    """分批刪除資料庫中已過期的快取，返回回收的筆數
+    
+    每批最多刪除 batch_size 筆並立即提交，避免長時間持有鎖；
+    子查詢依 expires_at 排序以使用 idx_cache_expires 索引。
+    """
+    if not DB_AVAILABLE:
+        return 0
+    
+    # 先寫入緩衝區，讓週期任務同時負責按時間間隔寫入
+    flush_db_cache_writes()
+    
+    reclaimed = 0
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        now = _db_timestamp(datetime.now())
+        
+        while True:
+            cursor.execute(prepare_sql("""
+                DELETE FROM cache_store WHERE cache_key IN (
+                    SELECT cache_key FROM cache_store
+                    WHERE expires_at < ?
+                    ORDER BY expires_at
+                    LIMIT ?
+                )
+            """), (now, batch_size))
+            deleted = cursor.rowcount or 0
+            conn.commit()
+            reclaimed += deleted
+            if deleted < batch_size:
+                break
+        
+        conn.close()
+    except Exception as e:
+        logger.warning(f"清理過期資料庫快取失敗: {str(e)}")
+    
+    _janitor_stats['runs'] += 1
+    _janitor_stats['rows_reclaimed'] += reclaimed
+    _janitor_stats['last_run_at'] = datetime.now().isoformat()
+    _janitor_stats['last_rows_reclaimed'] = reclaimed
+    if reclaimed:
+        logger.info(f"清理過期資料庫快取: 回收 {reclaimed} 筆")
+    return reclaimed
+
+async def _run_cache_janitor(interval: int):
+    """週期性清理過期資料庫快取（在執行緒中執行，不阻塞事件迴圈）"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if _shared_store is not None:
+                await asyncio.to_thread(_shared_store.purge_expired, time.time())
+            await asyncio.to_thread(purge_expired_db_cache)
+        except Exception as e:
+            logger.warning(f"快取清理任務執行失敗: {str(e)}")
+
+def start_cache_janitor(interval: int = CACHE_JANITOR_INTERVAL) -> Optional[asyncio.Task]:
+    """啟動過期快取清理背景任務（需在事件迴圈中呼叫）"""
+    global _janitor_task
+    if not DB_AVAILABLE:
+        return None
+    if _janitor_task is None or _janitor_task.done():
+        _janitor_task = asyncio.get_running_loop().create_task(_run_cache_janitor(interval))
+        logger.info(f"快取清理任務已啟動，間隔: {interval}秒")
+    return _janitor_task
+
+def stop_cache_janitor():
+    """停止過期快取清理背景任務"""
+    global _janitor_task
+    if _janitor_task is not None:
+        _janitor_task.cancel()
+        _janitor_task = None
+
+def _load_db_cache_chunk(offset: int, limit: int) -> Tuple[int, List[tuple]]:
+    """依最近存取時間載入一批未過期的資料庫快取
+    
+    返回 (讀取的列數, [(cache_key, data, expires_at, size), ...])；無法解碼的列會略過，
+    但仍計入讀取的列數，呼叫端依此推進 OFFSET。
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(prepare_sql("""
+            SELECT cache_key, payload, expires_at FROM cache_store
+            WHERE expires_at > ?
+            ORDER BY last_accessed_at DESC
+            LIMIT ? OFFSET ?
+        """), (_db_timestamp(datetime.now()), limit, offset))
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+    
+    entries = []
+    for row in rows:
+        try:
+            serialized = zlib.decompress(bytes(row['payload']))
+            entries.append((
+                row['cache_key'],
+                pickle.loads(serialized),
+                _parse_db_timestamp(row['expires_at']),
+                len(serialized)
+            ))
+        except Exception as e:
+            logger.debug(f"略過無法解碼的快取: {row['cache_key']}: {str(e)}")
+    return len(rows), entries
+
+async def warm_memory_cache(
+    limit: int = CACHE_WARM_START_LIMIT,
+    chunk_size: int = CACHE_WARM_START_CHUNK
+) -> int:
+    """從 cache_store 載入最近存取的未過期快取到內存快取，返回載入筆數
+    
+    以固定批次在執行緒中讀取與解碼，批次之間讓出事件迴圈；
+    已存在於內存快取的鍵（啟動後寫入的較新數據）不會被覆蓋。
+    使用共用快取檔案時不需預熱（檔案內容在重新啟動後仍然存在）。
+    """
+    if not DB_AVAILABLE or _shared_store is not None:
+        return 0
+    
+    _warm_start_stats['started_at'] = datetime.now().isoformat()
+    loaded = 0
+    offset = 0
+    try:
+        while offset < limit:
+            scanned, entries = await asyncio.to_thread(_load_db_cache_chunk, offset, min(chunk_size, limit - offset))
+            if not scanned:
+                break
+            offset += scanned
+            for cache_key, data, expires_at, size in entries:
+                if cache_key in _memory_cache:
+                    continue
+                _store_memory_entry(cache_key, data, expires_at.timestamp(), size, get_cache_tags(cache_key))
+                loaded += 1
+            _warm_start_stats['loaded'] = loaded
+            await asyncio.sleep(0)
+    except Exception as e:
+        logger.warning(f"快取預熱失敗: {str(e)}")
+    
+    _warm_start_stats['finished_at'] = datetime.now().isoformat()
+    logger.info(f"快取預熱完成: 載入 {loaded} 筆")
+    return loaded
+
+def start_cache_warm_start() -> Optional[asyncio.Task]:
+    """在背景啟動快取預熱（不等待完成，不延遲應用就緒）"""
+    if not DB_AVAILABLE:
+        return None
+    return asyncio.get_running_loop().create_task(warm_memory_cache())
+
 # 初始化快取表
 if DB_AVAILABLE:
     try:
         init_cache_table()
     except Exception as e:
         logger.warning(f"初始化快取表失敗: {str(e)}")
-
+    
+    # 進程結束前寫入緩衝區中剩餘的快取數據
+    atexit.register(flush_db_cache_writes)
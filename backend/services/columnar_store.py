@@ -0,0 +1,263 @@
+# columnar_store.py - 以欄位檔案儲存日線 OHLCV 歷史（記憶體映射讀取）
+
+"""
+每檔股票一個目錄，每個欄位一個原始二進位檔（NumPy dtype，依日期升序），
+搭配 meta.json 記錄股票名稱與有效筆數：
+
+    {COLUMNAR_STORE_DIR}/2330/
+        date.bin   datetime64[D]
+        open.bin   float64
+        high.bin   float64
+        low.bin    float64
+        close.bin  float64
+        volume.bin int64
+        meta.json  {"stock_code": ..., "stock_name": ..., "rows": ...}
+
+讀取以 np.memmap 映射檔案，區間切片不複製數據；寫入只在尾端附加新交易日，
+最後一個交易日可原地更新（盤中重複抓取當日 K 棒）。meta.json 最後寫入，
+中途失敗時多出的位元組不會被讀到，下次附加前會先截斷。
+"""
+
+import os
+import json
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple
+
+import numpy as np
+
+from core.config import COLUMNAR_STORE_DIR
+
+logger = logging.getLogger(__name__)
+
+# 欄位名稱與 dtype（順序即寫入順序）
+COLUMNS: Dict[str, np.dtype] = {
+    'date': np.dtype('datetime64[D]'),
+    'open': np.dtype('float64'),
+    'high': np.dtype('float64'),
+    'low': np.dtype('float64'),
+    'close': np.dtype('float64'),
+    'volume': np.dtype('int64'),
+}
+
+# 日交易記錄欄位 -> 儲存欄位
+_RECORD_FIELDS = {
+    'open': 'openPrice',
+    'high': 'highPrice',
+    'low': 'lowPrice',
+    'close': 'closePrice',
+    'volume': 'totalVolume',
+}
+
+# 每檔股票的寫入鎖
+_stock_locks: Dict[str, threading.Lock] = {}
+_stock_locks_guard = threading.Lock()
+
+# 已映射的欄位：stock_code -> ((筆數, 世代), {欄位: memmap})
+# 附加新交易日會改變筆數、整檔重寫會遞增世代，兩者都會使舊映射失效；
+# 原地更新最後一筆透過共享映射直接可見
+_mapped_columns: Dict[str, Tuple[Tuple[int, int], Dict[str, np.memmap]]] = {}
+
+
+@dataclass
+class DailyBars:
+    """一段連續的日線數據；columns 中的陣列為記憶體映射的唯讀切片"""
+    stock_code: str
+    stock_name: str
+    columns: Dict[str, np.ndarray]
+
+    def __len__(self) -> int:
+        return len(self.columns['date'])
+
+
+def _stock_lock(stock_code: str) -> threading.Lock:
+    with _stock_locks_guard:
+        if stock_code not in _stock_locks:
+            _stock_locks[stock_code] = threading.Lock()
+        return _stock_locks[stock_code]
+
+
+def _stock_dir(stock_code: str) -> Path:
+    safe_code = "".join(c if c.isalnum() or c in '.^-_' else '_' for c in stock_code)
+    return Path(COLUMNAR_STORE_DIR) / safe_code
+
+
+def _read_meta(stock_dir: Path) -> Optional[Dict]:
+    try:
+        with open(stock_dir / 'meta.json', 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_meta(stock_dir: Path, meta: Dict):
+    tmp_path = stock_dir / 'meta.json.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, stock_dir / 'meta.json')
+
+
+def _map_column(stock_dir: Path, name: str, rows: int, mode: str = 'r') -> np.memmap:
+    return np.memmap(stock_dir / f'{name}.bin', dtype=COLUMNS[name], mode=mode, shape=(rows,))
+
+
+def read_daily_bars(stock_code: str, days: Optional[int] = None) -> Optional[DailyBars]:
+    """讀取最近 days 個交易日（None 表示全部）的欄位數據，無數據時返回 None
+
+    返回的陣列直接映射到檔案，不會複製數據；分析程式可直接做向量運算。
+    """
+    stock_dir = _stock_dir(stock_code)
+    meta = _read_meta(stock_dir)
+    if not meta or meta.get('rows', 0) <= 0:
+        return None
+
+    rows = meta['rows']
+    version = (rows, meta.get('generation', 0))
+    cached = _mapped_columns.get(stock_code)
+    if cached is None or cached[0] != version:
+        cached = (version, {name: _map_column(stock_dir, name, rows) for name in COLUMNS})
+        _mapped_columns[stock_code] = cached
+
+    start = max(rows - days, 0) if days is not None else 0
+    columns = {name: column[start:] for name, column in cached[1].items()}
+    return DailyBars(stock_code=stock_code, stock_name=meta.get('stock_name') or stock_code, columns=columns)
+
+
+def get_daily_trades_from_store(stock_code: str, days: int = 5) -> List[Dict]:
+    """以欄位儲存的數據建立日交易記錄（依日期降序，與資料庫查詢結果一致）"""
+    from services.yfinance_service import build_daily_trade_records
+
+    try:
+        # 多讀一天作為第一筆的前收盤/前成交量
+        bars = read_daily_bars(stock_code, days + 1)
+        if bars is None:
+            return []
+
+        columns = bars.columns
+        seed = 1 if len(bars) > days else 0
+        records = build_daily_trade_records(
+            stock_code,
+            bars.stock_name,
+            np.datetime_as_string(columns['date'][seed:], unit='D').tolist(),
+            columns['open'][seed:],
+            columns['high'][seed:],
+            columns['low'][seed:],
+            columns['close'][seed:],
+            columns['volume'][seed:],
+            prev_close=float(columns['close'][0]) if seed else None,
+            prev_volume=int(columns['volume'][0]) if seed else None
+        )
+        records.reverse()
+        return records
+    except Exception as e:
+        logger.error(f"從欄位儲存讀取日交易數據失敗 {stock_code}: {str(e)}")
+        return []
+
+
+def _records_to_columns(records: List[Dict]) -> Dict[str, np.ndarray]:
+    """將日交易記錄轉為依日期升序、日期不重複的欄位陣列（重複日期以後出現者為準）"""
+    by_date = {}
+    for record in records:
+        if record.get('date'):
+            by_date[str(record['date'])[:10]] = record
+    dates = sorted(by_date)
+
+    columns = {'date': np.array(dates, dtype=COLUMNS['date'])}
+    for name, field in _RECORD_FIELDS.items():
+        values = [by_date[d].get(field) for d in dates]
+        if COLUMNS[name].kind == 'f':
+            columns[name] = np.array([np.nan if v is None else v for v in values], dtype=COLUMNS[name])
+        else:
+            columns[name] = np.array([0 if v is None else v for v in values], dtype=COLUMNS[name])
+    return columns
+
+
+def _write_all(stock_dir: Path, meta: Dict, columns: Dict[str, np.ndarray]):
+    """重寫整檔股票的欄位檔案：先將有效筆數歸零，替換檔案後再寫入新的 meta"""
+    stock_dir.mkdir(parents=True, exist_ok=True)
+    if (stock_dir / 'meta.json').exists():
+        _write_meta(stock_dir, dict(meta, rows=0))
+
+    for name in COLUMNS:
+        tmp_path = stock_dir / f'{name}.bin.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(np.ascontiguousarray(columns[name], dtype=COLUMNS[name]).tobytes())
+        os.replace(tmp_path, stock_dir / f'{name}.bin')
+
+    _write_meta(stock_dir, dict(meta, rows=len(columns['date']), generation=meta.get('generation', 0) + 1))
+
+
+def append_daily_bars(stock_code: str, records: List[Dict]) -> int:
+    """將日交易記錄寫入欄位儲存，返回新增或更新的筆數（失敗時記錄錯誤並返回 0）"""
+    try:
+        return _append_daily_bars(stock_code, records)
+    except Exception as e:
+        logger.error(f"寫入欄位儲存失敗 {stock_code}: {str(e)}")
+        return 0
+
+
+def _append_daily_bars(stock_code: str, records: List[Dict]) -> int:
+    """依日期決定寫入方式：
+
+    - 晚於最後一個交易日的記錄附加到檔案尾端
+    - 與最後一個交易日相同的記錄原地更新
+    - 介於既有區間內的記錄忽略（歷史數據不變）
+    - 早於既有第一個交易日的記錄（回補更長的歷史）會觸發整檔重寫
+    """
+    if not records:
+        return 0
+
+    new = _records_to_columns(records)
+    if len(new['date']) == 0:
+        return 0
+    stock_name = next((r.get('stockName') for r in reversed(records) if r.get('stockName')), None)
+
+    with _stock_lock(stock_code):
+        stock_dir = _stock_dir(stock_code)
+        meta = _read_meta(stock_dir)
+        rows = meta.get('rows', 0) if meta else 0
+        meta = dict(meta or {}, stock_code=stock_code, stock_name=stock_name or (meta or {}).get('stock_name'))
+
+        if rows == 0:
+            _write_all(stock_dir, meta, new)
+            return len(new['date'])
+
+        stored_dates = _map_column(stock_dir, 'date', rows)
+        first_date, last_date = stored_dates[0], stored_dates[-1]
+
+        if new['date'][0] < first_date:
+            # 回補更早的歷史：合併後整檔重寫（既有數據優先，僅補入缺少的日期）
+            existing = {name: np.array(_map_column(stock_dir, name, rows)) for name in COLUMNS}
+            keep_new = ~np.isin(new['date'], existing['date'])
+            merged = {name: np.concatenate([new[name][keep_new], existing[name]]) for name in COLUMNS}
+            order = np.argsort(merged['date'], kind='stable')
+            _write_all(stock_dir, meta, {name: values[order] for name, values in merged.items()})
+            logger.info(f"[欄位儲存] {stock_code} 回補 {int(keep_new.sum())} 筆歷史，重寫為 {len(order)} 筆")
+            return int(keep_new.sum())
+
+        changed = 0
+        same_day = np.nonzero(new['date'] == last_date)[0]
+        if len(same_day):
+            i = same_day[-1]
+            for name in COLUMNS:
+                column = _map_column(stock_dir, name, rows, mode='r+')
+                column[-1] = new[name][i]
+                column.flush()
+                del column
+            changed += 1
+
+        tail = new['date'] > last_date
+        appended = int(tail.sum())
+        if appended:
+            for name in COLUMNS:
+                with open(stock_dir / f'{name}.bin', 'r+b') as f:
+                    # 截斷上次中途失敗時殘留的位元組
+                    f.truncate(rows * COLUMNS[name].itemsize)
+                    f.seek(0, os.SEEK_END)
+                    f.write(np.ascontiguousarray(new[name][tail]).tobytes())
+            changed += appended
+
+        _write_meta(stock_dir, dict(meta, rows=rows + appended))
+        return changed
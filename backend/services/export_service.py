@@ -0,0 +1,66 @@
+# export_service.py - 日交易數據串流匯出（NDJSON / CSV）
+
+"""
+將逐筆產生的記錄（例如 crud.iter_daily_trades_from_db）編碼為 NDJSON 或 CSV 位元組區塊。
+每次只持有一個區塊的內容，匯出再長的歷史記憶體用量也維持固定，由 StreamingResponse 逐塊送出。
+"""
+
+import csv
+import io
+from typing import Dict, Iterable, Iterator, List
+
+from core.responses import dumps
+
+# 匯出格式 -> Content-Type
+EXPORT_MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+# CSV 欄位順序（與日交易 API 的欄位名稱相同）
+DAILY_TRADE_EXPORT_FIELDS: List[str] = [
+    'stockCode', 'stockName', 'date', 'openPrice', 'highPrice', 'lowPrice', 'closePrice',
+    'avgPrice', 'prevClose', 'change', 'changePercent', 'totalVolume', 'prevVolume',
+    'innerVolume', 'outerVolume', 'foreignInvestor', 'investmentTrust', 'dealer', 'chips',
+    'mainBuy', 'mainSell', 'monthHigh', 'monthLow', 'quarterHigh',
+]
+
+# 累積到此大小才送出一個區塊，避免每筆記錄一次寫入
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+
+def iter_ndjson(records: Iterable[Dict], chunk_bytes: int = EXPORT_CHUNK_BYTES) -> Iterator[bytes]:
+    """每筆記錄一行 JSON"""
+    buffer = bytearray()
+    for record in records:
+        buffer += dumps(record)
+        buffer += b'\n'
+        if len(buffer) >= chunk_bytes:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def iter_csv(records: Iterable[Dict], fields: List[str] = DAILY_TRADE_EXPORT_FIELDS,
+             chunk_bytes: int = EXPORT_CHUNK_BYTES) -> Iterator[bytes]:
+    """CSV（含標題列；開頭加上 UTF-8 BOM，讓 Excel 正確顯示中文股票名稱）"""
+    text = io.StringIO()
+    writer = csv.DictWriter(text, fieldnames=fields, extrasaction='ignore', lineterminator='\n')
+    text.write('﻿')
+    writer.writeheader()
+    for record in records:
+        writer.writerow(record)
+        if text.tell() >= chunk_bytes:
+            yield text.getvalue().encode('utf-8')
+            text.seek(0)
+            text.truncate()
+    if text.tell():
+        yield text.getvalue().encode('utf-8')
+
+
+def iter_export(records: Iterable[Dict], export_format: str) -> Iterator[bytes]:
+    """依匯出格式編碼記錄"""
+    if export_format == 'csv':
+        return iter_csv(records)
+    return iter_ndjson(records)
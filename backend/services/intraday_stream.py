@@ -0,0 +1,217 @@
+# intraday_stream.py - 盤中數據推送（Server-Sent Events）
+
+"""
+每檔被訂閱的股票只有一個輪詢任務：以 get_intraday_data 取得當日 1 分 K，與上一次的結果比較，
+把新增或更新的 K 棒編碼一次後放入所有訂閱者的佇列。100 個客戶端同時看同一檔股票，
+上游仍只有一個輪詢，不再是每個圖表各自輪詢 /api/stock/intraday/{stock_code}。
+
+輪詢間隔依台股交易時段調整（週一至週五 09:00-13:30，台北時間；未考慮國定假日）：
+開盤時段為 INTRADAY_STREAM_INTERVAL，其他時間為 INTRADAY_STREAM_IDLE_INTERVAL，但不晚於下次開盤。
+
+事件格式（data 皆為 {"stockCode", "data": [K 棒記錄]}，記錄欄位與盤中數據 API 相同）：
+  snapshot：該股票當日完整的 K 棒，客戶端以此取代既有數據（訂閱時、換日時、重新同步時）
+  bars：新增或更新的 K 棒，客戶端依 (date, time) 覆寫合併
+另每 INTRADAY_STREAM_HEARTBEAT 秒送出註解行，避免代理伺服器關閉閒置連線。
+
+背壓：每個訂閱者的佇列最多 INTRADAY_STREAM_QUEUE_SIZE 個事件。慢速客戶端的佇列滿時丟棄最舊的事件，
+並標記該股票需要重新同步；客戶端下次讀取時先收到該股票最新的 snapshot，佇列中較舊的事件則略過。
+輪詢任務只做放入佇列（不等待），慢速客戶端不會拖慢其他訂閱者。
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, time as dt_time, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from core.config import (
+    INTRADAY_STREAM_INTERVAL,
+    INTRADAY_STREAM_IDLE_INTERVAL,
+    INTRADAY_STREAM_QUEUE_SIZE,
+    INTRADAY_STREAM_HEARTBEAT,
+)
+from core.responses import dumps
+from services.yfinance_service import get_intraday_data
+from services.api_quota_tracker import quota_tracker
+
+logger = logging.getLogger(__name__)
+
+TAIPEI_TZ = timezone(timedelta(hours=8))  # 台灣不實施日光節約時間
+MARKET_OPEN = dt_time(9, 0)
+MARKET_CLOSE = dt_time(13, 30)
+
+
+def is_market_open(now: Optional[datetime] = None) -> bool:
+    """目前是否為台股交易時段"""
+    now = now or datetime.now(TAIPEI_TZ)
+    return now.weekday() < 5 and MARKET_OPEN <= now.time() <= MARKET_CLOSE
+
+
+def next_poll_delay(now: Optional[datetime] = None) -> float:
+    """下次輪詢前的等待秒數"""
+    now = now or datetime.now(TAIPEI_TZ)
+    if is_market_open(now):
+        return INTRADAY_STREAM_INTERVAL
+
+    next_open = now.replace(hour=MARKET_OPEN.hour, minute=MARKET_OPEN.minute, second=0, microsecond=0)
+    if now >= next_open:
+        next_open += timedelta(days=1)
+    while next_open.weekday() >= 5:
+        next_open += timedelta(days=1)
+    return max(1.0, min(INTRADAY_STREAM_IDLE_INTERVAL, (next_open - now).total_seconds()))
+
+
+def _sse_event(event: str, payload: Dict) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + dumps(payload) + b"\n\n"
+
+
+class StreamSubscriber:
+    """一個 SSE 連線（可訂閱多檔股票）"""
+
+    def __init__(self, stock_codes: List[str], queue_size: int = INTRADAY_STREAM_QUEUE_SIZE):
+        self.stock_codes = stock_codes
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.resync: Set[str] = set(stock_codes)  # 需要先送出 snapshot 的股票
+        self.synced_seq: Dict[str, int] = {}  # 已送出的 snapshot 版本，佇列中不晚於此版本的事件略過
+        self.dropped = 0
+
+    def offer(self, stock_code: str, seq: int, event: bytes) -> bool:
+        """放入事件（不等待）；佇列已滿時丟棄最舊的事件並標記需要重新同步，返回是否有丟棄"""
+        dropped = False
+        if self.queue.full():
+            dropped_code, _, _ = self.queue.get_nowait()
+            self.resync.add(dropped_code)
+            self.dropped += 1
+            dropped = True
+        self.queue.put_nowait((stock_code, seq, event))
+        return dropped
+
+
+class _SymbolPoller:
+    """單一股票的輪詢狀態"""
+
+    def __init__(self, stock_code: str):
+        self.stock_code = stock_code
+        self.subscribers: Set[StreamSubscriber] = set()
+        self.bars: List[Dict] = []
+        self.seq = 0  # 每次有變化時遞增
+        self.task: Optional[asyncio.Task] = None
+        self._snapshot: Optional[Tuple[int, bytes]] = None
+
+    def snapshot_event(self) -> bytes:
+        """目前完整 K 棒的 snapshot 事件（同一版本只編碼一次）"""
+        if self._snapshot is None or self._snapshot[0] != self.seq:
+            self._snapshot = (self.seq, _sse_event('snapshot', {'stockCode': self.stock_code, 'data': self.bars}))
+        return self._snapshot[1]
+
+    def update(self, data: List[Dict]) -> Optional[bytes]:
+        """以最新一次輪詢的結果更新狀態，返回要分送的事件（沒有變化時返回 None）"""
+        if not self.bars or data[0]['date'] != self.bars[0]['date']:
+            # 第一次輪詢或換日：送出完整數據
+            self.bars = data
+            self.seq += 1
+            return self.snapshot_event()
+
+        previous = {(bar['date'], bar['time']): bar for bar in self.bars}
+        changed = [bar for bar in data if previous.get((bar['date'], bar['time'])) != bar]
+        self.bars = data
+        if not changed:
+            return None
+        self.seq += 1
+        return _sse_event('bars', {'stockCode': self.stock_code, 'data': changed})
+
+
+class IntradayStreamHub:
+    """盤中數據推送中心：管理每檔股票的輪詢任務與訂閱者"""
+
+    def __init__(self):
+        self._pollers: Dict[str, _SymbolPoller] = {}
+        self._stats = {'connections': 0, 'polls': 0, 'events': 0, 'dropped': 0}
+
+    def subscribe(self, stock_codes: List[str]) -> StreamSubscriber:
+        """建立訂閱者，尚未輪詢的股票啟動輪詢任務（需在事件迴圈中呼叫）"""
+        subscriber = StreamSubscriber(stock_codes)
+        for stock_code in stock_codes:
+            poller = self._pollers.get(stock_code)
+            if poller is None:
+                poller = self._pollers[stock_code] = _SymbolPoller(stock_code)
+            poller.subscribers.add(subscriber)
+            if poller.task is None or poller.task.done():
+                poller.task = asyncio.get_running_loop().create_task(self._run_poller(poller))
+                logger.info(f"[盤中推送] 開始輪詢: {stock_code}")
+        self._stats['connections'] += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: StreamSubscriber):
+        """移除訂閱者，沒有訂閱者的股票停止輪詢"""
+        for stock_code in subscriber.stock_codes:
+            poller = self._pollers.get(stock_code)
+            if poller is None:
+                continue
+            poller.subscribers.discard(subscriber)
+            if not poller.subscribers:
+                if poller.task is not None:
+                    poller.task.cancel()
+                del self._pollers[stock_code]
+                logger.info(f"[盤中推送] 停止輪詢: {stock_code}")
+        self._stats['connections'] -= 1
+
+    async def _run_poller(self, poller: _SymbolPoller):
+        while poller.subscribers:
+            try:
+                start_time = time.time()
+                data = await asyncio.to_thread(get_intraday_data, poller.stock_code)
+                quota_tracker.record_request('intraday_stream', poller.stock_code, bool(data), time.time() - start_time)
+                self._stats['polls'] += 1
+                event = poller.update(data) if data else None
+                if event is not None:
+                    self._stats['events'] += 1
+                    for subscriber in list(poller.subscribers):
+                        if subscriber.offer(poller.stock_code, poller.seq, event):
+                            self._stats['dropped'] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[盤中推送] 輪詢失敗 ({poller.stock_code}): {str(e)}")
+            await asyncio.sleep(next_poll_delay())
+
+    async def stream(self, stock_codes: List[str]) -> AsyncIterator[bytes]:
+        """SSE 事件串流（連線中斷時自動取消訂閱）"""
+        subscriber = self.subscribe(stock_codes)
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                while subscriber.resync:
+                    stock_code = subscriber.resync.pop()
+                    poller = self._pollers.get(stock_code)
+                    if poller is not None and poller.seq:
+                        subscriber.synced_seq[stock_code] = poller.seq
+                        yield poller.snapshot_event()
+                try:
+                    stock_code, seq, event = await asyncio.wait_for(subscriber.queue.get(), INTRADAY_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+                if seq > subscriber.synced_seq.get(stock_code, 0):
+                    yield event
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stop(self):
+        """停止所有輪詢任務（應用程式關閉時）"""
+        for poller in self._pollers.values():
+            if poller.task is not None:
+                poller.task.cancel()
+        self._pollers.clear()
+
+    def get_stats(self) -> Dict:
+        """推送統計：輪詢中的股票與各自的訂閱者數、連線數、輪詢與事件次數、丟棄的事件數"""
+        return {
+            **self._stats,
+            'symbols': {code: len(poller.subscribers) for code, poller in self._pollers.items()},
+            'market_open': is_market_open(),
+            'next_poll_delay': next_poll_delay(),
+        }
+
+
+intraday_stream_hub = IntradayStreamHub()
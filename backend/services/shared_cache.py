@@ -0,0 +1,226 @@
+# shared_cache.py - 多個 worker 進程共用的快取與 API 限額計數（WAL 模式 SQLite 檔案）
+
+"""
+以 uvicorn --workers / gunicorn 啟動多個 worker 時，每個進程各有一份內存快取與限額追蹤器，
+命中率會被 worker 數稀釋，yfinance 的請求量也會超出上限 N 倍。
+設定 CACHE_BACKEND=sqlite 後，cache_service 與 api_quota_tracker 改用本模組的共用檔案：
+
+- cache_entries：快取鍵、類型、序列化後的數據（pickle）、大小與到期時間
+- cache_tags：標籤索引（標籤 -> 快取鍵），供 invalidate_cache_tags 使用
+- quota_requests：每次 yfinance 請求的時間戳，所有 worker 依此計算各時間窗口的請求數
+
+檔案使用 WAL 模式，讀取不會被寫入阻塞；每個執行緒（與進程）各自持有一個連接。
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Optional, Dict, List, Iterable, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# quota_requests 保留的時間（秒）：限額最長的時間窗口為一天
+QUOTA_RETENTION_SECONDS = 86400
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS cache_entries (
+        cache_key TEXT PRIMARY KEY,
+        cache_type TEXT NOT NULL,
+        payload BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_cache_entries_expires ON cache_entries(expires_at)",
+    """
+    CREATE TABLE IF NOT EXISTS cache_tags (
+        tag TEXT NOT NULL,
+        cache_key TEXT NOT NULL,
+        PRIMARY KEY (tag, cache_key)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_cache_tags_key ON cache_tags(cache_key)",
+    """
+    CREATE TABLE IF NOT EXISTS quota_requests (
+        timestamp REAL NOT NULL,
+        endpoint TEXT,
+        stock_code TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_quota_requests_ts ON quota_requests(timestamp)",
+]
+
+
+class SharedCacheStore:
+    """共用快取檔案的存取介面（所有方法皆可在多執行緒、多進程間同時呼叫）"""
+
+    def __init__(self, path: Path, busy_timeout_ms: int = 5000):
+        self.path = Path(path)
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connection() as conn:
+            for ddl in _SCHEMA:
+                conn.execute(ddl)
+
+    def _connection(self) -> sqlite3.Connection:
+        """取得目前執行緒的連接（fork 後的子進程會重新建立連接）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(str(self.path), timeout=self.busy_timeout_ms / 1000, isolation_level=None)
+            conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout_ms}")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # ---- 快取 ----
+
+    def get(self, cache_key: str, now: float) -> Tuple[Optional[bytes], bool]:
+        """返回 (數據, 是否已過期)；過期的鍵會被刪除"""
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT payload, expires_at FROM cache_entries WHERE cache_key = ?", (cache_key,)
+        ).fetchone()
+        if row is None:
+            return None, False
+        if now >= row[1]:
+            self.delete([cache_key])
+            return None, True
+        return row[0], False
+
+    def set(self, cache_key: str, cache_type: str, payload: bytes, expires_at: float, tags: Iterable[str]):
+        """寫入（或取代）一筆快取與其標籤"""
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("""
+                INSERT OR REPLACE INTO cache_entries (cache_key, cache_type, payload, size, expires_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (cache_key, cache_type, payload, len(payload), expires_at))
+            conn.execute("DELETE FROM cache_tags WHERE cache_key = ?", (cache_key,))
+            conn.executemany(
+                "INSERT OR IGNORE INTO cache_tags (tag, cache_key) VALUES (?, ?)",
+                [(tag, cache_key) for tag in tags]
+            )
+
+    def delete(self, cache_keys: Iterable[str]) -> List[str]:
+        """刪除指定的鍵，返回實際刪除的鍵"""
+        cache_keys = list(cache_keys)
+        if not cache_keys:
+            return []
+        conn = self._connection()
+        deleted = []
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for cache_key in cache_keys:
+                if conn.execute("DELETE FROM cache_entries WHERE cache_key = ?", (cache_key,)).rowcount:
+                    deleted.append(cache_key)
+                conn.execute("DELETE FROM cache_tags WHERE cache_key = ?", (cache_key,))
+        return deleted
+
+    def keys_with_tags(self, tags: Iterable[str]) -> Set[str]:
+        """返回帶有任一指定標籤的鍵"""
+        tags = list(tags)
+        if not tags:
+            return set()
+        rows = self._connection().execute(
+            f"SELECT DISTINCT cache_key FROM cache_tags WHERE tag IN ({', '.join('?' for _ in tags)})", tags
+        ).fetchall()
+        return {row[0] for row in rows}
+
+    def keys_matching(self, pattern: Optional[str] = None) -> List[str]:
+        """返回包含子字串 pattern 的鍵（None 表示全部）"""
+        conn = self._connection()
+        if pattern is None:
+            rows = conn.execute("SELECT cache_key FROM cache_entries").fetchall()
+        else:
+            rows = conn.execute("SELECT cache_key FROM cache_entries WHERE instr(cache_key, ?) > 0", (pattern,)).fetchall()
+        return [row[0] for row in rows]
+
+    def stats(self, now: float) -> Dict[str, Dict[str, int]]:
+        """依快取類型彙總筆數、已過期筆數與大小"""
+        rows = self._connection().execute("""
+            SELECT cache_type, COUNT(*), SUM(expires_at <= ?), COALESCE(SUM(size), 0)
+            FROM cache_entries GROUP BY cache_type
+        """, (now,)).fetchall()
+        return {row[0]: {'entries': row[1], 'expired': row[2] or 0, 'bytes': row[3]} for row in rows}
+
+    def purge_expired(self, now: float) -> int:
+        """刪除已過期的快取，返回刪除筆數"""
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("""
+                DELETE FROM cache_tags WHERE cache_key IN (
+                    SELECT cache_key FROM cache_entries WHERE expires_at <= ?
+                )
+            """, (now,))
+            return conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (now,)).rowcount
+
+    # ---- API 限額 ----
+
+    def record_request(self, timestamp: float, endpoint: str, stock_code: str):
+        """記錄一次 API 請求（順便刪除超過保留時間的記錄）"""
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT INTO quota_requests (timestamp, endpoint, stock_code) VALUES (?, ?, ?)",
+                (timestamp, endpoint, stock_code)
+            )
+            conn.execute("DELETE FROM quota_requests WHERE timestamp < ?", (timestamp - QUOTA_RETENTION_SECONDS,))
+
+    def count_requests(self, now: float, windows: Iterable[int]) -> List[int]:
+        """返回各時間窗口（秒）內的請求數"""
+        conn = self._connection()
+        return [
+            conn.execute("SELECT COUNT(*) FROM quota_requests WHERE timestamp >= ?", (now - window,)).fetchone()[0]
+            for window in windows
+        ]
+
+    def try_acquire(self, now: float, windows: Iterable[Tuple[int, int]], endpoint: str, stock_code: str) -> float:
+        """在所有時間窗口都未達上限時記錄一次請求並返回 0，否則返回需要等待的秒數
+
+        檢查與記錄在同一個 IMMEDIATE 交易中完成，多個進程同時取得限額時不會超出上限。
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            wait = 0.0
+            for window, limit in windows:
+                # 窗口內第 limit 新的請求；存在表示已達上限，需等到它過期
+                row = conn.execute("""
+                    SELECT timestamp FROM quota_requests WHERE timestamp >= ?
+                    ORDER BY timestamp DESC LIMIT 1 OFFSET ?
+                """, (now - window, limit - 1)).fetchone()
+                if row is not None:
+                    wait = max(wait, row[0] + window - now)
+            if wait <= 0:
+                conn.execute(
+                    "INSERT INTO quota_requests (timestamp, endpoint, stock_code) VALUES (?, ?, ?)",
+                    (now, endpoint, stock_code)
+                )
+            return wait
+
+
+_shared_store: Optional[SharedCacheStore] = None
+_shared_store_lock = threading.Lock()
+
+
+def get_shared_store() -> Optional[SharedCacheStore]:
+    """CACHE_BACKEND=sqlite 時返回共用快取檔案（每個進程一個實例），否則返回 None"""
+    global _shared_store
+    from core.config import CACHE_BACKEND, CACHE_SHARED_PATH
+
+    if CACHE_BACKEND != 'sqlite':
+        return None
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = SharedCacheStore(CACHE_SHARED_PATH)
+            logger.info(f"使用共用快取檔案: {CACHE_SHARED_PATH}")
+        return _shared_store
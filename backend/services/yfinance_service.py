@@ -2,9 +2,12 @@
 
 import yfinance as yf
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
 from typing import Optional, Dict, List
 import logging
+import threading
+import time
 import warnings
 
 # 抑制 yfinance 和 pandas 的警告訊息
@@ -15,6 +18,18 @@ warnings.filterwarnings('ignore', message='.*pandas.*')
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)  # 顯示 INFO 級別以上的日誌，便於調試
 
+# 盤中 K 棒增量更新（快取服務未載入時每次都抓取整日數據）
+try:
+    from core.config import INTRADAY_REFRESH_INTERVAL, INTRADAY_DELTA_OVERLAP_BARS
+    from services.cache_service import get_intraday_series_from_cache, set_intraday_series_cache
+    INTRADAY_CACHE_AVAILABLE = True
+except ImportError as e:
+    INTRADAY_CACHE_AVAILABLE = False
+    logger.warning(f"盤中 K 棒快取未載入，將每次抓取整日數據: {str(e)}")
+
+# 保存在快取中的盤中 K 棒欄位
+INTRADAY_HISTORY_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
 # 台股代號映射（yfinance 使用 .TW 後綴）
 def get_yfinance_ticker(stock_code: str) -> str:
     """
@@ -122,51 +137,167 @@ def get_stock_info(stock_code: str) -> Optional[Dict]:
             logger.error(f"Error fetching stock info for {stock_code}: {error_msg}")
         return None
 
-def get_intraday_data(stock_code: str, period: str = "1d", interval: str = "1m") -> List[Dict]:
-    """獲取盤中即時數據（成交明細）"""
+def _columns_to_records(columns: Dict[str, List]) -> List[Dict]:
+    """欄位格式 {欄位: 值列表} 轉為記錄列表（鍵順序與欄位順序相同）"""
+    fields = list(columns)
+    return [dict(zip(fields, row)) for row in zip(*columns.values())]
+
+def _fetch_intraday_history(stock_code: str, period: str, interval: str,
+                            start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    """從 yfinance 抓取盤中 K 棒（指定 start 時只抓取 start 之後到現在的數據）"""
+    ticker = get_yfinance_ticker(stock_code)
+    stock = yf.Ticker(ticker)
+    
+    # 獲取歷史數據，抑制警告
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        if start is not None:
+            return stock.history(start=start, interval=interval, timeout=10)
+        return stock.history(period=period, interval=interval, timeout=10)
+
+def _merge_intraday_history(cached: pd.DataFrame, recent: pd.DataFrame) -> pd.DataFrame:
+    """依時間戳合併盤中 K 棒（同一時間戳以較新的數據為準），只保留最後一個交易日"""
+    if recent.empty:
+        return cached
+    merged = pd.concat([cached, recent[INTRADAY_HISTORY_COLUMNS]])
+    merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+    return merged[merged.index.normalize() == merged.index[-1].normalize()]
+
+_intraday_locks: Dict[str, threading.Lock] = {}
+_intraday_locks_guard = threading.Lock()
+
+def _intraday_lock(key: str) -> threading.Lock:
+    with _intraday_locks_guard:
+        if key not in _intraday_locks:
+            _intraday_locks[key] = threading.Lock()
+        return _intraday_locks[key]
+
+def _load_intraday_history(stock_code: str, interval: str) -> pd.DataFrame:
+    """當日盤中 K 棒（period="1d"），以快取中的序列增量更新
+    
+    快取沒有序列時抓取整日數據；有序列時只抓取最後一根之前 INTRADAY_DELTA_OVERLAP_BARS 根起的
+    最近數據並依時間戳合併（最後一根可能仍在更新，重疊抓取以取得最終值）；換日時合併結果只保留新的交易日。
+    距離上次更新未滿 INTRADAY_REFRESH_INTERVAL 秒時直接使用快取；增量抓取失敗時沿用快取中的序列。
+    """
+    with _intraday_lock(f"{stock_code}:{interval}"):
+        cached = get_intraday_series_from_cache(stock_code, interval)
+        now = time.time()
+        if cached is None:
+            hist = _fetch_intraday_history(stock_code, "1d", interval)
+            if hist.empty:
+                return hist
+            hist = hist[INTRADAY_HISTORY_COLUMNS]
+        elif now - cached['refreshed_at'] < INTRADAY_REFRESH_INTERVAL:
+            return cached['hist']
+        else:
+            start = cached['hist'].index[-1] - pd.Timedelta(interval) * INTRADAY_DELTA_OVERLAP_BARS
+            try:
+                recent = _fetch_intraday_history(stock_code, "1d", interval, start=start)
+            except Exception as e:
+                logger.warning(f"增量更新盤中數據失敗 ({stock_code})，使用快取中的數據: {str(e)}")
+                return cached['hist']
+            hist = _merge_intraday_history(cached['hist'], recent)
+            logger.debug(f"增量更新盤中數據 ({stock_code}): 抓取 {len(recent)} 根，合併後 {len(hist)} 根")
+        set_intraday_series_cache(stock_code, interval, hist, now)
+        return hist
+
+def build_intraday_columns(stock_code: str, hist: pd.DataFrame, since: Optional[datetime] = None) -> Dict[str, List]:
+    """由 yfinance 盤中 K 棒建立欄位格式的成交明細（整欄一次轉換，不逐列建立 dict）
+    
+    漲跌以第一根 K 棒的開盤價為基準；值與 get_intraday_data 的記錄完全相同。
+    since 不為 None 時只輸出時間不早於 since 的 K 棒（未指定時區時視為交易所當地時間），漲跌基準不變。
+    """
+    if len(hist) == 0:
+        return {}
+    
+    base_open = float(hist['Open'].iloc[0])
+    if since is not None:
+        since = pd.Timestamp(since)
+        if since.tzinfo is None and hist.index.tz is not None:
+            since = since.tz_localize(hist.index.tz)
+        hist = hist[hist.index >= since]
+    n = len(hist)
+    if n == 0:
+        return {}
+    
+    index = hist.index
+    opens = hist['Open'].to_numpy(dtype=float)
+    closes = hist['Close'].to_numpy(dtype=float)
+    volumes = hist['Volume'].to_numpy(dtype=float)
+    
+    if base_open > 0:
+        changes = (closes - base_open).tolist()
+        change = [round(v, 2) for v in changes]
+        change_percent = [round(v / base_open * 100, 2) for v in changes]
+    else:
+        change = [0.0] * n
+        change_percent = [0.0] * n
+    
+    return {
+        'stockCode': [stock_code] * n,
+        'date': list(index.strftime('%Y-%m-%d')),
+        'time': list(index.strftime('%H:%M:%S')),
+        'price': closes.tolist(),
+        'change': change,
+        'changePercent': change_percent,
+        'lots': [round(v / 1000, 2) for v in volumes.tolist()],  # 轉換為張數
+        'period': ['早盤' if hour < 12 else '午盤' for hour in index.hour],
+        'openPrice': opens.tolist(),
+        'highPrice': hist['High'].to_numpy(dtype=float).tolist(),
+        'lowPrice': hist['Low'].to_numpy(dtype=float).tolist(),
+        'totalVolume': volumes.astype('int64').tolist(),
+        'estimatedVolume': volumes.astype('int64').tolist(),
+    }
+
+def get_intraday_columns(stock_code: str, period: str = "1d", interval: str = "1m",
+                         since: Optional[datetime] = None) -> Dict[str, List]:
+    """獲取欄位格式的盤中即時數據（{欄位: 值列表}，無數據時返回空 dict）
+    
+    當日的分鐘 / 小時 K（period="1d"）以快取中的序列增量更新；since 只返回時間不早於 since 的 K 棒。
+    """
     try:
-        ticker = get_yfinance_ticker(stock_code)
-        stock = yf.Ticker(ticker)
-        
-        # 獲取歷史數據，抑制警告
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            hist = stock.history(period=period, interval=interval, timeout=10)
-        
-        if hist.empty:
-            return []
-        
-        # 轉換為列表格式
-        trade_details = []
-        base_open = float(hist.iloc[0]['Open']) if len(hist) > 0 else 0
-        
-        for idx, row in hist.iterrows():
-            change = float(row['Close']) - base_open if base_open > 0 else 0
-            change_percent = (change / base_open * 100) if base_open > 0 else 0
-            
-            trade_details.append({
-                'stockCode': stock_code,
-                'date': idx.strftime('%Y-%m-%d'),
-                'time': idx.strftime('%H:%M:%S'),
-                'price': float(row['Close']),
-                'change': round(float(change), 2),
-                'changePercent': round(float(change_percent), 2),
-                'lots': round(float(row['Volume']) / 1000, 2),  # 轉換為張數
-                'period': '早盤' if idx.hour < 12 else '午盤',
-                'openPrice': float(row['Open']),
-                'highPrice': float(row['High']),
-                'lowPrice': float(row['Low']),
-                'totalVolume': int(row['Volume']),
-                'estimatedVolume': int(row['Volume']),
-            })
-        
-        return trade_details
+        if period == "1d" and INTRADAY_CACHE_AVAILABLE and interval[-1:] in ('m', 'h'):
+            hist = _load_intraday_history(stock_code, interval)
+        else:
+            hist = _fetch_intraday_history(stock_code, period, interval)
+        return build_intraday_columns(stock_code, hist, since=since)
     except Exception as e:
         logger.error(f"Error fetching intraday data for {stock_code}: {str(e)}")
-        return []
+        return {}
 
-def get_market_index_data(index_code: str = "^TWII", days: int = 5) -> List[Dict]:
-    """獲取大盤指數數據（加權指數）"""
+def get_intraday_data(stock_code: str, period: str = "1d", interval: str = "1m",
+                      since: Optional[datetime] = None) -> List[Dict]:
+    """獲取盤中即時數據（成交明細）"""
+    return _columns_to_records(get_intraday_columns(stock_code, period=period, interval=interval, since=since))
+
+def build_market_index_columns(index_name: str, hist: pd.DataFrame) -> Dict[str, List]:
+    """由 yfinance 日 K 建立欄位格式的指數數據（前收盤取前一根 K 棒，第一根以開盤價代替）"""
+    n = len(hist)
+    if n == 0:
+        return {}
+    
+    opens = hist['Open'].to_numpy(dtype=float)
+    closes = hist['Close'].to_numpy(dtype=float)
+    prev_closes = np.concatenate(([opens[0]], closes[:-1]))
+    changes = (closes - prev_closes).tolist()
+    
+    return {
+        'date': list(hist.index.strftime('%Y-%m-%d')),
+        'indexName': [index_name] * n,
+        'closePrice': closes.tolist(),
+        'openPrice': opens.tolist(),
+        'highPrice': hist['High'].to_numpy(dtype=float).tolist(),
+        'lowPrice': hist['Low'].to_numpy(dtype=float).tolist(),
+        'change': [round(v, 2) for v in changes],
+        'changePercent': [
+            round(v / prev * 100, 2) if prev > 0 else 0.0
+            for v, prev in zip(changes, prev_closes.tolist())
+        ],
+        'volume': hist['Volume'].to_numpy(dtype='int64').tolist(),
+    }
+
+def get_market_index_columns(index_code: str = "^TWII", days: int = 5) -> Dict[str, List]:
+    """獲取欄位格式的大盤指數數據（{欄位: 值列表}，無數據時返回空 dict）"""
     try:
         stock = yf.Ticker(index_code)
         
@@ -179,7 +310,7 @@ def get_market_index_data(index_code: str = "^TWII", days: int = 5) -> List[Dict
             hist = stock.history(start=start_date, end=end_date, timeout=10)
         
         if hist.empty:
-            return []
+            return {}
         
         # 獲取指數資訊
         with warnings.catch_warnings():
@@ -187,31 +318,117 @@ def get_market_index_data(index_code: str = "^TWII", days: int = 5) -> List[Dict
             info = stock.info
         
         index_name = info.get('longName', info.get('shortName', '加權指數')) if info else '加權指數'
-        
-        # 轉換為列表格式
-        index_data = []
-        for idx, row in hist.iterrows():
-            idx_loc = hist.index.get_loc(idx)
-            prev_close = float(hist.iloc[idx_loc - 1]['Close']) if idx_loc > 0 else float(row['Open'])
-            change = float(row['Close']) - prev_close
-            change_percent = (change / prev_close * 100) if prev_close > 0 else 0
-            
-            index_data.append({
-                'date': idx.strftime('%Y-%m-%d'),
-                'indexName': index_name,
-                'closePrice': float(row['Close']),
-                'openPrice': float(row['Open']),
-                'highPrice': float(row['High']),
-                'lowPrice': float(row['Low']),
-                'change': round(float(change), 2),
-                'changePercent': round(float(change_percent), 2),
-                'volume': int(row['Volume']),
-            })
-        
-        return index_data
+        return build_market_index_columns(index_name, hist)
     except Exception as e:
         logger.error(f"Error fetching market index data: {str(e)}")
+        return {}
+
+def get_market_index_data(index_code: str = "^TWII", days: int = 5) -> List[Dict]:
+    """獲取大盤指數數據（加權指數）"""
+    return _columns_to_records(get_market_index_columns(index_code, days=days))
+
+def build_daily_trade_records(
+    stock_code: str,
+    stock_name: str,
+    dates: List[str],
+    open_prices: np.ndarray,
+    high_prices: np.ndarray,
+    low_prices: np.ndarray,
+    close_prices: np.ndarray,
+    volumes: np.ndarray,
+    prev_close: Optional[float] = None,
+    prev_volume: Optional[int] = None
+) -> List[Dict]:
+    """由 OHLCV 欄位陣列（依日期升序）建立日交易記錄
+    
+    衍生欄位以向量運算一次算出；第一筆的前收盤/前成交量使用 prev_close/prev_volume，
+    未提供時分別以開盤價與當日成交量代替。月高/月低為整個區間的最高/最低價。
+    """
+    if len(dates) == 0:
         return []
+    
+    open_prices = np.asarray(open_prices, dtype=float)
+    high_prices = np.asarray(high_prices, dtype=float)
+    low_prices = np.asarray(low_prices, dtype=float)
+    close_prices = np.asarray(close_prices, dtype=float)
+    volumes = np.asarray(volumes, dtype='int64')
+    
+    prev_closes = np.empty_like(close_prices)
+    prev_closes[1:] = close_prices[:-1]
+    prev_closes[0] = open_prices[0] if prev_close is None else prev_close
+    prev_volumes = np.empty_like(volumes)
+    prev_volumes[1:] = volumes[:-1]
+    prev_volumes[0] = volumes[0] if prev_volume is None else prev_volume
+    
+    changes = close_prices - prev_closes
+    change_percents = np.divide(
+        changes * 100, prev_closes,
+        out=np.zeros_like(changes), where=prev_closes > 0
+    )
+    # 計算均價（簡單使用最高、最低、收盤的平均）
+    avg_prices = (high_prices + low_prices + close_prices) / 3
+    
+    # 籌碼相關欄位為依成交量比例的估算值
+    estimates = {
+        'innerVolume': 0.48,  # 估算內盤
+        'outerVolume': 0.52,  # 估算外盤
+        'foreignInvestor': 0.2,  # 估算外資
+        'investmentTrust': 0.05,  # 估算投信
+        'dealer': 0.08,  # 估算自營商
+        'chips': 0.28,  # 估算籌碼
+        'mainBuy': 0.6,  # 估算主買
+        'mainSell': 0.4,  # 估算主賣
+    }
+    estimate_columns = {name: (volumes * ratio).astype('int64').tolist() for name, ratio in estimates.items()}
+    
+    month_high = float(high_prices.max())  # 月高
+    month_low = float(low_prices.min())  # 月低
+    
+    columns = zip(
+        dates,
+        close_prices.tolist(),
+        avg_prices.tolist(),
+        prev_closes.tolist(),
+        open_prices.tolist(),
+        high_prices.tolist(),
+        low_prices.tolist(),
+        changes.tolist(),
+        change_percents.tolist(),
+        volumes.tolist(),
+        prev_volumes.tolist(),
+        *estimate_columns.values()
+    )
+    
+    records = []
+    for (date, close, avg, prev, open_, high, low, change, change_percent, volume, prev_vol,
+         inner, outer, foreign, trust, dealer, chips, main_buy, main_sell) in columns:
+        records.append({
+            'stockCode': stock_code,
+            'stockName': stock_name,
+            'date': date,
+            'closePrice': close,
+            'avgPrice': round(avg, 2),
+            'prevClose': prev,
+            'openPrice': open_,
+            'highPrice': high,
+            'lowPrice': low,
+            'change': round(change, 2),
+            'changePercent': round(change_percent, 2),
+            'totalVolume': volume,
+            'prevVolume': prev_vol,
+            'innerVolume': inner,
+            'outerVolume': outer,
+            'foreignInvestor': foreign,
+            'investmentTrust': trust,
+            'dealer': dealer,
+            'chips': chips,
+            'mainBuy': main_buy,
+            'mainSell': main_sell,
+            'monthHigh': month_high,
+            'monthLow': month_low,
+            'quarterHigh': month_high,  # 季高（簡化為月高）
+        })
+    return records
 
 def get_daily_trade_data(stock_code: str, days: int = 5) -> List[Dict]:
     """獲取日交易檔數據"""
@@ -257,45 +474,16 @@ def get_daily_trade_data(stock_code: str, days: int = 5) -> List[Dict]:
         stock_name = info.get('longName', info.get('shortName', stock_code)) if info else stock_code
         
         # 轉換為列表格式
-        daily_trades = []
-        for idx, row in hist.iterrows():
-            idx_loc = hist.index.get_loc(idx)
-            prev_close = float(hist.iloc[idx_loc - 1]['Close']) if idx_loc > 0 else float(row['Open'])
-            change = float(row['Close']) - prev_close
-            change_percent = (change / prev_close * 100) if prev_close > 0 else 0
-            
-            # 計算均價（簡單使用收盤價）
-            avg_price = (float(row['High']) + float(row['Low']) + float(row['Close'])) / 3
-            
-            volume = int(row['Volume'])
-            prev_volume = int(hist.iloc[idx_loc - 1]['Volume']) if idx_loc > 0 else volume
-            
-            daily_trades.append({
-                'stockCode': stock_code,
-                'stockName': stock_name,
-                'date': idx.strftime('%Y-%m-%d'),
-                'closePrice': float(row['Close']),
-                'avgPrice': round(float(avg_price), 2),
-                'prevClose': float(prev_close),
-                'openPrice': float(row['Open']),
-                'highPrice': float(row['High']),
-                'lowPrice': float(row['Low']),
-                'change': round(float(change), 2),
-                'changePercent': round(float(change_percent), 2),
-                'totalVolume': volume,
-                'prevVolume': prev_volume,
-                'innerVolume': int(volume * 0.48),  # 估算內盤
-                'outerVolume': int(volume * 0.52),  # 估算外盤
-                'foreignInvestor': int(volume * 0.2),  # 估算外資
-                'investmentTrust': int(volume * 0.05),  # 估算投信
-                'dealer': int(volume * 0.08),  # 估算自營商
-                'chips': int(volume * 0.28),  # 估算籌碼
-                'mainBuy': int(volume * 0.6),  # 估算主買
-                'mainSell': int(volume * 0.4),  # 估算主賣
-                'monthHigh': float(hist['High'].max()),  # 月高
-                'monthLow': float(hist['Low'].min()),  # 月低
-                'quarterHigh': float(hist['High'].max()),  # 季高（簡化為月高）
-            })
+        daily_trades = build_daily_trade_records(
+            stock_code,
+            stock_name,
+            list(hist.index.strftime('%Y-%m-%d')),
+            hist['Open'].to_numpy(dtype=float),
+            hist['High'].to_numpy(dtype=float),
+            hist['Low'].to_numpy(dtype=float),
+            hist['Close'].to_numpy(dtype=float),
+            hist['Volume'].to_numpy(dtype='int64'),
+        )
         
         logger.info(f"成功處理股票 {stock_code} 的日交易數據，共 {len(daily_trades)} 筆")
         return daily_trades
@@ -5,9 +5,12 @@ from utils.stock_helpers import (
     validate_stock_code,
     diagnose_empty_data
 )
+from utils.pagination import encode_cursor, decode_cursor
 
 __all__ = [
     "get_stock_data_with_cache",
     "validate_stock_code",
     "diagnose_empty_data",
+    "encode_cursor",
+    "decode_cursor",
 ]
@@ -0,0 +1,35 @@
+# pagination.py - 日交易歷史的鍵集分頁（keyset pagination）游標
+
+"""
+游標記錄分頁邊界的 (stock_code, date) 與翻頁方向，以 base64url 編碼的 JSON 傳遞：
+  older：下一頁，取日期早於邊界的記錄
+  newer：上一頁，取日期晚於邊界的記錄
+查詢沿 (stock_code, date) 主鍵從邊界開始掃描，每頁成本只與頁大小有關，
+不像 OFFSET 需要先略過前面所有的列。客戶端應將游標視為不透明字串，原樣傳回。
+"""
+
+import base64
+import json
+from datetime import date
+from typing import Optional, Tuple
+
+CURSOR_DIRECTIONS = ('older', 'newer')
+
+
+def encode_cursor(stock_code: str, trade_date: str, direction: str) -> str:
+    """編碼分頁游標"""
+    payload = json.dumps({'s': stock_code, 'd': trade_date, 'o': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[str, date, str]]:
+    """解碼分頁游標，返回 (stock_code, date, direction)；格式錯誤時返回 None"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        stock_code, trade_date, direction = payload['s'], payload['d'], payload['o']
+        if not isinstance(stock_code, str) or direction not in CURSOR_DIRECTIONS:
+            return None
+        return stock_code, date.fromisoformat(trade_date), direction
+    except Exception:
+        return None